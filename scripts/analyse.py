@@ -15,11 +15,15 @@ def main():
     parser.add_argument("predictor", choices=["sign", "interval", "callgraph"], help="The predictor to use for the analysis.")
     parser.add_argument("--new", type=Path, help="Path to the new program directory.")
     parser.add_argument("--old", type=Path, help="Path to the old program directory.")
+    parser.add_argument("--no-snapshot", action="store_true", help="Do not read or write program snapshots.")
+    parser.add_argument("--lazy", action="store_true", help="Only parse classes when they are first accessed (implies --no-snapshot).")
     
     args = parser.parse_args()
 
-    new_program = Program.load(args.new)
-    old_program = Program.load(args.old)
+    snapshot = not (args.no_snapshot or args.lazy)
+
+    new_program = Program.load(args.new, snapshot=snapshot, lazy=args.lazy)
+    old_program = Program.load(args.old, snapshot=snapshot, lazy=args.lazy)
 
     if args.predictor == "sign":
         predictor: TestPredictor = AbstractSignPredictor()
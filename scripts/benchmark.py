@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+from argparse import ArgumentParser
+from pathlib import Path
+import pickle
+import random
+import sys
+import time
+import tracemalloc
+
+import jsondiff
+
+from reader.method_signature import MethodSignature
+from reader.program import Program
+from static_analysis.interpreter.abstract_interval_interpreter import AbstractIntervalInterpreter
+from static_analysis.interpreter.abstract_sign_interpreter import AbstractSignInterpreter
+from static_analysis.interpreter.abstractions.abstract_state import AbstractState
+from static_analysis.interpreter.common import PC
+from syntactic_analysis.bytecode.call_graph import CallGraph
+from syntactic_analysis.bytecode.compact_graph import CompactGraph
+from syntactic_analysis.bytecode.diff import diff_instructions
+from syntactic_analysis.bytecode.reachability import ReachabilityIndex
+
+project_root = Path(__file__).parent.parent
+
+
+# Returns a synthetic method body of the given size, made of instruction keys like the ones of the reader
+def synthetic_instructions(rng: random.Random, size: int) -> list[tuple]:
+    opcodes = ["load", "store", "push", "binary", "if", "goto", "invoke", "return"]
+    return [(rng.choice(opcodes), rng.randrange(8)) for _ in range(size)]
+
+
+# Returns a copy of the instructions with a few random insertions, deletions and replacements
+def edit_instructions(rng: random.Random, instructions: list[tuple], edits: int) -> list[tuple]:
+    edited = list(instructions)
+    for _ in range(edits):
+        index = rng.randrange(len(edited) + 1)
+        kind = rng.randrange(3)
+        if kind == 0 or index == len(edited):
+            edited.insert(index, ("push", rng.randrange(1000)))
+        elif kind == 1:
+            del edited[index]
+        else:
+            edited[index] = ("push", rng.randrange(1000))
+    return edited
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def benchmark_diff(args):
+    rng = random.Random(args.seed)
+
+    print(f"{'instructions':>12} {'edits':>6} {'jsondiff':>10} {'myers':>10} {'speedup':>8}")
+    for size in args.sizes:
+        old = synthetic_instructions(rng, size)
+        new = edit_instructions(rng, old, args.edits)
+
+        myers = min(timed(diff_instructions, old, new) for _ in range(args.repeat))
+        if size <= args.jsondiff_limit:
+            # A single run, as jsondiff is too slow to repeat
+            json = timed(jsondiff.diff, old, new)
+            print(f"{size:>12} {args.edits:>6} {json:>9.4f}s {myers:>9.4f}s {json / myers:>7.1f}x")
+        else:
+            print(f"{size:>12} {args.edits:>6} {'-':>10} {myers:>9.4f}s {'-':>8}")
+
+
+# Returns a synthetic call graph with the given number of methods, in classes of 20 methods, and its test methods.
+# Methods mostly call methods of their own class, which makes cycles, and otherwise methods of classes further
+# down the layers. One in ten classes is a test class, whose methods call a few methods of the other classes.
+def synthetic_call_graph(rng: random.Random, size: int) -> tuple[CallGraph, set[MethodSignature]]:
+    class_size = 20
+    classes = [
+        [MethodSignature(f"org/example/C{c}", f"m{m}", "int", ()) for m in range(class_size)]
+        for c in range(max(1, size // class_size))
+    ]
+    test_classes = set(range(0, len(classes), 10))
+    main_classes = [c for c in range(len(classes)) if c not in test_classes]
+
+    call_graph = CallGraph()
+    tests: set[MethodSignature] = set()
+    for c, methods in enumerate(classes):
+        call_graph.add_nodes_from(set(methods))
+        for method in methods:
+            if c in test_classes:
+                tests.add(method)
+                for _ in range(rng.randint(1, 5)):
+                    call_graph.add_edge(method, rng.choice(classes[rng.choice(main_classes)]))
+                continue
+
+            for _ in range(rng.randint(0, 3)):
+                if rng.random() < 0.7 or c == len(classes) - 1:
+                    callee = rng.choice(methods)
+                else:
+                    callee = rng.choice(classes[rng.randint(c + 1, min(len(classes) - 1, c + 50))])
+                call_graph.add_edge(method, callee)
+
+    return call_graph, tests
+
+
+# Returns the memory allocated by a function while its result is kept
+def traced(function, *args) -> int:
+    tracemalloc.start()
+    result = function(*args)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return memory
+
+
+def dict_of_sets(nodes: list[MethodSignature], edges: list[tuple[MethodSignature, MethodSignature]]) -> dict:
+    graph = {node: set() for node in nodes}
+    for callsite, callee in edges:
+        graph[callsite].add(callee)
+    return graph
+
+
+def benchmark_callgraph(args):
+    rng = random.Random(args.seed)
+
+    print(f"{'methods':>8} {'edges':>8} {'build':>9} {'sets':>9} {'arrays':>9} {'pickle':>9} {'dump':>9} {'load':>9} {'test bfs':>9}")
+    for size in args.sizes:
+        call_graph, tests = synthetic_call_graph(rng, size)
+        graph = call_graph.graph()
+        nodes, edges = graph.nodes, list(graph.edges())
+
+        build = min(timed(CompactGraph.from_edges, nodes, edges) for _ in range(args.repeat))
+        sets = traced(dict_of_sets, nodes, edges)
+        # The nodes are shared with the sets, so only the arrays and the id index are counted
+        arrays = traced(CompactGraph.from_edges, nodes, edges) - sys.getsizeof(list(nodes))
+
+        data = pickle.dumps(graph, protocol=pickle.HIGHEST_PROTOCOL)
+        dump = min(timed(pickle.dumps, graph, pickle.HIGHEST_PROTOCOL) for _ in range(args.repeat))
+        load = min(timed(pickle.loads, data) for _ in range(args.repeat))
+        bfs = min(timed(call_graph.reachable, tests) for _ in range(args.repeat))
+
+        print(
+            f"{size:>8} {len(edges):>8} {build:>8.3f}s {sets / 2**20:>7.1f}MB {arrays / 2**20:>7.1f}MB "
+            f"{len(data) / 2**20:>7.1f}MB {dump:>8.3f}s {load:>8.3f}s {bfs:>8.3f}s"
+        )
+
+
+def benchmark_reachability(args):
+    rng = random.Random(args.seed)
+
+    print(
+        f"{'methods':>8} {'edges':>8} {'sccs':>8} {'build':>9} {'memory':>10} {'bitsets':>10} {'tests':>9} "
+        f"{'bfs query':>10} {'index query':>12}"
+    )
+    for size in args.sizes:
+        call_graph, tests = synthetic_call_graph(rng, size)
+        edges = sum(len(callees) for callees in call_graph.edges.values())
+
+        build = min(timed(ReachabilityIndex.build, call_graph) for _ in range(args.repeat))
+
+        memory = traced(ReachabilityIndex.build, call_graph)
+        index = ReachabilityIndex.build(call_graph)
+        bitsets = sum(sys.getsizeof(bits) for bits in index.reaches + index.reached_by)
+
+        # The components of the tests are found once, and shared by all queries
+        test_components = min(timed(index.test_components, tests) for _ in range(args.repeat))
+        components = index.test_components(tests)
+
+        changed = rng.sample(sorted(call_graph.nodes - tests), min(args.changed, len(call_graph.nodes - tests)))
+        bfs = min(timed(call_graph.impacted_tests, changed, tests) for _ in range(args.repeat))
+        query = min(timed(index.impacted_tests, changed, components) for _ in range(args.repeat))
+        assert call_graph.impacted_tests(changed, tests) == index.impacted_tests(changed, components)
+
+        print(
+            f"{size:>8} {edges:>8} {len(index.components):>8} {build:>8.3f}s {memory / 2**20:>8.1f}MB "
+            f"{bitsets / 2**20:>8.1f}MB {test_components * 1000:>7.2f}ms {bfs * 1000:>8.2f}ms {query * 1000:>10.2f}ms"
+        )
+
+
+# Runs the interpreters on every test method of a program, and reports the generated states, the blocks stepped,
+# the states joined and kept, the generated states per second (with and without block execution), and the peak
+# memory allocated by the analysis of a test, summed over the tests, which is measured in a separate run
+def benchmark_interpret(args):
+    program = Program.load(args.data, snapshot=False)
+    tests = sorted((method.signature for _, method in program.all_test_methods()), key=str)
+
+    print(
+        f"{'interpreter':>28} {'blocks':>6} {'tests':>6} {'states':>8} {'steps':>8} {'joins':>8} {'kept':>8} "
+        f"{'time':>9} {'states/s':>10} {'peak':>9}"
+    )
+    for interpreter_class in (AbstractSignInterpreter, AbstractIntervalInterpreter):
+        for blocks in (False, True):
+            best = None
+            for _ in range(args.repeat):
+                states = steps = joins = kept = 0
+                elapsed = 0.0
+                for test in tests:
+                    # Only the analysis is timed, as the interval interpreter scans the sources when it is made
+                    interpreter = interpreter_class(program)
+                    interpreter.blocks = blocks
+                    start = time.perf_counter()
+                    interpreter.analyse(PC(test, 0), AbstractState((), ()))
+                    elapsed += time.perf_counter() - start
+                    states += interpreter.generated
+                    steps += interpreter.iterations
+                    joins += interpreter.joins
+                    kept += interpreter.stored
+                if best is None or elapsed < best:
+                    best = elapsed
+
+            peak = 0
+            for test in tests:
+                interpreter = interpreter_class(program)
+                interpreter.blocks = blocks
+                # The interpreter caches the code of every method, which is left out
+                interpreter.analyse(PC(test, 0), AbstractState((), ()))
+                tracemalloc.start()
+                before, _ = tracemalloc.get_traced_memory()
+                interpreter.analyse(PC(test, 0), AbstractState((), ()))
+                _, test_peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                peak += test_peak - before
+
+            print(
+                f"{interpreter_class.__name__:>28} {str(blocks):>6} {len(tests):>6} {states:>8} {steps:>8} {joins:>8} {kept:>8} "
+                f"{best:>8.4f}s {states / best:>10.0f} {peak / 1024:>7.1f}KB"
+            )
+
+
+def main():
+    parser = ArgumentParser(description="Microbenchmarks of the analysis.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random inputs.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs, of which the fastest is reported.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    diff_parser = subparsers.add_parser("diff", help="Compare jsondiff with the instruction diff on large methods.")
+    diff_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="Method sizes in instructions.")
+    diff_parser.add_argument("--edits", type=int, default=5, help="Number of random edits per method.")
+    diff_parser.add_argument("--jsondiff-limit", type=int, default=1000, help="Largest size to run jsondiff on, as it is quadratic.")
+    diff_parser.set_defaults(run=benchmark_diff)
+
+    callgraph_parser = subparsers.add_parser("callgraph", help="Build, pickle and walk the compact call graph of generated call graphs.")
+    callgraph_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Call graph sizes in methods.")
+    callgraph_parser.set_defaults(run=benchmark_callgraph)
+
+    reachability_parser = subparsers.add_parser("reachability", help="Build the reachability index of generated call graphs.")
+    reachability_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Call graph sizes in methods.")
+    reachability_parser.add_argument("--changed", type=int, default=2, help="Number of changed methods to find the impacted tests of.")
+    reachability_parser.set_defaults(run=benchmark_reachability)
+
+    interpret_parser = subparsers.add_parser("interpret", help="Measure the abstract steps per second of the interpreters on all tests.")
+    interpret_parser.add_argument("--data", type=Path, default=project_root / "data" / "new", help="Path to the program directory.")
+    interpret_parser.set_defaults(run=benchmark_interpret)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
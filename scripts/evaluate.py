@@ -16,9 +16,12 @@ def main():
     parser = ArgumentParser(description="Run test suite evaluation with specified predictor.")
     parser.add_argument("predictor", choices=["sign", "interval", "callgraph"], help="The predictor to use for the evaluation.")
     parser.add_argument("--no-threads", action="store_true", help="Disable threading for the evaluation.")
+    parser.add_argument("--load-jobs", type=int, default=1, help="Number of processes used to load each program version.")
+    parser.add_argument("--overlap-loads", action="store_true", help="Load the old and new version at the same time.")
+    parser.add_argument("--measure-load-speedup", action="store_true", help="Time a serial and a parallel load of each stage.")
     args = parser.parse_args()
     
-    evaluator = Evaluator(0 if args.no_threads else None)
+    evaluator = Evaluator(0 if args.no_threads else None, args.load_jobs, args.overlap_loads, args.measure_load_speedup)
 
     if args.predictor == "sign":
         predictor: TestPredictor = AbstractSignPredictor()
@@ -16,7 +16,7 @@ project_root = Path(__file__).parent.parent
 
 def run_without_parameters(interpreter: AbstractInterpreter, signature: MethodSignature):
     pc = PC(signature, 0)
-    initial_state = AbstractState([], {})
+    initial_state = AbstractState((), ())
 
     print(f"\nRunning {signature}")
     print("=================================")
@@ -2,10 +2,13 @@
 
 from pathlib import Path
 from preparation.prepare import perform_data_rotation
+import logging as l
 
 project_root = Path(__file__).parent.parent
 
 def main():
+    l.basicConfig(level=l.INFO)
+
     perform_data_rotation(
         project_root / "java-example",
         project_root / "data"
@@ -8,6 +8,7 @@ import subprocess
 from typing import List, Set, Tuple
 from evaluation.results import TestScenarioResult, TestStageResult, TestSuiteResult
 from evaluation.test_scenario import TestScenario, TestStage, TestSuite
+from prediction.change_set import ChangeSet
 from prediction.predictor import TestPredictor
 from preparation.prepare import perform_data_rotation, reset_data
 from reader.method_signature import MethodSignature
@@ -21,12 +22,20 @@ import tqdm
 
 project_root = Path(__file__).parent.parent.parent
 project_tmp_dir = project_root / "tmp"
+# Shared by all scenarios, so each class version is only converted by jvm2json once per evaluation
+project_cache_dir = project_tmp_dir / "jvm2json-cache"
 
 l.basicConfig(level=l.INFO)
 
 @dataclass
 class Evaluator:
     max_workers: int = 7
+    # Number of worker processes used to decode the old and new program of each stage
+    load_jobs: int = 1
+    # Load the old and new program at the same time instead of sharing the unchanged files of the old program
+    overlap_loads: bool = False
+    # Time an extra serial and parallel load of each stage, which decode every file, to measure the load speedup
+    measure_load_speedup: bool = False
 
     def evaluate_suite(
         self,
@@ -82,7 +91,7 @@ class Evaluator:
 
             data_dir = tmp_dir / "data"
 
-            reset_data(maven_project_copy, data_dir)
+            reset_data(maven_project_copy, data_dir, project_cache_dir)
 
             stage_results: List[TestStageResult] = []
 
@@ -107,20 +116,33 @@ class Evaluator:
 
         stage.apply_changes(src_dir)
         
-        perform_data_rotation(maven_project, data_dir)
+        perform_data_rotation(maven_project, data_dir, project_cache_dir)
 
         start_time = timer()
         
         ground_truth_positive: Set[MethodSignature] = stage.ground_truth
 
-        new_program: Program = Program.load(new_dir)
-        old_program: Program = Program.load(old_dir)
+        load_start_time = timer()
+
+        old_program, new_program = Program.load_pair(
+            old_dir, new_dir, jobs=self.load_jobs, share=not self.overlap_loads, snapshot=True
+        )
+
+        load_time = timer() - load_start_time
+        load_stats = old_program.load_stats + new_program.load_stats
         
-        predicted = predictor.predict(old_program, new_program)
+        # Computed once per stage, so methods are only diffed once however the predictor walks them
+        changes = ChangeSet(old_program, new_program)
+        predicted = predictor.predict(old_program, new_program, changes)
 
         end_time = timer()
         prediction_time = end_time - start_time
 
+        serial_load_time = parallel_load_time = None
+        if self.measure_load_speedup:
+            serial_load_time = self._time_load(old_dir, new_dir, 1)
+            parallel_load_time = self._time_load(old_dir, new_dir, self.load_jobs)
+
         non_passing_tests: Set[MethodSignature] = None
         all_test_time = None
 
@@ -164,9 +186,20 @@ class Evaluator:
             non_passing_tests,
             prediction_time,
             all_test_time,
-            subset_test_time
+            subset_test_time,
+            load_time,
+            load_stats,
+            serial_load_time,
+            parallel_load_time
         )
 
+    # Times loading the old and new program with the given number of jobs. Snapshots are not used,
+    # as the first of the two timed loads would write the snapshot the second one reads.
+    def _time_load(self, old_dir: Path, new_dir: Path, jobs: int) -> float:
+        start_time = timer()
+        Program.load_pair(old_dir, new_dir, jobs=jobs, share=not self.overlap_loads)
+        return timer() - start_time
+
     def _compute_dtest_param(self, predicted: Set[MethodSignature]) -> str:
         same_class_methods: dict[str, str] = {}
 
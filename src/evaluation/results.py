@@ -1,8 +1,9 @@
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Set
 
 from reader.method_signature import MethodSignature
+from reader.program import LoadStats
 
 
 @dataclass
@@ -14,6 +15,14 @@ class TestStageResult:
     prediction_time: float = 0.0
     test_time: float = 0.0,
     subset_test_time: float = 0.0
+    # Wall time spent loading the old and new program (part of the prediction time)
+    load_time: float = 0.0
+    # What loading the old and new program did, see LoadStats
+    load_stats: LoadStats = field(default_factory=LoadStats)
+    # Wall time of an extra load of the stage with one job and with the evaluator's load jobs,
+    # if the evaluator measures the load speedup
+    serial_load_time: float = None
+    parallel_load_time: float = None
 
     def compute_true_positives(self) -> Set[MethodSignature]:
         return self.predicted & self.ground_truth_positive
@@ -49,6 +58,32 @@ class TestScenarioResult:
             total_time_taken += stage_result.prediction_time
         return total_time_taken
     
+    def compute_total_load_time(self) -> float:
+        total_time_taken = 0.0
+        for stage_result in self.stage_results:
+            total_time_taken += stage_result.load_time
+        return total_time_taken
+
+    def compute_total_load_stats(self) -> LoadStats:
+        total_load_stats = LoadStats()
+        for stage_result in self.stage_results:
+            total_load_stats += stage_result.load_stats
+        return total_load_stats
+
+    def compute_total_serial_load_time(self) -> float:
+        total_time_taken = 0.0
+        for stage_result in self.stage_results:
+            if stage_result.serial_load_time is not None:
+                total_time_taken += stage_result.serial_load_time
+        return total_time_taken
+
+    def compute_total_parallel_load_time(self) -> float:
+        total_time_taken = 0.0
+        for stage_result in self.stage_results:
+            if stage_result.parallel_load_time is not None:
+                total_time_taken += stage_result.parallel_load_time
+        return total_time_taken
+    
     def compute_total_true_positive_count(self) -> int:
         total_true_positive_count = 0
         for stage_result in self.stage_results:
@@ -85,6 +120,42 @@ class TestSuiteResult:
             total_time_taken += scenario_result.compute_total_prediction_time()
         return total_time_taken
     
+    def compute_total_load_time(self) -> float:
+        total_time_taken = 0.0
+        for scenario_result in self.scenario_results:
+            total_time_taken += scenario_result.compute_total_load_time()
+        return total_time_taken
+
+    def compute_total_load_stats(self) -> LoadStats:
+        total_load_stats = LoadStats()
+        for scenario_result in self.scenario_results:
+            total_load_stats += scenario_result.compute_total_load_stats()
+        return total_load_stats
+
+    def compute_mean_load_time(self) -> float:
+        return self.compute_total_load_time() / self.compute_total_stage_count()
+
+    def compute_total_serial_load_time(self) -> float:
+        total_time_taken = 0.0
+        for scenario_result in self.scenario_results:
+            total_time_taken += scenario_result.compute_total_serial_load_time()
+        return total_time_taken
+
+    def compute_total_parallel_load_time(self) -> float:
+        total_time_taken = 0.0
+        for scenario_result in self.scenario_results:
+            total_time_taken += scenario_result.compute_total_parallel_load_time()
+        return total_time_taken
+
+    # Measured speedup of loading with the evaluator's load jobs over loading with one job,
+    # or None if the evaluator did not measure it
+    def compute_load_speedup(self) -> float | None:
+        total_parallel_load_time = self.compute_total_parallel_load_time()
+        if total_parallel_load_time == 0:
+            return None
+
+        return self.compute_total_serial_load_time() / total_parallel_load_time
+    
     def compute_total_true_positive_count(self) -> int:
         total_true_positive_count = 0
         for scenario_result in self.scenario_results:
@@ -258,6 +329,16 @@ class TestSuiteResult:
         print(f" Mean prediction time (s): {self.compute_mean_prediction_time()}")
         print(f" Prediction time variance: {self.compute_prediction_time_variance()}")
         print(f" Prediction time std deviation: {self.compute_prediction_time_std_deviation()}")
+        print(f" Total load time (s): {self.compute_total_load_time()}")
+        print(f" Mean load time (s): {self.compute_mean_load_time()}")
+        load_stats = self.compute_total_load_stats()
+        print(f" Total decode time (s): {load_stats.decode_time}")
+        print(f" Total serial load time (s): {self.compute_total_serial_load_time()}")
+        print(f" Total parallel load time (s): {self.compute_total_parallel_load_time()}")
+        print(f" Load speedup: {self.compute_load_speedup()}")
+        print(f" Files decoded: {load_stats.decoded}")
+        print(f" Files from snapshots: {load_stats.snapshot}")
+        print(f" Files shared with the old program: {load_stats.shared}")
         print(f" Mean test time (s): {self.compute_mean_test_time()}")
         print(f" Test time variance: {self.compute_test_time_variance()}")
         print(f" Test time std deviation: {self.compute_test_time_std_deviation()}")
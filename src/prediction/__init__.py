@@ -1,4 +1,5 @@
 from .abstract_interval_predictor import AbstractIntervalPredictor
 from .abstract_sign_predictor import AbstractSignPredictor
 from .call_graph_predictor import CallGraphPredictor
+from .change_set import ChangeSet, MethodChange
 from .predictor import TestPredictor
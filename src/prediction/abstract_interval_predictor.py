@@ -1,95 +1,56 @@
 from dataclasses import dataclass, field
-from typing import Any, Set
+from typing import Set
 
-import jsondiff
+from prediction.change_set import ChangeSet, MethodChange
 from prediction.predictor import TestPredictor
-from reader.method import Method
 from reader.method_signature import MethodSignature
 from static_analysis.interpreter.abstract_sign_interpreter import PC
 from static_analysis.interpreter.abstractions.abstract_state import AbstractState
 from static_analysis.interpreter.abstract_interval_interpreter import AbstractIntervalInterpreter
-from syntactic_analysis.bytecode.call_graph import CallGraph, build_call_graph
-import logging as l
+from syntactic_analysis.bytecode.call_graph import CallGraph
 
 from syntactic_analysis.scanner import get_int_literals
 
 @dataclass
 class AbstractIntervalPredictor(TestPredictor):
-    def _remove_offsets(self, bytecode):
-        if isinstance(bytecode, dict):
-            return {k: self._remove_offsets(v) for k, v in bytecode.items() if k != 'offset'}
-        elif isinstance(bytecode, list):
-            return [self._remove_offsets(item) for item in bytecode]
-        return bytecode
-
-
     def _add_offsets(self, changed_bc: dict[MethodSignature, Set[int]], signature: MethodSignature, changed: Set[int]):
         if signature not in changed_bc:
             changed_bc[signature] = set()
         changed_bc[signature].update(changed)
 
     
-    def predict(self, old_program, new_program):
+    def predict(self, old_program, new_program, changes: ChangeSet = None):
+        if changes is None:
+            changes = ChangeSet(old_program, new_program)
+
         # Find prediction candidates and changed bytecode
 
-        call_graph: CallGraph = build_call_graph(old_program)
+        call_graph: CallGraph = changes.call_graph
 
         changed_bc: dict[MethodSignature, Set[int]] = {}
 
         tests_to_analyse: Set[MethodSignature] = set()
+        tests: Set[MethodSignature] = set()
 
-        def walk_callgraph(start_node: MethodSignature, new_signature: MethodSignature) -> bool:
-            new_method: Method = new_program.method(new_signature)
-
-            if not old_program.contains_method(new_signature):
-                tests_to_analyse.add(start_node)
-                self._add_offsets(changed_bc, start_node, set(range(len(new_method.bytecode))))
-                return True
-
-            old_method: Method = old_program.method(new_signature)
-
-            new_bytecode = self._remove_offsets(new_method.bytecode)
-            old_bytecode = self._remove_offsets(old_method.bytecode)
-
-            if new_bytecode == old_bytecode:
-                return True
-
-            diff: dict[int, Any] = jsondiff.diff(old_bytecode, new_bytecode)
-            
-            if diff:
-                l.debug(f"Method {new_signature} has changed:")
-                tests_to_analyse.add(start_node)
-
-                changed = set(diff.keys()) - {jsondiff.insert, jsondiff.delete}
-
-                inserts = diff.get(jsondiff.insert, [])
-                deletions = diff.get(jsondiff.delete, [])
-
-                inserted_indexes = [
-                    insert[0]
-                    for insert in inserts
-                ]
-                
-                deleted_indexes = [
-                    deletion[0]
-                    for deletion in deletions
-                ]
-
-                changed.update(inserted_indexes)
-                changed.update(deleted_indexes)
-
-                self._add_offsets(
-                    changed_bc, 
-                    new_signature,
-                    changed
-                )
+        for _, method in new_program.all_test_methods():
+            if method.signature in call_graph:
+                tests.add(method.signature)
+                continue
 
-                return True
+            # Tests outside the call graph of the old program are only affected by their own changes
+            if changes.change(method.signature) in (MethodChange.ADDED, MethodChange.CHANGED):
+                tests_to_analyse.add(method.signature)
+                self._add_offsets(changed_bc, method.signature, changes.changed_offsets(method.signature))
 
-            return True
+        for signature in changes.changed_methods():
+            # The callers of a removed method have changed as well
+            if changes.change(signature) == MethodChange.REMOVED:
+                continue
 
-        for _, method in new_program.all_test_methods():         
-            call_graph.bfs_walk(method.signature, walk_callgraph)
+            impacted = call_graph.impacted_tests([signature], tests)
+            if impacted:
+                tests_to_analyse.update(impacted)
+                self._add_offsets(changed_bc, signature, changes.changed_offsets(signature))
 
         # Analyse prediction candidates
 
@@ -99,7 +60,7 @@ class AbstractIntervalPredictor(TestPredictor):
             interpreter = AbstractIntervalInterpreter(new_program)
 
             pc = PC(test_signature, 0)
-            initial_state = AbstractState([], {})
+            initial_state = AbstractState((), ())
 
             touched = interpreter.analyse(pc, initial_state)
 
@@ -0,0 +1,124 @@
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Mapping, Set
+
+from reader.file import File
+from reader.lazy_files import LazyFiles
+from reader.method_signature import MethodSignature
+from reader.program import Program
+from syntactic_analysis.bytecode.call_graph import CallGraph, build_call_graph
+from syntactic_analysis.bytecode.diff import diff_methods
+import logging as l
+
+
+class MethodChange(Enum):
+    ADDED = "added"
+    REMOVED = "removed"
+    CHANGED = "changed"
+    UNCHANGED = "unchanged"
+
+
+# The changes between the old and new program of a stage, shared by every predictor that runs on the stage.
+# Methods are compared the first time they are asked for and the result is kept, so every method is diffed
+# at most once, and a lazily loaded program still only parses the classes the predictors reach.
+@dataclass
+class ChangeSet:
+    old_program: Program
+    new_program: Program
+    # The methods compared so far, by their kind of change
+    added: Set[MethodSignature] = field(default_factory=set)
+    removed: Set[MethodSignature] = field(default_factory=set)
+    # Changed methods, with the indices of their changed instructions in the new method
+    changed: dict[MethodSignature, Set[int]] = field(default_factory=dict)
+    unchanged: Set[MethodSignature] = field(default_factory=set)
+    old_call_graph: CallGraph | None = field(default=None, repr=False)
+    all_changes: Set[MethodSignature] | None = field(default=None, repr=False)
+
+    # The call graph of the old program, which is only built once
+    @property
+    def call_graph(self) -> CallGraph:
+        if self.old_call_graph is None:
+            self.old_call_graph = build_call_graph(self.old_program)
+        return self.old_call_graph
+
+    # Returns all methods that were added, removed or changed. Only the classes whose bytecode digests differ
+    # are compared, which never decodes the unchanged classes of a lazily loaded program.
+    def changed_methods(self) -> Set[MethodSignature]:
+        if self.all_changes is not None:
+            return self.all_changes
+
+        self.all_changes = set()
+        for old_files, new_files in ((self.old_program.files, self.new_program.files), (self.old_program.test_files, self.new_program.test_files)):
+            for name in old_files.keys() | new_files.keys():
+                if name in old_files and name in new_files:
+                    old_digest = ChangeSet.file_digest(old_files, name)
+                    if old_digest is not None and old_digest == ChangeSet.file_digest(new_files, name):
+                        continue
+
+                signatures = set()
+                for files in (old_files, new_files):
+                    if name in files:
+                        signatures.update(files[name].methods)
+
+                for signature in signatures:
+                    if self.change(signature) != MethodChange.UNCHANGED:
+                        self.all_changes.add(signature)
+
+        return self.all_changes
+
+    # Returns the digest of the bytecode of a class, or None if it is unknown
+    @staticmethod
+    def file_digest(files: Mapping[str, File], name: str) -> str | None:
+        if isinstance(files, LazyFiles):
+            return files.digest(name)
+        return files[name].digest
+
+    # Returns how the method changed between the programs.
+    # Raises KeyError if the method is in neither program.
+    def change(self, signature: MethodSignature) -> MethodChange:
+        if signature in self.unchanged:
+            return MethodChange.UNCHANGED
+        if signature in self.changed:
+            return MethodChange.CHANGED
+        if signature in self.added:
+            return MethodChange.ADDED
+        if signature in self.removed:
+            return MethodChange.REMOVED
+
+        old_method = self.old_program.find_method(signature)
+        new_method = self.new_program.find_method(signature)
+
+        if old_method is None and new_method is None:
+            raise KeyError(f"Method {signature} not found in either program")
+
+        if old_method is None:
+            l.debug(f"Method {signature} has been added")
+            self.added.add(signature)
+            return MethodChange.ADDED
+
+        if new_method is None:
+            l.debug(f"Method {signature} has been removed")
+            self.removed.add(signature)
+            return MethodChange.REMOVED
+
+        # Methods of unchanged classes are shared between the program versions,
+        # and only methods with differing fingerprints are diffed
+        if new_method is not old_method and new_method.fingerprint != old_method.fingerprint:
+            diff = diff_methods(old_method, new_method)
+            if diff:
+                l.debug(f"Method {signature} has changed")
+                self.changed[signature] = diff.changed_offsets()
+                return MethodChange.CHANGED
+
+        self.unchanged.add(signature)
+        return MethodChange.UNCHANGED
+
+    # Returns the indices of the instructions of the new method that are not in the old method.
+    # All instructions of an added method are changed.
+    def changed_offsets(self, signature: MethodSignature) -> Set[int]:
+        change = self.change(signature)
+        if change == MethodChange.CHANGED:
+            return self.changed[signature]
+        if change == MethodChange.ADDED:
+            return set(range(len(self.new_program.method(signature).instructions)))
+        return set()
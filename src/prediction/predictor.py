@@ -2,10 +2,13 @@ from dataclasses import dataclass
 from abc import ABC, abstractmethod
 from typing import Set
 
+from prediction.change_set import ChangeSet
 from reader.method_signature import MethodSignature
 from reader.program import Program
 
 class TestPredictor(ABC):
+    # Predicts the tests of the new program affected by the changes. The change set can be shared between
+    # predictors of the same programs, otherwise a new one is made.
     @abstractmethod
-    def predict(self, old_program: Program, new_program: Program) -> Set[MethodSignature]:
+    def predict(self, old_program: Program, new_program: Program, changes: ChangeSet = None) -> Set[MethodSignature]:
         pass
\ No newline at end of file
@@ -0,0 +1,189 @@
+from dataclasses import asdict, dataclass, field
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+import subprocess
+import logging as l
+from xml.etree import ElementTree as ET
+
+# Set the path to the javac command used for incremental builds (if not set already)
+JAVAC_PATH = os.getenv("JAVAC_PATH", "javac")
+
+# Name of the file in a data directory that records the sources of the last build
+COMPILE_STATE_NAME = "compile-state.json"
+
+# Source directories of a maven project and the directories their classes are compiled to
+SOURCE_DIRS = {"src/main/java": "target/classes", "src/test/java": "target/test-classes"}
+
+POM_NAMESPACE = {"m": "http://maven.apache.org/POM/4.0.0"}
+
+
+# What the last build of a maven project was made from: the hash of its pom,
+# the classpath of its dependencies, and the hash of every source file relative to the project
+@dataclass
+class CompileState:
+    pom: str
+    classpath: list[str] = field(default_factory=list)
+    sources: dict[str, str] = field(default_factory=dict)
+
+    @staticmethod
+    def path(data_dir: Path) -> Path:
+        return data_dir / COMPILE_STATE_NAME
+
+    @staticmethod
+    def read(data_dir: Path) -> 'CompileState | None':
+        try:
+            return CompileState(**json.loads(CompileState.path(data_dir).read_text()))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def write(self, data_dir: Path):
+        data_dir.mkdir(parents=True, exist_ok=True)
+        CompileState.path(data_dir).write_text(json.dumps(asdict(self)))
+
+
+def digest(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def source_digests(maven_project: Path) -> dict[str, str]:
+    return {
+        source.relative_to(maven_project).as_posix(): digest(source)
+        for source_dir in SOURCE_DIRS
+        for source in (maven_project / source_dir).rglob("*.java")
+    }
+
+
+def run_maven(maven_project: Path, *goals: str):
+    result = subprocess.run(["mvn", "-q", "-f", str(maven_project / "pom.xml"), *goals])
+    if result.returncode != 0:
+        raise RuntimeError("Error: Maven build failed")
+
+
+# Builds the project from scratch with maven, and records the state of the build.
+# The classpath of the dependencies is resolved once here, so incremental builds never start maven.
+def full_build(maven_project: Path, data_dir: Path):
+    run_maven(maven_project, "clean", "package", "-DskipTests")
+
+    classpath_file = maven_project / "target" / "classpath.txt"
+    run_maven(maven_project, "dependency:build-classpath", f"-Dmdep.outputFile={classpath_file}")
+    classpath = [entry for entry in classpath_file.read_text().strip().split(os.pathsep) if entry]
+
+    CompileState(digest(maven_project / "pom.xml"), classpath, source_digests(maven_project)).write(data_dir)
+
+
+# Returns the javac options for the release and source encoding configured in the pom
+def javac_options(maven_project: Path) -> list[str]:
+    properties = ET.parse(maven_project / "pom.xml").getroot().find("m:properties", POM_NAMESPACE)
+    if properties is None:
+        return []
+
+    def value(name: str) -> str | None:
+        element = properties.find(f"m:{name}", POM_NAMESPACE)
+        return element.text.strip() if element is not None and element.text else None
+
+    options = []
+    if release := value("maven.compiler.release") or value("maven.compiler.target"):
+        options += ["--release", release]
+    if encoding := value("project.build.sourceEncoding"):
+        options += ["-encoding", encoding]
+    return options
+
+
+# Returns the sources that must be recompiled after the given sources changed or were removed:
+# the changed sources, and every source that mentions the name of a changed or removed class or of another source
+# that is recompiled. The dependents are closed transitively, as javac inlines constants, so a constant that changed
+# in one class changes the class files of every class that uses it through a chain of constants.
+def sources_to_compile(maven_project: Path, sources: dict[str, str], changed: set[str], removed: set[str]) -> set[str]:
+    names = {Path(source).stem for source in changed | removed}
+    if not names:
+        return set()
+
+    texts = {
+        source: (maven_project / source).read_text(errors="replace")
+        for source in sources if source not in changed
+    }
+
+    to_compile = set(changed)
+    while names:
+        pattern = re.compile(r"\b(" + "|".join(map(re.escape, sorted(names))) + r")\b")
+        dependents = {source for source, text in texts.items() if pattern.search(text)}
+        for source in dependents:
+            del texts[source]
+        to_compile |= dependents
+        names = {Path(source).stem for source in dependents}
+    return to_compile
+
+
+# Removes the class files of a source, including its nested classes
+def remove_classes(maven_project: Path, source: str):
+    source_dir = next(source_dir for source_dir in SOURCE_DIRS if source.startswith(f"{source_dir}/"))
+    relative_path = Path(source).relative_to(source_dir)
+    class_dir = maven_project / SOURCE_DIRS[source_dir] / relative_path.parent
+    for class_file in [class_dir / f"{relative_path.stem}.class", *class_dir.glob(f"{relative_path.stem}$*.class")]:
+        class_file.unlink(missing_ok=True)
+
+
+def class_mtimes(maven_project: Path) -> dict[Path, int]:
+    return {
+        class_file: class_file.stat().st_mtime_ns
+        for class_dir in SOURCE_DIRS.values()
+        for class_file in (maven_project / class_dir).rglob("*.class")
+    }
+
+
+# Compiles the project, only recompiling the sources that changed since the last build and their dependents.
+# Returns the paths of the class files that were written, relative to their class directory,
+# or None if the whole project was built, as there was no previous build or the pom changed.
+def incremental_build(maven_project: Path, data_dir: Path) -> set[Path] | None:
+    state = CompileState.read(data_dir)
+    if state is None or state.pom != digest(maven_project / "pom.xml") or not (maven_project / "target/classes").is_dir():
+        full_build(maven_project, data_dir)
+        return None
+
+    sources = source_digests(maven_project)
+    changed = {source for source, source_digest in sources.items() if state.sources.get(source) != source_digest}
+    removed = state.sources.keys() - sources.keys()
+    to_compile = sources_to_compile(maven_project, sources, changed, removed)
+
+    for source in to_compile | removed:
+        remove_classes(maven_project, source)
+
+    before = class_mtimes(maven_project)
+    options = javac_options(maven_project)
+
+    try:
+        for source_dir, class_dir in SOURCE_DIRS.items():
+            files = sorted(source for source in to_compile if source.startswith(f"{source_dir}/"))
+            if not files:
+                continue
+
+            # Test classes are compiled against the main classes
+            classpath = [str(maven_project / class_dir), str(maven_project / "target/classes"), *state.classpath]
+            result = subprocess.run([
+                JAVAC_PATH, *options, "-implicit:none",
+                "-d", str(maven_project / class_dir),
+                "-cp", os.pathsep.join(classpath),
+                *(str(maven_project / file) for file in files),
+            ])
+            if result.returncode != 0:
+                raise RuntimeError(f"javac failed for {len(files)} sources")
+    except (OSError, RuntimeError) as e:
+        l.warning(f"Incremental build failed, rebuilding the whole project: {e}")
+        full_build(maven_project, data_dir)
+        return None
+
+    state.sources = sources
+    state.write(data_dir)
+
+    l.info(f"Incremental build: {len(changed)} changed, {len(removed)} removed, {len(to_compile)} recompiled sources")
+
+    after = class_mtimes(maven_project)
+    return {
+        class_file.relative_to(maven_project / class_dir)
+        for class_dir in SOURCE_DIRS.values()
+        for class_file in after
+        if class_file.is_relative_to(maven_project / class_dir) and before.get(class_file) != after[class_file]
+    }
@@ -1,71 +1,320 @@
-import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+import hashlib
 import os
 from pathlib import Path
 import shutil
 import subprocess
 import sys
+import threading
+import logging as l
+from timeit import default_timer as timer
+
+from reader.classfile import read_class
+from reader.pack import Pack
+from reader.program import Program
+from preparation.incremental import CompileState, incremental_build, run_maven
+from preparation.version_store import VERSIONS_DIR_NAME, VersionStore
 
 # Set the path to the jvm2json command (if not set already)
 JVM2JSON_PATH = os.getenv("JVM2JSON_PATH", "jvm2json/result/bin/jvm2json")
 
-# Helper function to convert class files to JSON with pretty print
-def convert_classes_to_json(src_dir, dest_dir):
-    for file in Path(src_dir).rglob("*.class"):
-        # Set the output file path
-        out_file = Path(dest_dir) / file.relative_to(src_dir).with_suffix(".json")
-
-        # Make sure the target folder exists
-        out_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Convert the class to JSON bytecode
-        result = subprocess.run(
-            f"{JVM2JSON_PATH} < \"{file}\"",
-            shell=True,
-            capture_output=True,
-            text=True
-        )
-
-        # Check if the subprocess ran successfully
-        if result.returncode != 0 or not result.stdout:
-            raise RuntimeError(f"Error running jvm2json for {file}: {result.stderr}")
-
-        # Load the JSON output from jvm2json, then pretty-print it
-        json_data = json.loads(result.stdout)
-        with open(out_file, "w") as out_f:
-            json.dump(json_data, out_f, indent=4)
-
-def perform_data_rotation(maven_project: Path, data_dir: Path):
+# Maximum number of jvm2json processes running at the same time
+JVM2JSON_JOBS = int(os.getenv("JVM2JSON_JOBS", os.cpu_count() or 1))
+
+# Name of the default conversion cache directory inside a data directory
+CACHE_DIR_NAME = "jvm2json-cache"
+
+# If this is disabled, rotation only runs jvm2json for the class files the in-process class file reader can not read,
+# and the program reads all other classes straight from their class files
+WRITE_JSON = os.getenv("WRITE_BYTECODE_JSON", "1") == "1"
+
+# If this is enabled, rotation packs the sources and bytecode of each version into a single file (see reader.pack)
+PACK_BYTECODE = os.getenv("PACK_BYTECODE", "0") == "1"
+
+# If this is enabled, rotation adds every version to a version store (see preparation.version_store)
+# instead of copying it, and data_dir/old and data_dir/new link to the two newest versions of the store
+VERSION_STORE = os.getenv("VERSION_STORE", "0") == "1"
+
+# If this is enabled, rotation only recompiles the changed sources and their dependents with javac (see preparation.incremental)
+# instead of running a clean maven build
+INCREMENTAL_BUILD = os.getenv("INCREMENTAL_BUILD", "0") == "1"
+
+@dataclass
+class ConversionStats:
+    hits: int = 0
+    misses: int = 0
+    # Class files that did not need a conversion, as they are read in process
+    parsed: int = 0
+    # Seconds spent in each phase of the rotation (compile, copy, convert, ...)
+    phase_times: dict[str, float] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        return f"{self.hits} cache hits, {self.misses} cache misses, {self.parsed} read in process"
+
+# Returns the path of the cached JSON for a class file, keyed by the SHA-256 of the class file
+def cached_json_path(cache_dir: Path, class_file: Path) -> Path:
+    digest = hashlib.sha256(class_file.read_bytes()).hexdigest()
+    return cache_dir / digest[:2] / f"{digest}.json"
+
+# Converts a single class file to JSON, unless it is in the cache. Returns true on a cache hit.
+def convert_class_to_json(class_file: Path, out_file: Path, cache_dir: Path = None) -> bool:
+    # Make sure the target folder exists
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+
+    if cache_dir is not None:
+        cached_file = cached_json_path(cache_dir, class_file)
+        if cached_file.exists():
+            shutil.copyfile(cached_file, out_file)
+            return True
+
+    # Convert the class to JSON bytecode, feeding the class file directly to jvm2json
+    with open(class_file, "rb") as class_f:
+        result = subprocess.run([JVM2JSON_PATH], stdin=class_f, capture_output=True)
+
+    # Check if the subprocess ran successfully
+    if result.returncode != 0 or not result.stdout.strip():
+        raise RuntimeError(f"Error running jvm2json for {class_file}: {result.stderr.decode(errors='replace')}")
+
+    # The JSON output is written as is, the reader does not need it pretty-printed
+    out_file.write_bytes(result.stdout)
+
+    if cache_dir is not None:
+        # Write through a temporary file, so concurrent conversions never read a partial file
+        cached_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cached_file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_file.write_bytes(result.stdout)
+        tmp_file.replace(cached_file)
+
+    return False
+
+# Converts a single class file to JSON only if the in-process class file reader can not read it.
+# Returns None if no conversion was needed, otherwise true on a cache hit.
+def convert_unreadable_class(class_file: Path, out_file: Path, cache_dir: Path = None) -> bool | None:
+    try:
+        read_class(class_file.read_bytes())
+        return None
+    except (NotImplementedError, ValueError) as e:
+        l.debug(f"Falling back to jvm2json for {class_file}: {e}")
+
+    return convert_class_to_json(class_file, out_file, cache_dir)
+
+# Converts the class files of several (class directory, JSON directory) pairs to JSON,
+# running up to jobs jvm2json processes at the same time. Each JSON file is written as soon as its conversion completes.
+# With write_json=False only the class files that can not be read in process are converted.
+# If only is given, only the class files with these paths relative to their class directory are converted.
+def convert_directories(
+    directories: list[tuple[Path, Path]],
+    cache_dir: Path = None,
+    jobs: int = JVM2JSON_JOBS,
+    write_json: bool = True,
+    only: set[Path] = None
+) -> ConversionStats:
+    stats = ConversionStats()
+
+    conversions = [
+        (file, Path(dest_dir) / file.relative_to(src_dir).with_suffix(".json"))
+        for src_dir, dest_dir in directories
+        for file in Path(src_dir).rglob("*.class")
+        if only is None or file.relative_to(src_dir) in only
+    ]
+
+    convert = convert_class_to_json if write_json else convert_unreadable_class
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = [
+            executor.submit(convert, class_file, out_file, cache_dir)
+            for class_file, out_file in conversions
+        ]
+
+        for future in as_completed(futures):
+            hit = future.result()
+            if hit is None:
+                stats.parsed += 1
+            elif hit:
+                stats.hits += 1
+            else:
+                stats.misses += 1
+
+    return stats
+
+# Helper function to convert class files to JSON.
+# If a cache directory is given, jvm2json is only run for class files that have not been converted before.
+def convert_classes_to_json(src_dir, dest_dir, cache_dir: Path = None, jobs: int = JVM2JSON_JOBS) -> ConversionStats:
+    return convert_directories([(src_dir, dest_dir)], cache_dir, jobs)
+
+# Packs the sources and bytecode a program is loaded from into a single file, and removes the loose JSON files.
+# The class files are kept, as they are the input of the conversion.
+def pack_data_dir(data_dir: Path) -> Path:
+    pairs = Program.data_pairs(data_dir) + Program.data_pairs(data_dir, test=True)
+    path = Pack.write(data_dir, [file.relative_to(data_dir) for pair in pairs for file in pair])
+
+    shutil.rmtree(data_dir / "bytecode", ignore_errors=True)
+    shutil.rmtree(data_dir / "test-bytecode", ignore_errors=True)
+
+    l.info(f"Packed {len(pairs)} classes into {path}")
+    return path
+
+# Measures the time of the consecutive phases of a rotation
+class PhaseTimer:
+    def __init__(self):
+        self.times: dict[str, float] = {}
+        self.start = timer()
+
+    # Ends the current phase, and starts the next one
+    def lap(self, phase: str):
+        now = timer()
+        self.times[phase] = now - self.start
+        self.start = now
+
+    def __str__(self) -> str:
+        return ", ".join(f"{phase} {time:.2f}s" for phase, time in self.times.items())
+
+# Seeds the JSON directories with the JSON of the previous version, leaving out the classes that were rebuilt or removed,
+# so only the rebuilt classes have to be converted. Returns false if the previous version has no JSON to seed from.
+def seed_bytecode(directories: list[tuple[Path, Path]], previous_dir: Path, rebuilt: set[Path]) -> bool:
+    if not all((previous_dir / json_dir.name).is_dir() for _, json_dir in directories):
+        return False
+
+    for class_dir, json_dir in directories:
+        shutil.copytree(previous_dir / json_dir.name, json_dir)
+        for json_file in json_dir.rglob("*.json"):
+            class_path = json_file.relative_to(json_dir).with_suffix(".class")
+            if class_path in rebuilt or not (class_dir / class_path).exists():
+                json_file.unlink()
+
+    return True
+
+# Converts the classes of a new version. If only some classes were rebuilt, the JSON of the other classes is taken from the previous version.
+def convert_version(
+    directories: list[tuple[Path, Path]],
+    previous_dir: Path,
+    rebuilt: set[Path] | None,
+    cache_dir: Path,
+    write_json: bool
+) -> ConversionStats:
+    if rebuilt is not None and seed_bytecode(directories, previous_dir, rebuilt):
+        stats = convert_directories(directories, cache_dir, write_json=write_json, only=rebuilt)
+    else:
+        stats = convert_directories(directories, cache_dir, write_json=write_json)
+
+    l.info(f"jvm2json conversion: {stats}")
+    return stats
+
+# Compiles the maven project. Returns the class files that were rebuilt, relative to their class directory,
+# or None if all classes were rebuilt.
+def build_project(maven_project: Path, data_dir: Path, incremental: bool) -> set[Path] | None:
+    if incremental:
+        return incremental_build(maven_project, data_dir)
+
+    # A full build invalidates the state an incremental build starts from
+    CompileState.path(data_dir).unlink(missing_ok=True)
+    run_maven(maven_project, "clean", "package", "-DskipTests")
+    return None
+
+# Adds the compiled maven project as a new version to the version store of the data directory,
+# and links data_dir/old and data_dir/new to the two newest versions. Only the JSON files are written to tmp_dir.
+def store_version(
+    maven_project: Path,
+    data_dir: Path,
+    tmp_dir: Path,
+    cache_dir: Path,
+    write_json: bool,
+    pack: bool,
+    rebuilt: set[Path] | None,
+    phase_timer: PhaseTimer
+) -> ConversionStats:
+    stats = convert_version([
+        (maven_project / "target/classes",      tmp_dir / "bytecode"),
+        (maven_project / "target/test-classes", tmp_dir / "test-bytecode"),
+    ], data_dir / "new", rebuilt, cache_dir, write_json)
+    phase_timer.lap("convert")
+
+    version_store = VersionStore(data_dir / VERSIONS_DIR_NAME)
+    version_dir = version_store.add({
+        "source":        maven_project / "src/main/java",
+        "test-source":   maven_project / "src/test/java",
+        "classes":       maven_project / "target/classes",
+        "test-classes":  maven_project / "target/test-classes",
+        "bytecode":      tmp_dir / "bytecode",
+        "test-bytecode": tmp_dir / "test-bytecode",
+    })
+    phase_timer.lap("store")
+
+    if pack:
+        pack_data_dir(version_dir)
+        phase_timer.lap("pack")
+
+    version_store.link_latest(data_dir)
+    phase_timer.lap("rotate")
+    return stats
+
+# Compiles the maven project and rotates data_dir/new to data_dir/old, and the new version into data_dir/new.
+# Converted class files are cached in cache_dir (by default data_dir/jvm2json-cache) across rotations.
+# With write_json=False, JSON is only written for classes the in-process class file reader can not read.
+# With pack=True, the loose JSON files are replaced by a single pack file.
+# With store=True, the version is added to the version store in data_dir/store instead of being copied.
+# With incremental=True, only the sources changed since the last rotation and their dependents are recompiled,
+# and only their classes are converted. The time of every phase is logged and returned in the stats.
+def perform_data_rotation(
+    maven_project: Path,
+    data_dir: Path,
+    cache_dir: Path = None,
+    write_json: bool = WRITE_JSON,
+    pack: bool = PACK_BYTECODE,
+    store: bool = VERSION_STORE,
+    incremental: bool = INCREMENTAL_BUILD
+) -> ConversionStats:
     tmp_dir = data_dir / "tmp"
     new_dir = data_dir / "new"
     old_dir = data_dir / "old"
 
     shutil.rmtree(tmp_dir, ignore_errors=True)
+    phase_timer = PhaseTimer()
 
     try:
-        # Run maven to compile the Java code
-        result = subprocess.run(["mvn", "-q", "-f", str(maven_project / "pom.xml"), "clean", "package", "-DskipTests"])
-
-        if result.returncode != 0:
-            raise RuntimeError("Error: Maven build failed")
-
-        # Create a tmp directory
-        tmp_dir.mkdir(parents=True, exist_ok=True)  # Make sure the tmp directory exists
-        
-        # Copy sources and classes to tmp directory
-        shutil.copytree(maven_project / "src/main/java",       tmp_dir / "source")
-        shutil.copytree(maven_project / "src/test/java",       tmp_dir / "test-source")
-        shutil.copytree(maven_project / "target/classes",      tmp_dir / "classes")
-        shutil.copytree(maven_project / "target/test-classes", tmp_dir / "test-classes")
-
-        # Convert classes to JSON bytecode
-        convert_classes_to_json(tmp_dir / "classes",      tmp_dir / "bytecode")
-        convert_classes_to_json(tmp_dir / "test-classes", tmp_dir / "test-bytecode")
-
-        # Rotate the data directories
-        shutil.rmtree(old_dir, ignore_errors=True)
-        new_dir.mkdir(parents=True, exist_ok=True)
-        shutil.move(str(new_dir), str(old_dir))
-        shutil.move(str(tmp_dir), str(new_dir))
+        # Compile the Java code
+        rebuilt = build_project(maven_project, data_dir, incremental)
+        phase_timer.lap("compile")
+
+        if cache_dir is None:
+            cache_dir = data_dir / CACHE_DIR_NAME
+
+        if store:
+            stats = store_version(maven_project, data_dir, tmp_dir, cache_dir, write_json, pack, rebuilt, phase_timer)
+        else:
+            # Create a tmp directory
+            tmp_dir.mkdir(parents=True, exist_ok=True)  # Make sure the tmp directory exists
+
+            # Copy sources and classes to tmp directory
+            shutil.copytree(maven_project / "src/main/java",       tmp_dir / "source")
+            shutil.copytree(maven_project / "src/test/java",       tmp_dir / "test-source")
+            shutil.copytree(maven_project / "target/classes",      tmp_dir / "classes")
+            shutil.copytree(maven_project / "target/test-classes", tmp_dir / "test-classes")
+            phase_timer.lap("copy")
+
+            # Convert classes to JSON bytecode
+            stats = convert_version([
+                (tmp_dir / "classes",      tmp_dir / "bytecode"),
+                (tmp_dir / "test-classes", tmp_dir / "test-bytecode"),
+            ], new_dir, rebuilt, cache_dir, write_json)
+            phase_timer.lap("convert")
+
+            if pack:
+                pack_data_dir(tmp_dir)
+                phase_timer.lap("pack")
+
+            # Rotate the data directories
+            shutil.rmtree(old_dir, ignore_errors=True)
+            new_dir.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(new_dir), str(old_dir))
+            shutil.move(str(tmp_dir), str(new_dir))
+            phase_timer.lap("rotate")
+
+        stats.phase_times = phase_timer.times
+        l.info(f"Rotation phases: {phase_timer}")
+
+        return stats
 
     except Exception as e:
         print(f"Error occurred: {e}", file=sys.stderr)
@@ -74,7 +323,15 @@ def perform_data_rotation(maven_project: Path, data_dir: Path):
         shutil.rmtree(tmp_dir, ignore_errors=True)
 
 
-def reset_data(maven_project: Path, data_dir: Path):
+def reset_data(
+    maven_project: Path,
+    data_dir: Path,
+    cache_dir: Path = None,
+    write_json: bool = WRITE_JSON,
+    pack: bool = PACK_BYTECODE,
+    store: bool = VERSION_STORE,
+    incremental: bool = INCREMENTAL_BUILD
+) -> ConversionStats:
     shutil.rmtree(data_dir, ignore_errors=True)
 
-    perform_data_rotation(maven_project, data_dir)
\ No newline at end of file
+    return perform_data_rotation(maven_project, data_dir, cache_dir, write_json, pack, store, incremental)
\ No newline at end of file
@@ -0,0 +1,139 @@
+from dataclasses import dataclass
+import hashlib
+import os
+from pathlib import Path
+import shutil
+import logging as l
+from typing import Tuple
+
+from reader.program import Program
+
+# Number of versions kept in a version store
+VERSION_HISTORY = int(os.getenv("VERSION_HISTORY", "5"))
+
+# Name of the version store directory inside a data directory
+VERSIONS_DIR_NAME = "store"
+
+
+# A content-addressed store of program versions, e.g. data/store.
+# Every version is a data directory below versions/ (e.g. versions/000042/source/...), whose files are
+# hard links to the objects below objects/, named after the SHA-256 of their content.
+# Unchanged files are therefore only stored once, and adding a version never copies them again.
+@dataclass
+class VersionStore:
+    root: Path
+    history: int = VERSION_HISTORY
+
+    @property
+    def objects_dir(self) -> Path:
+        return self.root / "objects"
+
+    @property
+    def versions_dir(self) -> Path:
+        return self.root / "versions"
+
+    # Returns the ids of all versions in the store, from oldest to newest
+    def versions(self) -> list[str]:
+        if not self.versions_dir.exists():
+            return []
+        return sorted(path.name for path in self.versions_dir.iterdir() if path.is_dir() and path.name.isdigit())
+
+    # Returns the data directory of a version, which is given by its id or by its position (e.g. -1 for the newest)
+    def path(self, version: str | int) -> Path:
+        if isinstance(version, int):
+            version = self.versions()[version]
+        path = self.versions_dir / version
+        if not path.is_dir():
+            raise KeyError(f"Version {version} not found in {self.root}")
+        return path
+
+    # Loads any two versions of the store, e.g. load_pair(-3, -1) to skip a version
+    def load_pair(self, old_version: str | int, new_version: str | int, **kwargs) -> Tuple[Program, Program]:
+        return Program.load_pair(self.path(old_version), self.path(new_version), **kwargs)
+
+    # Adds a version made of the given trees, e.g. {"source": maven_project / "src/main/java"}, and returns its directory.
+    # Trees that do not exist are left out. Older versions beyond the history are removed.
+    def add(self, trees: dict[str, Path]) -> Path:
+        versions = self.versions()
+        version = f"{int(versions[-1]) + 1 if versions else 0:06d}"
+
+        # The version is built next to its final place, so it only shows up once it is complete
+        tmp_dir = self.versions_dir / f"{version}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        stored = linked = 0
+        for name, tree in trees.items():
+            if not tree.exists():
+                continue
+            for file in tree.rglob("*"):
+                if not file.is_file():
+                    continue
+                target = tmp_dir / name / file.relative_to(tree)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                if self.link(file, target):
+                    stored += 1
+                else:
+                    linked += 1
+
+        version_dir = self.versions_dir / version
+        tmp_dir.rename(version_dir)
+        l.info(f"Stored version {version}: {stored} new files, {linked} unchanged files linked")
+
+        self.prune()
+        return version_dir
+
+    # Links target to the object holding the content of file, and stores the object first if it is new.
+    # Returns true if the object was new.
+    def link(self, file: Path, target: Path) -> bool:
+        content = file.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+        object_path = self.objects_dir / digest[:2] / digest
+
+        new = not object_path.exists()
+        if new:
+            object_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = object_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(content)
+            tmp_path.replace(object_path)
+
+        try:
+            os.link(object_path, target)
+        except OSError:
+            # E.g. file systems without hard links
+            shutil.copyfile(object_path, target)
+
+        return new
+
+    # Removes the versions beyond the history, and the objects no version links to anymore
+    def prune(self):
+        versions = self.versions()
+        for version in versions[:max(0, len(versions) - self.history)]:
+            shutil.rmtree(self.versions_dir / version)
+
+        if not self.objects_dir.exists():
+            return
+
+        for object_path in self.objects_dir.glob("*/*"):
+            if object_path.stat().st_nlink == 1:
+                object_path.unlink()
+
+    # Points data_dir/new at the newest version, and data_dir/old at the version before it.
+    # The links are replaced by a rename, so readers never see a missing directory.
+    def link_latest(self, data_dir: Path):
+        versions = self.versions()
+        for name, index in (("new", -1), ("old", -2)):
+            path = data_dir / name
+            if path.is_dir() and not path.is_symlink():
+                shutil.rmtree(path)
+
+            if len(versions) < -index:
+                # Like a plain rotation, the first version has an empty old version
+                path.unlink(missing_ok=True)
+                path.mkdir()
+                continue
+
+            tmp_link = data_dir / f"{name}.tmp"
+            tmp_link.unlink(missing_ok=True)
+            os.symlink(os.path.relpath(self.path(versions[index]), data_dir), tmp_link)
+            os.replace(tmp_link, path)
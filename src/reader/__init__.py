@@ -2,3 +2,4 @@ from .program import Program
 from .method_signature import MethodSignature
 from .method import Method
 from .file import File
+from .instruction import Instruction, Opcode
@@ -0,0 +1,552 @@
+import struct
+from typing import Any
+
+# An in-process reader of JVM class files, which produces the same JSON structure as jvm2json,
+# so a class file can be decoded without starting a jvm2json process and without a JSON round trip.
+# Only the parts of the structure that the reader uses are produced: the methods with their
+# signature, annotations and bytecode. Branch targets are instruction indices, like in jvm2json.
+# Class files that use features the reader does not support (e.g. jsr/ret) raise NotImplementedError,
+# and malformed class files raise ValueError, in both cases jvm2json can be used instead.
+
+MAGIC = 0xCAFEBABE
+
+BASE_TYPES = {
+    "B": "byte", "C": "char", "D": "double", "F": "float",
+    "I": "int", "J": "long", "S": "short", "Z": "boolean",
+}
+
+CLASS_ACCESS = [
+    (0x0001, "public"), (0x0010, "final"), (0x0020, "super"), (0x0200, "interface"),
+    (0x0400, "abstract"), (0x1000, "synthetic"), (0x2000, "annotation"), (0x4000, "enum"),
+]
+
+METHOD_ACCESS = [
+    (0x0001, "public"), (0x0002, "private"), (0x0004, "protected"), (0x0008, "static"),
+    (0x0010, "final"), (0x0020, "synchronized"), (0x0040, "bridge"), (0x0080, "varargs"),
+    (0x0100, "native"), (0x0400, "abstract"), (0x0800, "strict"), (0x1000, "synthetic"),
+]
+
+FIELD_ACCESS = [
+    (0x0001, "public"), (0x0002, "private"), (0x0004, "protected"), (0x0008, "static"),
+    (0x0010, "final"), (0x0040, "volatile"), (0x0080, "transient"), (0x1000, "synthetic"),
+    (0x4000, "enum"),
+]
+
+# Local variable, array and arithmetic types in the order the opcode families use them
+LOCAL_TYPES = ["int", "long", "float", "double", "ref"]
+ARRAY_TYPES = ["int", "long", "float", "double", "ref", "byte", "char", "short"]
+NEWARRAY_TYPES = {4: "boolean", 5: "char", 6: "float", 7: "double", 8: "byte", 9: "short", 10: "int", 11: "long"}
+CONDITIONS = ["eq", "ne", "lt", "ge", "gt", "le"]
+CASTS = [
+    ("int", "long"), ("int", "float"), ("int", "double"),
+    ("long", "int"), ("long", "float"), ("long", "double"),
+    ("float", "int"), ("float", "long"), ("float", "double"),
+    ("double", "int"), ("double", "long"), ("double", "float"),
+    ("int", "byte"), ("int", "char"), ("int", "short"),
+]
+INVOKE_ACCESS = {0xb6: "virtual", 0xb7: "special", 0xb8: "static", 0xb9: "interface"}
+
+
+def access_flags(flags: int, names: list[tuple[int, str]]) -> list[str]:
+    return [name for flag, name in names if flags & flag]
+
+
+# Decodes the modified UTF-8 of class files, which encodes NUL as two bytes and
+# characters outside the basic multilingual plane as surrogate pairs
+def decode_utf8(data: bytes) -> str:
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        text = data.replace(b"\xc0\x80", b"\x00").decode("utf-8", "surrogatepass")
+        return text.encode("utf-16", "surrogatepass").decode("utf-16")
+
+
+# Parses the field type starting at position i of a descriptor, in the shape of jvm2json's
+# method parameters, and returns it together with the position after it
+def parse_type(descriptor: str, i: int = 0) -> tuple[dict, int]:
+    c = descriptor[i]
+    if c in BASE_TYPES:
+        return {"base": BASE_TYPES[c]}, i + 1
+    if c == "L":
+        end = descriptor.index(";", i)
+        return {"kind": "class", "name": descriptor[i + 1:end]}, end + 1
+    if c == "[":
+        element, end = parse_type(descriptor, i + 1)
+        return {"kind": "array", "type": element}, end
+    raise ValueError(f"Invalid descriptor {descriptor!r}")
+
+
+# Parses a method descriptor into its parameter types and return type, which is None for void
+def parse_method_descriptor(descriptor: str) -> tuple[list[dict], dict | None]:
+    if not descriptor.startswith("("):
+        raise ValueError(f"Invalid method descriptor {descriptor!r}")
+    params = []
+    i = 1
+    while descriptor[i] != ")":
+        param, i = parse_type(descriptor, i)
+        params.append(param)
+    returns = None if descriptor[i + 1] == "V" else parse_type(descriptor, i + 1)[0]
+    return params, returns
+
+
+# Converts a parsed type into the shape jvm2json uses for invocations, where base types are plain strings
+def invocation_type(type: dict | None) -> Any:
+    if type is None:
+        return None
+    if "base" in type:
+        return type["base"]
+    if type["kind"] == "array":
+        return {"kind": "array", "type": invocation_type(type["type"])}
+    return type
+
+
+# Parses a class name of the constant pool, which is a descriptor for array classes
+def class_type(name: str) -> dict:
+    return parse_type(name)[0] if name.startswith("[") else {"kind": "class", "name": name}
+
+
+class ConstantPool:
+    def __init__(self, entries: list[tuple]):
+        # Entries are (tag, *operands) tuples, with None for the unusable slots after longs and doubles
+        self.entries = entries
+
+    @staticmethod
+    def read(reader: 'ByteReader') -> 'ConstantPool':
+        count = reader.u2()
+        entries: list[tuple] = [None] * count
+        i = 1
+        while i < count:
+            tag = reader.u1()
+            match tag:
+                case 1:
+                    entries[i] = (tag, decode_utf8(reader.bytes(reader.u2())))
+                case 3:
+                    entries[i] = (tag, reader.unpack(">i"))
+                case 4:
+                    entries[i] = (tag, reader.unpack(">f"))
+                case 5:
+                    entries[i] = (tag, reader.unpack(">q"))
+                case 6:
+                    entries[i] = (tag, reader.unpack(">d"))
+                case 7 | 8 | 16 | 19 | 20:
+                    entries[i] = (tag, reader.u2())
+                case 9 | 10 | 11 | 12 | 17 | 18:
+                    entries[i] = (tag, reader.u2(), reader.u2())
+                case 15:
+                    entries[i] = (tag, reader.u1(), reader.u2())
+                case _:
+                    raise ValueError(f"Unknown constant pool tag {tag}")
+            # Longs and doubles take up two slots of the pool
+            i += 2 if tag in (5, 6) else 1
+        return ConstantPool(entries)
+
+    def entry(self, index: int, *tags: int) -> tuple:
+        entry = self.entries[index] if 0 < index < len(self.entries) else None
+        if entry is None or entry[0] not in tags:
+            raise ValueError(f"Invalid constant pool reference {index}")
+        return entry
+
+    def utf8(self, index: int) -> str:
+        return self.entry(index, 1)[1]
+
+    def class_name(self, index: int) -> str:
+        return self.utf8(self.entry(index, 7)[1])
+
+    def name_and_type(self, index: int) -> tuple[str, str]:
+        _, name, descriptor = self.entry(index, 12)
+        return self.utf8(name), self.utf8(descriptor)
+
+    # Returns the class name, name and descriptor of a field or method reference
+    def member(self, index: int) -> tuple[str, str, str, bool]:
+        tag, class_index, name_and_type = self.entry(index, 9, 10, 11)
+        return (self.class_name(class_index), *self.name_and_type(name_and_type), tag == 11)
+
+    # Returns a loadable constant in the shape of jvm2json's push values
+    def value(self, index: int) -> dict:
+        entry = self.entry(index, 3, 4, 5, 6, 7, 8)
+        match entry[0]:
+            case 3:
+                return {"type": "integer", "value": entry[1]}
+            case 4:
+                return {"type": "float", "value": entry[1]}
+            case 5:
+                return {"type": "long", "value": entry[1]}
+            case 6:
+                return {"type": "double", "value": entry[1]}
+            case 7:
+                return {"type": "class", "value": class_type(self.utf8(entry[1]))}
+            case 8:
+                return {"type": "string", "value": self.utf8(entry[1])}
+
+
+class ByteReader:
+    def __init__(self, data: bytes, position: int = 0):
+        self.data = data
+        self.position = position
+
+    def unpack(self, format: str) -> Any:
+        try:
+            (value,) = struct.unpack_from(format, self.data, self.position)
+        except struct.error as e:
+            raise ValueError(f"Truncated class file at {self.position}") from e
+        self.position += struct.calcsize(format)
+        return value
+
+    def u1(self) -> int:
+        return self.unpack(">B")
+
+    def u2(self) -> int:
+        return self.unpack(">H")
+
+    def u4(self) -> int:
+        return self.unpack(">I")
+
+    def s1(self) -> int:
+        return self.unpack(">b")
+
+    def s2(self) -> int:
+        return self.unpack(">h")
+
+    def s4(self) -> int:
+        return self.unpack(">i")
+
+    def bytes(self, length: int) -> bytes:
+        if self.position + length > len(self.data):
+            raise ValueError(f"Truncated class file at {self.position}")
+        data = self.data[self.position:self.position + length]
+        self.position += length
+        return data
+
+    # Reads the attributes at the current position into a name -> contents dict
+    def attributes(self, pool: ConstantPool) -> dict[str, bytes]:
+        attributes = {}
+        for _ in range(self.u2()):
+            name = pool.utf8(self.u2())
+            attributes[name] = self.bytes(self.u4())
+        return attributes
+
+
+# Parses a class file into the JSON structure jvm2json produces for it
+def read_class(data: bytes) -> dict:
+    reader = ByteReader(data)
+    if reader.u4() != MAGIC:
+        raise ValueError("Not a class file")
+
+    minor, major = reader.u2(), reader.u2()
+    pool = ConstantPool.read(reader)
+
+    access = reader.u2()
+    name = pool.class_name(reader.u2())
+    super_index = reader.u2()
+    interfaces = [{"kind": "class", "name": pool.class_name(reader.u2())} for _ in range(reader.u2())]
+    fields = [read_field(reader, pool) for _ in range(reader.u2())]
+    methods = [read_method(reader, pool) for _ in range(reader.u2())]
+    attributes = reader.attributes(pool)
+
+    return {
+        "name": name,
+        "access": access_flags(access, CLASS_ACCESS),
+        "super": {"kind": "class", "name": pool.class_name(super_index)} if super_index else None,
+        "interfaces": interfaces,
+        "fields": fields,
+        "methods": methods,
+        "annotations": read_annotations(attributes, pool),
+        "version": [major, minor],
+    }
+
+
+def read_field(reader: ByteReader, pool: ConstantPool) -> dict:
+    access = reader.u2()
+    name = pool.utf8(reader.u2())
+    type, _ = parse_type(pool.utf8(reader.u2()))
+    attributes = reader.attributes(pool)
+    return {
+        "name": name,
+        "access": access_flags(access, FIELD_ACCESS),
+        "type": type,
+        "annotations": read_annotations(attributes, pool),
+    }
+
+
+def read_method(reader: ByteReader, pool: ConstantPool) -> dict:
+    access = reader.u2()
+    name = pool.utf8(reader.u2())
+    params, returns = parse_method_descriptor(pool.utf8(reader.u2()))
+    attributes = reader.attributes(pool)
+    code = attributes.get("Code")
+    return {
+        "name": name,
+        "access": access_flags(access, METHOD_ACCESS),
+        "params": [{"annotations": [], "type": param} for param in params],
+        "returns": {"annotations": [], "type": returns},
+        "code": read_code(code, pool) if code is not None else None,
+        "annotations": read_annotations(attributes, pool),
+    }
+
+
+def read_annotations(attributes: dict[str, bytes], pool: ConstantPool) -> list[dict]:
+    annotations = []
+    for attribute, visible in (("RuntimeVisibleAnnotations", True), ("RuntimeInvisibleAnnotations", False)):
+        if attribute in attributes:
+            reader = ByteReader(attributes[attribute])
+            for _ in range(reader.u2()):
+                annotation = read_annotation(reader, pool)
+                annotation["is_runtime_visible"] = visible
+                annotations.append(annotation)
+    return annotations
+
+
+def read_annotation(reader: ByteReader, pool: ConstantPool) -> dict:
+    type = parse_type(pool.utf8(reader.u2()))[0]
+    values = {}
+    for _ in range(reader.u2()):
+        name = pool.utf8(reader.u2())
+        values[name] = read_element_value(reader, pool)
+    return {"type": type["name"] if "name" in type else type, "values": values}
+
+
+def read_element_value(reader: ByteReader, pool: ConstantPool) -> Any:
+    tag = chr(reader.u1())
+    match tag:
+        case "B" | "C" | "I" | "S" | "Z" | "D" | "F" | "J":
+            return pool.entry(reader.u2(), 3, 4, 5, 6)[1]
+        case "s":
+            return pool.utf8(reader.u2())
+        case "e":
+            type, constant = pool.utf8(reader.u2()), pool.utf8(reader.u2())
+            return {"type": parse_type(type)[0], "name": constant}
+        case "c":
+            return {"class": pool.utf8(reader.u2())}
+        case "@":
+            return read_annotation(reader, pool)
+        case "[":
+            return [read_element_value(reader, pool) for _ in range(reader.u2())]
+    raise ValueError(f"Unknown annotation element tag {tag!r}")
+
+
+def read_code(data: bytes, pool: ConstantPool) -> dict:
+    reader = ByteReader(data)
+    max_stack, max_locals = reader.u2(), reader.u2()
+    code = reader.bytes(reader.u4())
+    bytecode = read_bytecode(code, pool)
+
+    # Branch targets and handlers are byte offsets in the class file, but instruction indices in jvm2json
+    indices = {instruction["offset"]: i for i, instruction in enumerate(bytecode)}
+    indices[len(code)] = len(bytecode)
+
+    def index(offset: int) -> int:
+        if offset not in indices:
+            raise ValueError(f"Branch to offset {offset}, which is not the start of an instruction")
+        return indices[offset]
+
+    for instruction in bytecode:
+        if "target" in instruction:
+            instruction["target"] = index(instruction["target"])
+        if "default" in instruction:
+            instruction["default"] = index(instruction["default"])
+            if instruction["opr"] == "tableswitch":
+                instruction["targets"] = [index(target) for target in instruction["targets"]]
+            else:
+                instruction["targets"] = [
+                    {"key": target["key"], "target": index(target["target"])} for target in instruction["targets"]
+                ]
+
+    exceptions = []
+    for _ in range(reader.u2()):
+        start, end, handler, catch_type = reader.u2(), reader.u2(), reader.u2(), reader.u2()
+        exceptions.append({
+            "start": index(start),
+            "end": index(end),
+            "handler": index(handler),
+            "catchType": pool.class_name(catch_type) if catch_type else None,
+        })
+
+    return {
+        "max_stack": max_stack,
+        "max_locals": max_locals,
+        "exceptions": exceptions,
+        "bytecode": bytecode,
+    }
+
+
+# Decodes the instructions of a Code attribute. Branch targets are left as absolute byte offsets.
+def read_bytecode(code: bytes, pool: ConstantPool) -> list[dict]:
+    reader = ByteReader(code)
+    bytecode = []
+    while reader.position < len(code):
+        offset = reader.position
+        instruction = read_instruction(reader, pool, offset)
+        bytecode.append({"offset": offset, **instruction})
+    return bytecode
+
+
+def read_instruction(reader: ByteReader, pool: ConstantPool, offset: int) -> dict:
+    op = reader.u1()
+
+    # Families of opcodes that only differ in their type, in the order of LOCAL_TYPES or ARRAY_TYPES
+    if 0x02 <= op <= 0x08:
+        return {"opr": "push", "value": {"type": "integer", "value": op - 0x03}}
+    if 0x09 <= op <= 0x0a:
+        return {"opr": "push", "value": {"type": "long", "value": op - 0x09}}
+    if 0x0b <= op <= 0x0d:
+        return {"opr": "push", "value": {"type": "float", "value": float(op - 0x0b)}}
+    if 0x0e <= op <= 0x0f:
+        return {"opr": "push", "value": {"type": "double", "value": float(op - 0x0e)}}
+    if 0x15 <= op <= 0x19:
+        return {"opr": "load", "type": LOCAL_TYPES[op - 0x15], "index": reader.u1()}
+    if 0x1a <= op <= 0x2d:
+        return {"opr": "load", "type": LOCAL_TYPES[(op - 0x1a) // 4], "index": (op - 0x1a) % 4}
+    if 0x2e <= op <= 0x35:
+        return {"opr": "array_load", "type": ARRAY_TYPES[op - 0x2e]}
+    if 0x36 <= op <= 0x3a:
+        return {"opr": "store", "type": LOCAL_TYPES[op - 0x36], "index": reader.u1()}
+    if 0x3b <= op <= 0x4e:
+        return {"opr": "store", "type": LOCAL_TYPES[(op - 0x3b) // 4], "index": (op - 0x3b) % 4}
+    if 0x4f <= op <= 0x56:
+        return {"opr": "array_store", "type": ARRAY_TYPES[op - 0x4f]}
+    if 0x60 <= op <= 0x73:
+        operant = ["add", "sub", "mul", "div", "rem"][(op - 0x60) // 4]
+        return {"opr": "binary", "type": LOCAL_TYPES[(op - 0x60) % 4], "operant": operant}
+    if 0x74 <= op <= 0x77:
+        return {"opr": "negate", "type": LOCAL_TYPES[op - 0x74]}
+    if 0x78 <= op <= 0x83:
+        operant = ["shl", "shr", "ushr", "and", "or", "xor"][(op - 0x78) // 2]
+        return {"opr": "binary", "type": LOCAL_TYPES[(op - 0x78) % 2], "operant": operant}
+    if 0x85 <= op <= 0x93:
+        from_type, to_type = CASTS[op - 0x85]
+        return {"opr": "cast", "from": from_type, "to": to_type}
+    if 0x99 <= op <= 0x9e:
+        return {"opr": "ifz", "condition": CONDITIONS[op - 0x99], "target": offset + reader.s2()}
+    if 0x9f <= op <= 0xa4:
+        return {"opr": "if", "condition": CONDITIONS[op - 0x9f], "target": offset + reader.s2()}
+    if 0xac <= op <= 0xb0:
+        return {"opr": "return", "type": LOCAL_TYPES[op - 0xac]}
+
+    match op:
+        case 0x00:
+            return {"opr": "nop"}
+        case 0x01:
+            return {"opr": "push", "value": None}
+        case 0x10:
+            return {"opr": "push", "value": {"type": "integer", "value": reader.s1()}}
+        case 0x11:
+            return {"opr": "push", "value": {"type": "integer", "value": reader.s2()}}
+        case 0x12:
+            return {"opr": "push", "value": pool.value(reader.u1())}
+        case 0x13 | 0x14:
+            return {"opr": "push", "value": pool.value(reader.u2())}
+        case 0x57 | 0x58:
+            return {"opr": "pop", "words": op - 0x56}
+        case 0x59 | 0x5c:
+            return {"opr": "dup", "words": 1 if op == 0x59 else 2}
+        case 0x5a | 0x5d:
+            return {"opr": "dup_x1", "words": 1 if op == 0x5a else 2}
+        case 0x5b | 0x5e:
+            return {"opr": "dup_x2", "words": 1 if op == 0x5b else 2}
+        case 0x5f:
+            return {"opr": "swap"}
+        case 0x84:
+            return {"opr": "incr", "index": reader.u1(), "amount": reader.s1()}
+        case 0x94:
+            return {"opr": "compare_long"}
+        case 0x95 | 0x96 | 0x97 | 0x98:
+            type = "float" if op <= 0x96 else "double"
+            return {"opr": "compare_floating", "type": type, "onnan": -1 if op in (0x95, 0x97) else 1}
+        case 0xa5 | 0xa6:
+            return {"opr": "if", "condition": "is" if op == 0xa5 else "isnot", "target": offset + reader.s2()}
+        case 0xa7:
+            return {"opr": "goto", "target": offset + reader.s2()}
+        case 0xaa:
+            reader.position += -reader.position % 4
+            default, low, high = reader.s4(), reader.s4(), reader.s4()
+            if high < low:
+                raise ValueError(f"Invalid tableswitch at offset {offset}")
+            targets = [offset + reader.s4() for _ in range(high - low + 1)]
+            return {"opr": "tableswitch", "default": offset + default, "low": low, "targets": targets}
+        case 0xab:
+            reader.position += -reader.position % 4
+            default = reader.s4()
+            targets = [{"key": reader.s4(), "target": offset + reader.s4()} for _ in range(reader.s4())]
+            return {"opr": "lookupswitch", "default": offset + default, "targets": targets}
+        case 0xb1:
+            return {"opr": "return", "type": None}
+        case 0xb2 | 0xb3 | 0xb4 | 0xb5:
+            class_name, name, descriptor, _ = pool.member(reader.u2())
+            return {
+                "opr": "get" if op in (0xb2, 0xb4) else "put",
+                "static": op <= 0xb3,
+                "field": {"class": class_name, "name": name, "type": invocation_type(parse_type(descriptor)[0])},
+            }
+        case 0xb6 | 0xb7 | 0xb8 | 0xb9:
+            class_name, name, descriptor, is_interface = pool.member(reader.u2())
+            params, returns = parse_method_descriptor(descriptor)
+            instruction = {
+                "opr": "invoke",
+                "access": INVOKE_ACCESS[op],
+                "method": {
+                    "is_interface": is_interface,
+                    "ref": class_type(class_name),
+                    "name": name,
+                    "args": [invocation_type(param) for param in params],
+                    "returns": invocation_type(returns),
+                },
+            }
+            if op == 0xb9:
+                instruction["stack_size"] = reader.u1()
+                reader.u1()
+            return instruction
+        case 0xba:
+            _, bootstrap, name_and_type = pool.entry(reader.u2(), 18)
+            reader.u2()
+            name, descriptor = pool.name_and_type(name_and_type)
+            params, returns = parse_method_descriptor(descriptor)
+            return {
+                "opr": "invoke",
+                "access": "dynamic",
+                "index": bootstrap,
+                "method": {
+                    "name": name,
+                    "args": [invocation_type(param) for param in params],
+                    "returns": invocation_type(returns),
+                },
+            }
+        case 0xbb:
+            return {"opr": "new", "class": pool.class_name(reader.u2())}
+        case 0xbc:
+            atype = reader.u1()
+            if atype not in NEWARRAY_TYPES:
+                raise ValueError(f"Invalid newarray type {atype} at offset {offset}")
+            return {"opr": "newarray", "dim": 1, "type": NEWARRAY_TYPES[atype]}
+        case 0xbd:
+            return {"opr": "newarray", "dim": 1, "type": invocation_type(class_type(pool.class_name(reader.u2())))}
+        case 0xbe:
+            return {"opr": "arraylength"}
+        case 0xbf:
+            return {"opr": "throw"}
+        case 0xc0 | 0xc1:
+            type = invocation_type(class_type(pool.class_name(reader.u2())))
+            return {"opr": "checkcast" if op == 0xc0 else "instanceof", "type": type}
+        case 0xc2 | 0xc3:
+            return {"opr": "monitor", "exit": op == 0xc3}
+        case 0xc4:
+            return read_wide_instruction(reader)
+        case 0xc5:
+            array_type = class_type(pool.class_name(reader.u2()))
+            return {"opr": "newarray", "dim": reader.u1(), "type": invocation_type(array_type)}
+        case 0xc6 | 0xc7:
+            return {"opr": "ifz", "condition": "is" if op == 0xc6 else "isnot", "target": offset + reader.s2()}
+        case 0xc8:
+            return {"opr": "goto", "target": offset + reader.s4()}
+
+    raise NotImplementedError(f"Opcode 0x{op:02x} at offset {offset} is not supported")
+
+
+def read_wide_instruction(reader: ByteReader) -> dict:
+    op = reader.u1()
+    if op == 0x84:
+        return {"opr": "incr", "index": reader.u2(), "amount": reader.s2()}
+    if 0x15 <= op <= 0x19:
+        return {"opr": "load", "type": LOCAL_TYPES[op - 0x15], "index": reader.u2()}
+    if 0x36 <= op <= 0x3a:
+        return {"opr": "store", "type": LOCAL_TYPES[op - 0x36], "index": reader.u2()}
+    raise NotImplementedError(f"Wide opcode 0x{op:02x} is not supported")
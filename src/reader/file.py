@@ -1,25 +1,60 @@
+import copy
+import hashlib
 import json
+from pathlib import Path
 
 # I want a case class that can either be of type Class with a string name or Base with a string name
 
-from reader.method import Method
+from reader.classfile import read_class
+from reader.method import KEEP_JSON, Method
 
 
 class File:
-    def __init__(self, name: str, source: str, bytecode: dict):
+    def __init__(self, name: str, source: str, bytecode: dict, digest: str = None):
         self.name = name
         self.source = source
         self.bytecode = bytecode
+        # Content address of the bytecode JSON, used to share files between program versions
+        self.digest = digest
         self.methods = {}
         self.scan_methods()
 
+        if not KEEP_JSON:
+            self.bytecode = None
+
+    # Reads a file from its source and either its jvm2json file or its class file, by the suffix of the bytecode path
+    # The paths may also be files inside a pack (see reader.pack)
+    # The content of the bytecode file can be given if it was already read, so it is not read again.
+    @staticmethod
+    def from_path(source_path: Path, bytecode_path: Path, bytecode: bytes = None) -> "File":
+        if bytecode is None:
+            bytecode = bytecode_path.read_bytes()
+        if bytecode_path.suffix == ".class":
+            return File.from_class_bytes(source_path.read_bytes(), bytecode)
+        return File.from_bytes(source_path.read_bytes(), bytecode)
+
+    @staticmethod
+    def from_bytes(source: bytes, json_bytes: bytes) -> "File":
+        bytecode = json.loads(json_bytes)
+        name = bytecode["name"]
+        return File(name, source.decode(), bytecode, File.digest_of(json_bytes))
+
+    # Parses the class file in process, instead of reading the JSON jvm2json made from it
+    @staticmethod
+    def from_class_bytes(source: bytes, class_bytes: bytes) -> "File":
+        bytecode = read_class(class_bytes)
+        name = bytecode["name"]
+        return File(name, source.decode(), bytecode, File.digest_of(class_bytes))
+
     @staticmethod
-    def from_path(source_path: str, json_path: str) -> "File":
-        with open(source_path, 'r') as source_file, open(json_path, 'r') as json_file:
-            source = source_file.read()
-            bytecode = json.load(json_file)
-            name = bytecode["name"]
-            return File(name, source, bytecode)
+    def digest_of(json_bytes: bytes) -> str:
+        return hashlib.sha1(json_bytes).hexdigest()
+
+    # Returns a copy of the file with another source, which shares the decoded methods with this file
+    def with_source(self, source: str) -> "File":
+        file = copy.copy(self)
+        file.source = source
+        return file
 
     def scan_methods(self):
         for method_json in self.bytecode["methods"]:
@@ -0,0 +1,114 @@
+from enum import IntEnum
+from typing import Any
+
+from reader.method_signature import MethodSignature
+
+
+class Opcode(IntEnum):
+    UNKNOWN = 0
+    LOAD = 1
+    STORE = 2
+    PUSH = 3
+    BINARY = 4
+    NEGATE = 5
+    INCR = 6
+    DUP = 7
+    GOTO = 8
+    IF = 9
+    IFZ = 10
+    INVOKE = 11
+    RETURN = 12
+    THROW = 13
+    NEW = 14
+    GET = 15
+
+    @staticmethod
+    def from_opr(opr: str) -> 'Opcode':
+        return OPCODES.get(opr, Opcode.UNKNOWN)
+
+
+OPCODES: dict[str, Opcode] = {
+    opcode.name.lower(): opcode for opcode in Opcode if opcode != Opcode.UNKNOWN
+}
+
+
+# Turns a jvm2json value into a hashable value with the same content, leaving out all offsets.
+# Offsets are left out, as these seem to alternate between decompilations.
+def freeze(json: Any) -> Any:
+    if isinstance(json, dict):
+        return tuple((k, freeze(v)) for k, v in sorted(json.items()) if k != 'offset')
+    elif isinstance(json, list):
+        return tuple(freeze(item) for item in json)
+    return json
+
+
+# A decoded jvm2json instruction. Operands are resolved once when the method is loaded,
+# so the interpreter and the call graph never have to look into the raw JSON.
+# Fields that do not apply to the opcode are None.
+class Instruction:
+    __slots__ = (
+        "opcode", "opr", "offset", "key",
+        "type", "index", "target", "condition", "operant", "amount", "words",
+        "value_type", "value", "access", "method", "class_name",
+    )
+
+    def __init__(self, opcode: Opcode, opr: str, offset: int, key: tuple):
+        self.opcode: Opcode = opcode
+        self.opr: str = opr
+        self.offset: int = offset
+        # Offset insensitive, hashable representation of the whole instruction, used for comparisons
+        self.key: tuple = key
+
+        self.type: str = None
+        self.index: int = None
+        self.target: int = None
+        self.condition: str = None
+        self.operant: str = None
+        self.amount: int = None
+        self.words: int = None
+        self.value_type: str = None
+        self.value: Any = None
+        self.access: str = None
+        self.method: MethodSignature = None
+        self.class_name: str = None
+
+    @staticmethod
+    def decode(bc: dict) -> 'Instruction':
+        opr = bc["opr"]
+        instruction = Instruction(Opcode.from_opr(opr), opr, bc.get("offset"), freeze(bc))
+
+        match instruction.opcode:
+            case Opcode.LOAD | Opcode.STORE:
+                instruction.type = bc.get("type")
+                instruction.index = bc["index"]
+            case Opcode.PUSH:
+                # The value of a pushed null is None
+                if bc["value"] is not None:
+                    instruction.value_type = bc["value"]["type"]
+                    instruction.value = bc["value"]["value"]
+            case Opcode.BINARY:
+                instruction.type = bc.get("type")
+                instruction.operant = bc["operant"]
+            case Opcode.NEGATE | Opcode.RETURN:
+                instruction.type = bc.get("type")
+            case Opcode.INCR:
+                instruction.index = bc["index"]
+                instruction.amount = bc["amount"]
+            case Opcode.DUP:
+                instruction.words = bc["words"]
+            case Opcode.GOTO:
+                instruction.target = int(bc["target"])
+            case Opcode.IF | Opcode.IFZ:
+                instruction.condition = bc["condition"]
+                instruction.target = int(bc["target"])
+            case Opcode.INVOKE:
+                instruction.access = bc["access"]
+                if instruction.access == "static":
+                    instruction.method = MethodSignature.from_bytecode(bc["method"])
+            case Opcode.NEW:
+                instruction.class_name = bc["class"]
+
+        return instruction
+
+    def __repr__(self) -> str:
+        return f"Instruction({dict(self.key)!r})"
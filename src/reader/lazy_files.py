@@ -0,0 +1,50 @@
+from pathlib import Path
+from typing import Iterator, Mapping, Tuple
+
+from reader.file import File
+
+
+# A read-only mapping from class name to File, which only parses a file the first time it is accessed.
+# Membership checks and iteration only use the (source path, bytecode path) index, and never touch the disk.
+class LazyFiles(Mapping[str, File]):
+    def __init__(self, paths: dict[str, Tuple[Path, Path]]):
+        self.paths = paths
+        self.loaded: dict[str, File] = {}
+
+    @staticmethod
+    def index(pairs: Iterator[Tuple[Path, Path]], source_root_path: Path) -> 'LazyFiles':
+        return LazyFiles({
+            source_file.relative_to(source_root_path).with_suffix("").as_posix(): (source_file, bytecode_file)
+            for source_file, bytecode_file in pairs
+        })
+
+    def __getitem__(self, name: str) -> File:
+        file = self.loaded.get(name)
+        if file is None:
+            source_path, bytecode_path = self.paths[name]
+            file = File.from_path(source_path, bytecode_path)
+            self.loaded[name] = file
+        return file
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.paths
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    # Returns the digest of the bytecode of a class, without parsing it if it has not been loaded yet
+    def digest(self, name: str) -> str:
+        if name in self.loaded:
+            return self.loaded[name].digest
+        _, bytecode_path = self.paths[name]
+        return File.digest_of(bytecode_path.read_bytes())
+
+    # Returns the source of a class, without parsing its bytecode if it has not been loaded yet
+    def source(self, name: str) -> str:
+        if name in self.loaded:
+            return self.loaded[name].source
+        source_path, _ = self.paths[name]
+        return source_path.read_text()
@@ -1,13 +1,30 @@
+import hashlib
+import os
+from reader.instruction import Instruction
 from reader.method_signature import MethodSignature
-import jmespath
+
+# The raw jvm2json bytecode is only kept on files and methods if this is set (e.g. for debugging),
+# all analyses work on the decoded instructions
+KEEP_JSON = os.getenv("KEEP_BYTECODE_JSON", "0") == "1"
 
 class Method:
 
     def __init__(self, class_name, json) -> None:
         self.class_name = class_name
-        self.json = json
+        self.json = json if KEEP_JSON else None
         self.name = json['name']
-        self.bytecode = json['code']['bytecode']
+        # Abstract and native methods have no code
+        bytecode = json['code']['bytecode'] if json.get('code') is not None else []
+        self.bytecode = bytecode if KEEP_JSON else None
+        self.instructions: list[Instruction] = [
+            Instruction.decode(bc) for bc in bytecode
+        ]
+        self.fingerprint: int = Method.fingerprint_of(self.instructions)
+        # The annotation class names and the test flag are computed once, as tests are listed many times per stage
+        self.annotations: frozenset[str] = frozenset(
+            annotation["type"] for annotation in json.get('annotations', [])
+        )
+        self.test = any(annotation.endswith('Test') for annotation in self.annotations)
         self.signature = MethodSignature.from_class_method(
             self.class_name, 
             self.name, 
@@ -17,4 +34,11 @@ class Method:
 
     # Returns true if the method has an annotation class that ends with 'Test'
     def is_test(self):
-        return bool(jmespath.search("annotations[?ends_with(type, 'Test')]", self.json))
+        return self.test
+
+    # An offset insensitive hash of the instructions, so checking whether a method changed is a single int compare.
+    # It is stable across processes (unlike hash()), as methods from snapshots are compared with freshly decoded ones.
+    @staticmethod
+    def fingerprint_of(instructions: list[Instruction]) -> int:
+        keys = repr([instruction.key for instruction in instructions]).encode()
+        return int.from_bytes(hashlib.blake2b(keys, digest_size=8).digest(), "little")
@@ -1,15 +1,44 @@
 from dataclasses import dataclass
+from functools import cached_property
 import sys
+import threading
 
-@dataclass(frozen=True)
+# Method signatures are interned in a process wide table, which gives every signature a small integer id.
+# Hashing and equality use the id, and the sort key is cached, so signatures are as cheap as ints in hot loops.
+@dataclass(frozen=True, eq=False)
 class MethodSignature:
     class_name: str
     name: str
     return_type: str
     parameters: tuple[str]
 
+    @cached_property
+    def id(self) -> int:
+        return SIGNATURES.id(self)
+
+    @cached_property
+    def sort_key(self) -> str:
+        return str(self)
+
+    def __hash__(self) -> int:
+        return self.id
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, MethodSignature):
+            return NotImplemented
+        return self.id == other.id
+
     def __lt__(self, other: 'MethodSignature') -> bool:
-        return str(self) < str(other)
+        return self.sort_key < other.sort_key
+
+    # Ids are only valid within a process, so pickled signatures are interned again when they are loaded
+    def __reduce__(self):
+        return (intern_signature, (self.class_name, self.name, self.return_type, self.parameters))
+
+    def intern(self) -> 'MethodSignature':
+        return SIGNATURES.intern(self)
 
     @staticmethod
     def from_class_method(
@@ -23,7 +52,7 @@ class MethodSignature:
             method_name,
             MethodSignature.type_str(returns),
             tuple(MethodSignature.type_str(param) for param in params),
-        )
+        ).intern()
 
 
     @staticmethod
@@ -48,7 +77,7 @@ class MethodSignature:
             name=i["method_name"],
             parameters=tuple(type_map[j] for j in i["params"]),
             return_type=type_map[i["return"]],
-        )
+        ).intern()
 
 
     @staticmethod
@@ -63,7 +92,7 @@ class MethodSignature:
             method_name,
             MethodSignature.invocation_type_str(returns),
             tuple(MethodSignature.invocation_type_str(param) for param in params),
-        )
+        ).intern()
 
 
     @staticmethod
@@ -85,11 +114,16 @@ class MethodSignature:
         if json == None or "type" in json and json["type"] == None:
             return "void"
         
-        if "type" in json:
+        # Parameters and returns wrap their type in {"type": ...}, array types of invocations are not wrapped
+        if "type" in json and "kind" not in json:
             type_json = json["type"]
         else:
             type_json = json
 
+        # Invocations name the element type of arrays of base types by a plain string
+        if isinstance(type_json, str):
+            return type_json
+
         if "base" in type_json:
             return type_json["base"]
         
@@ -107,3 +141,44 @@ class MethodSignature:
 
     def __repr__(self):
         return str(self)
+
+
+# Maps every method signature to a small integer id, and back.
+# The first signature seen with a given content becomes the canonical instance for that content.
+class SignatureTable:
+    def __init__(self):
+        self.ids: dict[tuple, int] = {}
+        self.signatures: list[MethodSignature] = []
+        self.lock = threading.Lock()
+
+    def id(self, signature: MethodSignature) -> int:
+        return self.intern(signature).__dict__["id"]
+
+    # Returns the canonical instance for the signature
+    def intern(self, signature: MethodSignature) -> MethodSignature:
+        key = (signature.class_name, signature.name, signature.return_type, signature.parameters)
+        id = self.ids.get(key)
+
+        if id is None:
+            with self.lock:
+                id = self.ids.get(key)
+                if id is None:
+                    id = len(self.signatures)
+                    signature.__dict__["id"] = id
+                    self.signatures.append(signature)
+                    self.ids[key] = id
+
+        return self.signatures[id]
+
+    def signature(self, id: int) -> MethodSignature:
+        return self.signatures[id]
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+
+SIGNATURES = SignatureTable()
+
+
+def intern_signature(class_name: str, name: str, return_type: str, parameters: tuple[str]) -> MethodSignature:
+    return MethodSignature(class_name, name, return_type, parameters).intern()
@@ -0,0 +1,124 @@
+import json
+import mmap
+import os
+from pathlib import Path
+import struct
+from typing import Iterable, Tuple
+
+# Name of the pack file stored at the root of a data directory (e.g. data/new)
+PACK_NAME = "bytecode.pack"
+
+PACK_MAGIC = b"PTSPACK1"
+
+# Magic, offset and length of the index, which is stored after the file contents
+PACK_HEADER = struct.Struct("<8sQQ")
+
+
+# A file inside a pack. It stands in for the Path of the unpacked file wherever the reader only reads whole files,
+# so snapshots, sharing and lazy loading work the same for packed and unpacked data directories.
+class PackedPath:
+    def __init__(self, path: Path, data: bytes | mmap.mmap, offset: int, length: int):
+        self.path = path
+        self.data = data
+        self.offset = offset
+        self.length = length
+
+    @property
+    def suffix(self) -> str:
+        return self.path.suffix
+
+    def read_bytes(self) -> bytes:
+        return self.data[self.offset:self.offset + self.length]
+
+    def read_text(self) -> str:
+        return self.read_bytes().decode()
+
+    def relative_to(self, other: Path) -> Path:
+        return self.path.relative_to(other)
+
+    # Worker processes are sent the content of the file instead of the mapped pack
+    def __reduce__(self):
+        data = self.read_bytes()
+        return (PackedPath, (self.path, data, 0, len(data)))
+
+    def __repr__(self) -> str:
+        return f"PackedPath({str(self.path)!r})"
+
+
+# A single file holding the sources and bytecode of a data directory, so a program can be loaded without
+# opening, or even listing, one file per class. The pack is memory mapped, and its index maps the path of
+# every file relative to the data directory (e.g. bytecode/org/example/Math.json) to its offset and length.
+class Pack:
+    def __init__(self, root: Path, data: mmap.mmap, index: dict[str, Tuple[int, int]]):
+        self.root = root
+        self.data = data
+        self.index = index
+
+    @staticmethod
+    def path(data_dir: Path) -> Path:
+        return data_dir / PACK_NAME
+
+    # Opens the pack of a data directory, returns None if it has none
+    @staticmethod
+    def open(data_dir: Path) -> 'Pack | None':
+        try:
+            with open(Pack.path(data_dir), "rb") as pack_file:
+                data = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+
+        magic, index_offset, index_length = PACK_HEADER.unpack_from(data)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"{Pack.path(data_dir)} is not a pack")
+
+        index = json.loads(data[index_offset:index_offset + index_length])
+        return Pack(data_dir, data, {key: tuple(entry) for key, entry in index.items()})
+
+    # Packs the given files of a data directory, which are given by their path relative to it
+    @staticmethod
+    def write(data_dir: Path, files: Iterable[Path]) -> Path:
+        path = Pack.path(data_dir)
+        tmp_path = path.with_suffix(".tmp")
+        index: dict[str, Tuple[int, int]] = {}
+
+        with open(tmp_path, "wb") as pack_file:
+            pack_file.write(PACK_HEADER.pack(PACK_MAGIC, 0, 0))
+            offset = PACK_HEADER.size
+
+            for file in files:
+                content = (data_dir / file).read_bytes()
+                pack_file.write(content)
+                index[Path(file).as_posix()] = (offset, len(content))
+                offset += len(content)
+
+            index_bytes = json.dumps(index, separators=(",", ":")).encode()
+            pack_file.write(index_bytes)
+            pack_file.seek(0)
+            pack_file.write(PACK_HEADER.pack(PACK_MAGIC, offset, len(index_bytes)))
+
+        os.replace(tmp_path, path)
+        return path
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def file(self, key: str) -> PackedPath:
+        if key not in self.index:
+            raise FileNotFoundError(f"{key} is not in {Pack.path(self.root)}")
+        offset, length = self.index[key]
+        return PackedPath(self.root / key, self.data, offset, length)
+
+    # Returns the (source, bytecode) pairs of the packed sources below source_dir, like Program.file_pairs does
+    # for unpacked directories. Classes without a jvm2json file are read from their class file.
+    def file_pairs(self, source_dir: str, bytecode_dir: str, class_dir: str) -> list[Tuple[PackedPath, PackedPath]]:
+        pairs = []
+        prefix = f"{source_dir}/"
+        for key in self.index:
+            if not key.startswith(prefix) or not key.endswith(".java"):
+                continue
+            relative_path = key[len(prefix):-len(".java")]
+            bytecode_key = f"{bytecode_dir}/{relative_path}.json"
+            if bytecode_key not in self.index:
+                bytecode_key = f"{class_dir}/{relative_path}.class"
+            pairs.append((self.file(key), self.file(bytecode_key)))
+        return pairs
@@ -1,29 +1,256 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Iterable, Tuple
+from timeit import default_timer as timer
+from typing import Iterable, Mapping, Tuple
 from reader.file import File
+from reader.lazy_files import LazyFiles
 from pathlib import Path
+import os
 from reader.method import Method
 from reader.method_signature import MethodSignature
+from reader.pack import Pack
+from reader.snapshot import Snapshot
+import logging as l
+
+
+# Decodes a single file and measures the time it took. Must be a module level function,
+# so it can be sent to worker processes. The bytecode is given if it was already read.
+def decode_file(source_path: Path, bytecode_path: Path, bytecode: bytes = None) -> Tuple[File, float]:
+    start = timer()
+    file = File.from_path(source_path, bytecode_path, bytecode)
+    return file, timer() - start
+
+
+# What loading a program did: the summed time spent decoding files (in whichever process decoded them),
+# the number of files decoded, and the number of files taken from the snapshot or shared with the base program
+# instead of being decoded
+@dataclass
+class LoadStats:
+    decode_time: float = 0.0
+    decoded: int = 0
+    snapshot: int = 0
+    shared: int = 0
+
+    def __add__(self, other: 'LoadStats') -> 'LoadStats':
+        return LoadStats(
+            self.decode_time + other.decode_time,
+            self.decoded + other.decoded,
+            self.snapshot + other.snapshot,
+            self.shared + other.shared
+        )
+
 
 @dataclass
 class Program:
-    files: dict[str, File] = field(default_factory=dict)
-    test_files: dict[str, File] = field(default_factory=dict)
+    files: Mapping[str, File] = field(default_factory=dict)
+    test_files: Mapping[str, File] = field(default_factory=dict)
+    load_stats: LoadStats = field(default_factory=LoadStats, repr=False)
+    # Flat signature -> method index, filled one class at a time by find_method
+    method_index: dict[MethodSignature, Method] = field(default_factory=dict, init=False, repr=False)
+    indexed_classes: set[str] = field(default_factory=set, init=False, repr=False)
+    test_method_list: list[Tuple[File, Method]] = field(default=None, init=False, repr=False)
 
+    # Returns a generator of (source, bytecode) path pairs below the given roots.
+    # If a class root is given, classes without a jvm2json file are read from their class file instead.
     @staticmethod
-    def scan_files(target: dict[str, File], source_root_path: Path, bytecode_root_path: Path):
+    def file_pairs(source_root_path: Path, bytecode_root_path: Path, class_root_path: Path = None) -> Iterable[Tuple[Path, Path]]:
         for source_file in source_root_path.rglob("*.java"):
-            bytecode_file = bytecode_root_path / source_file.relative_to(source_root_path).with_suffix(".json")
-            file = File.from_path(source_file, bytecode_file)
+            relative_path = source_file.relative_to(source_root_path)
+            bytecode_file = bytecode_root_path / relative_path.with_suffix(".json")
+            if class_root_path is not None and not bytecode_file.exists():
+                bytecode_file = class_root_path / relative_path.with_suffix(".class")
+            yield source_file, bytecode_file
+
+    # Returns the (source, bytecode) path pairs of the main or the test classes of a data directory,
+    # which are files inside the pack of the data directory if it has one
+    @staticmethod
+    def data_pairs(data_dir: Path, test: bool = False, pack: Pack = None) -> list[Tuple[Path, Path]]:
+        prefix = "test-" if test else ""
+        if pack is not None:
+            return pack.file_pairs(f"{prefix}source", f"{prefix}bytecode", f"{prefix}classes")
+        return list(Program.file_pairs(data_dir / f"{prefix}source", data_dir / f"{prefix}bytecode", data_dir / f"{prefix}classes"))
+
+    # Decodes the given (source, bytecode) path pairs, in parallel if an executor is given.
+    # Files whose bytecode digest is in shared are not decoded, but share the methods of that file.
+    # The content of the bytecode files can be given if it was already read, so every file is only read once.
+    # The decoded and shared files, and the time spent decoding, are counted in stats.
+    @staticmethod
+    def decode_files(
+        pairs: list[Tuple[Path, Path]],
+        stats: LoadStats,
+        executor: Executor = None,
+        shared: dict[str, File] = None,
+        contents: list[bytes] = None
+    ) -> list[File]:
+        files: list[File] = [None] * len(pairs)
+        missing: list[int] = []
+        missing_contents: list[bytes] = []
+
+        for i, (source_path, bytecode_path) in enumerate(pairs):
+            bytecode = contents[i] if contents is not None else None
+            if not shared:
+                missing.append(i)
+                missing_contents.append(bytecode)
+                continue
+
+            if bytecode is None:
+                bytecode = bytecode_path.read_bytes()
+            file = shared.get(File.digest_of(bytecode))
+            if file is None:
+                missing.append(i)
+                missing_contents.append(bytecode)
+                continue
+
+            source = source_path.read_bytes().decode()
+            files[i] = file if file.source == source else file.with_source(source)
+
+        stats.shared += len(pairs) - len(missing)
+        if not missing:
+            return files
+
+        missing_args = [(*pairs[i], bytecode) for i, bytecode in zip(missing, missing_contents)]
+        if executor is None:
+            results = [decode_file(*args) for args in missing_args]
+        else:
+            chunksize = max(1, len(missing_args) // (4 * (os.cpu_count() or 1)))
+            results = list(executor.map(decode_file, *zip(*missing_args), chunksize=chunksize))
+
+        for i, (file, _) in zip(missing, results):
+            files[i] = file
+
+        stats.decoded += len(missing)
+        stats.decode_time += sum(time for _, time in results)
+        return files
+
+    # Scans the files of the given path pairs into target
+    @staticmethod
+    def scan_files(
+        target: dict[str, File],
+        pairs: list[Tuple[Path, Path]],
+        stats: LoadStats,
+        executor: Executor = None,
+        shared: dict[str, File] = None
+    ):
+        for file in Program.decode_files(pairs, stats, executor, shared):
+            target[file.name] = file
+
+    # Scans the files of the given path pairs into target, taking unchanged files from the previous snapshot
+    @staticmethod
+    def scan_snapshot(
+        target: dict[str, File],
+        snapshot: Snapshot,
+        previous: Snapshot,
+        data_dir: Path,
+        pairs: list[Tuple[Path, Path]],
+        stats: LoadStats,
+        executor: Executor = None,
+        shared: dict[str, File] = None
+    ):
+        rebuilt = snapshot.rebuilt
+        for file in snapshot.files(previous, data_dir, pairs, lambda pairs, contents: Program.decode_files(pairs, stats, executor, shared, contents)):
             target[file.name] = file
+        stats.snapshot += len(pairs) - (snapshot.rebuilt - rebuilt)
 
+    # Loads a program from a data directory (e.g. data/new).
+    # Classes are read from their jvm2json file, or parsed from their class file if rotation did not write JSON for them.
+    # If rotation packed the data directory, all files are read from the memory mapped pack instead.
+    # With snapshot=True the decoded files are cached in a snapshot inside the data directory,
+    # and only files whose content changed since the snapshot was written are decoded again.
+    # With lazy=True only an index of the files is built, and each file is parsed on first access.
+    # With jobs > 1 (or a shared executor) the files are decoded in parallel worker processes.
+    # With a base program (e.g. the previous version), files whose bytecode is byte-identical to a file
+    # of the base are not decoded, but share its File and Method objects.
     @staticmethod
-    def load(data_dir: Path) -> 'Program':
+    def load(
+        data_dir: Path,
+        snapshot: bool = False,
+        lazy: bool = False,
+        jobs: int = 1,
+        executor: Executor = None,
+        base: 'Program' = None
+    ) -> 'Program':
+        if snapshot and lazy:
+            raise ValueError("A program can not be loaded both lazily and from a snapshot")
+
+        if lazy:
+            return Program.load_lazy(data_dir, Pack.open(data_dir))
+
+        if executor is None and jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                return Program.load(data_dir, snapshot=snapshot, executor=executor, base=base)
+
+        shared = base.files_by_digest() if base is not None else None
+
+        pack = Pack.open(data_dir)
+
+        if snapshot:
+            return Program.load_snapshot(data_dir, executor, shared, pack)
+
         program = Program()
-        Program.scan_files(program.files,      data_dir / "source",      data_dir / "bytecode")
-        Program.scan_files(program.test_files, data_dir / "test-source", data_dir / "test-bytecode")
+        Program.scan_files(program.files,      Program.data_pairs(data_dir, False, pack), program.load_stats, executor, shared)
+        Program.scan_files(program.test_files, Program.data_pairs(data_dir, True, pack),  program.load_stats, executor, shared)
         return program
 
+    # Loads the old and new version of a program.
+    # With share=True the new version is loaded after the old one, and shares all unchanged files with it.
+    # Otherwise, with jobs > 1 both versions are loaded at the same time on one process pool, so their decoding overlaps.
+    @staticmethod
+    def load_pair(old_dir: Path, new_dir: Path, jobs: int = 1, share: bool = True, **kwargs) -> Tuple['Program', 'Program']:
+        if jobs <= 1:
+            old_program = Program.load(old_dir, **kwargs)
+            return old_program, Program.load(new_dir, base=old_program if share else None, **kwargs)
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            if share:
+                old_program = Program.load(old_dir, executor=executor, **kwargs)
+                return old_program, Program.load(new_dir, executor=executor, base=old_program, **kwargs)
+
+            with ThreadPoolExecutor(max_workers=2) as loader:
+                old_future = loader.submit(Program.load, old_dir, executor=executor, **kwargs)
+                new_future = loader.submit(Program.load, new_dir, executor=executor, **kwargs)
+                return old_future.result(), new_future.result()
+
+    @staticmethod
+    def load_snapshot(data_dir: Path, executor: Executor = None, shared: dict[str, File] = None, pack: Pack = None) -> 'Program':
+        previous = Snapshot.read(data_dir)
+        snapshot = Snapshot()
+
+        program = Program()
+        Program.scan_snapshot(program.files,      snapshot, previous, data_dir, Program.data_pairs(data_dir, False, pack), program.load_stats, executor, shared)
+        Program.scan_snapshot(program.test_files, snapshot, previous, data_dir, Program.data_pairs(data_dir, True, pack),  program.load_stats, executor, shared)
+
+        if snapshot.is_dirty(previous):
+            l.debug(f"Rebuilt {snapshot.rebuilt} of {len(snapshot.entries)} files in snapshot of {data_dir}")
+            snapshot.write(data_dir)
+
+        return program
+
+    @staticmethod
+    def load_lazy(data_dir: Path, pack: Pack = None) -> 'Program':
+        return Program(
+            LazyFiles.index(Program.data_pairs(data_dir, False, pack), data_dir / "source"),
+            LazyFiles.index(Program.data_pairs(data_dir, True, pack),  data_dir / "test-source"),
+        )
+
+    # Returns all loaded files by the digest of their bytecode
+    def files_by_digest(self) -> dict[str, File]:
+        files: dict[str, File] = {}
+        for target in (self.files, self.test_files):
+            loaded = target.loaded if isinstance(target, LazyFiles) else target
+            for file in loaded.values():
+                if file.digest is not None:
+                    files[file.digest] = file
+        return files
+
+    # Returns a generator of the sources of all non-test files, without parsing bytecode of lazy files
+    def sources(self) -> Iterable[str]:
+        if isinstance(self.files, LazyFiles):
+            for name in self.files:
+                yield self.files.source(name)
+        else:
+            for file in self.files.values():
+                yield file.source
+
     # Returns a generator of all methods in the program
     def all_methods(self) -> Iterable[Tuple[File, Method]]:
         for file in self.files.values():
@@ -32,25 +259,42 @@ class Program:
 
     # Returns a generator of all test methods in the program
     def all_test_methods(self) -> Iterable[Tuple[File, Method]]:
-        for file in self.test_files.values():
-            for method in file.methods.values():
-                if method.is_test():
-                    yield file, method
+        yield from self.test_methods()
+
+    # Returns the list of all test methods in the program, which is computed on first use
+    def test_methods(self) -> list[Tuple[File, Method]]:
+        if self.test_method_list is None:
+            self.test_method_list = [
+                (file, method)
+                for file in self.test_files.values()
+                for method in file.methods.values()
+                if method.is_test()
+            ]
+        return self.test_method_list
 
     # Looks up a method by its signature by first checking the main files and then the test files
     # Raises KeyError if the method is not found
     def method(self, signature: MethodSignature) -> Method:
-        if signature.class_name in self.files:
-            return self.files[signature.class_name].methods[signature]
-        elif signature.class_name in self.test_files:
-            return self.test_files[signature.class_name].methods[signature]
-        else:
+        method = self.find_method(signature)
+        if method is None:
             raise KeyError(f"Method {signature} not found in program")
-    
+        return method
+
+    # Looks up a method by its signature in the flat method index, returns None if it is not found.
+    # The methods of a class are added to the index the first time any method of the class is looked up.
+    def find_method(self, signature: MethodSignature) -> Method | None:
+        method = self.method_index.get(signature)
+        if method is None and signature.class_name not in self.indexed_classes:
+            self.index_class(signature.class_name)
+            method = self.method_index.get(signature)
+        return method
 
     def contains_method(self, signature: MethodSignature) -> bool:
-        try:
-            self.method(signature)
-            return True
-        except KeyError:
-            return False
+        return self.find_method(signature) is not None
+
+    def index_class(self, class_name: str):
+        if class_name in self.files:
+            self.method_index.update(self.files[class_name].methods)
+        elif class_name in self.test_files:
+            self.method_index.update(self.test_files[class_name].methods)
+        self.indexed_classes.add(class_name)
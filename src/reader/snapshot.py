@@ -0,0 +1,109 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+import hashlib
+import pickle
+import logging as l
+
+from reader.file import File
+from reader.method import KEEP_JSON
+
+# Name of the snapshot file stored at the root of a data directory (e.g. data/new)
+SNAPSHOT_NAME = "program.snapshot"
+
+# Bump this whenever the pickled layout of File or Method changes, so stale snapshots are rebuilt
+SNAPSHOT_VERSION = 5
+
+
+# A compiled, pickled image of all decoded files in a data directory.
+# Entries are keyed by the bytecode path relative to the data directory and carry
+# a content hash of the source and bytecode, so only changed files are decoded again.
+@dataclass
+class Snapshot:
+    version: int = SNAPSHOT_VERSION
+    keep_json: bool = KEEP_JSON
+    entries: dict[str, tuple[str, File]] = field(default_factory=dict)
+    rebuilt: int = 0
+
+    @staticmethod
+    def path(data_dir: Path) -> Path:
+        return data_dir / SNAPSHOT_NAME
+
+    @staticmethod
+    def digest(source: bytes, bytecode: bytes) -> str:
+        h = hashlib.sha1(source)
+        h.update(b"\0")
+        h.update(bytecode)
+        return h.hexdigest()
+
+    # Reads the snapshot of a data directory in a single bulk read.
+    # Returns an empty snapshot if there is none, or if it is stale or unreadable.
+    @staticmethod
+    def read(data_dir: Path) -> 'Snapshot':
+        try:
+            snapshot = pickle.loads(Snapshot.path(data_dir).read_bytes())
+        except FileNotFoundError:
+            return Snapshot()
+        except Exception as e:
+            l.debug(f"Ignoring unreadable snapshot in {data_dir}: {e}")
+            return Snapshot()
+
+        if not isinstance(snapshot, Snapshot) or snapshot.version != SNAPSHOT_VERSION or snapshot.keep_json != KEEP_JSON:
+            l.debug(f"Ignoring stale snapshot in {data_dir}")
+            return Snapshot()
+
+        snapshot.rebuilt = 0
+        return snapshot
+
+    # Writes the snapshot atomically, so concurrent readers never see a partial file
+    def write(self, data_dir: Path):
+        path = Snapshot.path(data_dir)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            tmp_path.write_bytes(pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL))
+            tmp_path.replace(path)
+        except OSError as e:
+            l.warning(f"Could not write snapshot to {path}: {e}")
+
+    # Returns the decoded files for the given (source, bytecode) path pairs, reusing the previous
+    # snapshot for files whose content is unchanged. The remaining files are decoded with decode.
+    def files(
+        self,
+        previous: 'Snapshot',
+        data_dir: Path,
+        pairs: list[tuple[Path, Path]],
+        decode: Callable[[list[tuple[Path, Path]], list[bytes]], list[File]]
+    ) -> list[File]:
+        keys: list[tuple[str, str]] = []
+        files: list[File] = []
+        missing: list[int] = []
+        contents: list[bytes] = []
+
+        for i, (source_path, bytecode_path) in enumerate(pairs):
+            key = bytecode_path.relative_to(data_dir).as_posix()
+            bytecode = bytecode_path.read_bytes()
+            digest = Snapshot.digest(source_path.read_bytes(), bytecode)
+            keys.append((key, digest))
+
+            entry = previous.entries.get(key)
+            if entry is not None and entry[0] == digest:
+                files.append(entry[1])
+            else:
+                files.append(None)
+                missing.append(i)
+                contents.append(bytecode)
+
+        if missing:
+            # The bytecode that was read for the digest is passed on, so changed files are only read once
+            for i, file in zip(missing, decode([pairs[i] for i in missing], contents)):
+                files[i] = file
+            self.rebuilt += len(missing)
+
+        for (key, digest), file in zip(keys, files):
+            self.entries[key] = (digest, file)
+
+        return files
+
+    # Returns true if the snapshot differs from the previous one and must be written back
+    def is_dirty(self, previous: 'Snapshot') -> bool:
+        return self.rebuilt > 0 or self.entries.keys() != previous.entries.keys()
@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+from typing import List, Set, Tuple
+from weakref import WeakKeyDictionary
+
+from reader.instruction import Instruction, Opcode
+from reader.method import Method
+
+
+# The control flow graph of a method, over the indices of its instructions (which are the offsets of the interpreter).
+# Blocks are numbered in program order, block 0 starts at the entry of the method.
+@dataclass
+class ControlFlowGraph:
+    # The first instruction of every block
+    leaders: List[int]
+    # The block of every instruction
+    block_of: List[int]
+    # The successor blocks of every block
+    successors: List[List[int]]
+    # Edges (from block, to block) to a block whose depth first walk has not finished, which close a loop
+    back_edges: Set[Tuple[int, int]]
+    # The blocks in reverse postorder, starting with the entry. Blocks that are unreachable from the entry come last.
+    block_order: List[int]
+    # The position of every instruction when the blocks are walked in reverse postorder.
+    # Used as priority of the worklist, so a block is only analysed after the blocks that flow into it (except loops).
+    order: List[int]
+
+    # The first instructions of the blocks that back edges jump to
+    @property
+    def loop_heads(self) -> Set[int]:
+        return {self.leaders[head] for _, head in self.back_edges}
+
+
+# Returns the indices of the instructions that may run after an instruction
+def instruction_successors(instructions: List[Instruction], index: int) -> List[int]:
+    instruction = instructions[index]
+    following = [index + 1] if index + 1 < len(instructions) else []
+
+    match instruction.opcode:
+        case Opcode.GOTO:
+            return [instruction.target]
+        case Opcode.IF | Opcode.IFZ:
+            return following + [instruction.target]
+        case Opcode.RETURN | Opcode.THROW:
+            return []
+        case _:
+            return following
+
+
+# Control flow graphs of the methods analysed so far. Methods are shared by all interpreters of a program
+# (and by unchanged classes of program versions), so every method is only analysed once.
+CFGS: 'WeakKeyDictionary[Method, ControlFlowGraph]' = WeakKeyDictionary()
+
+
+# Returns the control flow graph of a method, which is built on first use
+def method_cfg(method: Method) -> ControlFlowGraph:
+    cfg = CFGS.get(method)
+    if cfg is None:
+        cfg = CFGS[method] = build_cfg(method.instructions)
+    return cfg
+
+
+# Splits the instructions into basic blocks. Besides jumps and their targets, every call is a block of its own:
+# the interpreter keeps the state before a call, and continues after the call when the callee returns.
+def build_cfg(instructions: List[Instruction]) -> ControlFlowGraph:
+    leaders = {0} if instructions else set()
+    for index, instruction in enumerate(instructions):
+        if instruction.opcode in (Opcode.GOTO, Opcode.IF, Opcode.IFZ, Opcode.RETURN, Opcode.THROW, Opcode.INVOKE):
+            leaders.update(instruction_successors(instructions, index))
+            if index + 1 < len(instructions):
+                leaders.add(index + 1)
+            if instruction.opcode == Opcode.INVOKE:
+                leaders.add(index)
+    leaders = sorted(leaders)
+
+    block_of = [0] * len(instructions)
+    for block, start in enumerate(leaders):
+        end = leaders[block + 1] if block + 1 < len(leaders) else len(instructions)
+        for index in range(start, end):
+            block_of[index] = block
+
+    successors = []
+    for block, start in enumerate(leaders):
+        last = leaders[block + 1] - 1 if block + 1 < len(leaders) else len(instructions) - 1
+        successors.append([block_of[successor] for successor in instruction_successors(instructions, last)])
+
+    block_order, back_edges = reverse_postorder(successors)
+
+    order = [0] * len(instructions)
+    position = 0
+    for block in block_order:
+        end = leaders[block + 1] if block + 1 < len(leaders) else len(instructions)
+        for index in range(leaders[block], end):
+            order[index] = position
+            position += 1
+
+    return ControlFlowGraph(leaders, block_of, successors, back_edges, block_order, order)
+
+
+# Walks the blocks depth first from the entry, and then from every block that was not reached yet.
+# Returns the blocks in reverse postorder of every walk, and the back edges found by the walks.
+def reverse_postorder(successors: List[List[int]]) -> Tuple[List[int], Set[Tuple[int, int]]]:
+    # 0: not walked yet, 1: being walked, 2: done
+    state = [0] * len(successors)
+    back_edges: Set[Tuple[int, int]] = set()
+    block_order: List[int] = []
+
+    for root in range(len(successors)):
+        if state[root] != 0:
+            continue
+
+        postorder = []
+        state[root] = 1
+        stack = [(root, 0)]
+        while stack:
+            block, i = stack[-1]
+            if i < len(successors[block]):
+                stack[-1] = (block, i + 1)
+                successor = successors[block][i]
+                if state[successor] == 0:
+                    state[successor] = 1
+                    stack.append((successor, 0))
+                elif state[successor] == 1:
+                    back_edges.add((block, successor))
+                continue
+
+            stack.pop()
+            state[block] = 2
+            postorder.append(block)
+
+        block_order.extend(reversed(postorder))
+
+    return block_order, back_edges
@@ -1,28 +1,120 @@
-from typing import Dict, Iterable, List, Set, Tuple
+import heapq
+import os
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+from static_analysis.cfg import ControlFlowGraph, method_cfg
 from static_analysis.interpreter.common import PC, NextState, ReturnValue, Action
 from static_analysis.interpreter.abstractions import AbstractState, BoolSet, Bot, RefSet
-from reader import Program, MethodSignature
+from reader import Instruction, Opcode, Program, MethodSignature
 import logging as l
 
+# Runs the straight-line instructions of a basic block back to back, and only keeps the states at block leaders.
+# If disabled, every instruction is a block of its own, and the state of every instruction is kept and joined.
+BLOCK_EXECUTION = os.getenv("INTERPRETER_BLOCKS", "1") == "1"
+
+# The number of times a new state is joined into the state of a widening point, before they are widened instead
+WIDENING_DELAY = int(os.getenv("WIDENING_DELAY", "0"))
+
+# The handlers of an interpreter class as a table indexed by opcode, which are the step_<opr> methods of the class
+def dispatch_table(cls: type) -> tuple:
+    return tuple(getattr(cls, f"step_{opcode.name.lower()}") for opcode in Opcode)
+
+
 class AbstractInterpreter:
+    # Built once per interpreter class, see __init_subclass__
+    handlers: tuple = ()
+
     def __init__(self, program: Program):
         self.program = program
+        # The number of states generated, the number of blocks stepped, the number of states joined,
+        # and the number of states kept by the analysis
         self.generated = 0
+        self.iterations = 0
+        self.joins = 0
+        self.stored = 0
         self.final = set()
         self.errors = set()
+        # The handler and instruction of every offset of the methods stepped so far
+        self.code: Dict[MethodSignature, List[Tuple[Callable, Instruction]]] = {}
+        self.cfgs: Dict[MethodSignature, ControlFlowGraph] = {}
+        # A byte per offset of the methods stepped so far (and one past the end), which is 1 at block leaders
+        self.leaders: Dict[MethodSignature, bytearray] = {}
+        self.blocks = BLOCK_EXECUTION
+        # A byte per offset of the methods reached so far, which is 1 at the offsets whose states are widened
+        self.widening_points: Dict[MethodSignature, bytearray] = {}
+        self.widening_delay = WIDENING_DELAY
         
         # Must be set up by the subclass
         self.int_arithmetic = None
         self.bool_arithmetic = None
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.handlers = dispatch_table(cls)
+
+    # Runs the analysis to a fixpoint. The worklist holds every PC at most once, and steps the PCs of the most recently
+    # entered method first (so callees finish before their callers go on), in reverse postorder of the method.
+    # States are only kept at block leaders, and a block is stepped from its leader on a single state, until the
+    # next leader or until an instruction does not simply fall through. Returns the offsets reached in every method.
     def analyse(self, pc: PC, initial_state: AbstractState) -> Dict[MethodSignature, Set[int]]:
         states: Dict[PC, AbstractState] = {pc: initial_state}
-        needs_work: List[PC] = [pc]
+        # The last offset reached from every stepped PC, which gives the touched offsets of its block
+        reached: Dict[PC, int] = {}
+        # The number of times a new state has been joined into the state of every widening point
+        joined: Dict[PC, int] = {}
+        debug = l.getLogger().isEnabledFor(l.DEBUG)
+
+        needs_work: List[Tuple[int, int, PC]] = []
+        queued: Set[PC] = set()
+        # The negated rank (methods are ranked by when they are first reached) and the reverse postorder of every method
+        priorities: Dict[MethodSignature, Tuple[int, List[int]]] = {}
+
+        def add_work(pc: PC):
+            if pc in queued:
+                return
+            queued.add(pc)
+            priority = priorities.get(pc.signature)
+            if priority is None:
+                priority = priorities[pc.signature] = (-len(priorities), self.cfg(pc.signature).order)
+            heapq.heappush(needs_work, (priority[0], priority[1][pc.offset], pc))
+
+        add_work(pc)
 
         while needs_work:
-            curr_idx = needs_work.pop()
+            _, _, start = heapq.heappop(needs_work)
+            queued.remove(start)
+            self.iterations += 1
+
+            code = self.code.get(start.signature)
+            if code is None:
+                code = self.method_code(start.signature)
+            leaders = self.leaders.get(start.signature)
+            if leaders is None:
+                leaders = self.method_leaders(start.signature)
+
+            curr_idx = start
+            offset = start.offset
+            state = states[start]
+            while True:
+                handler, bc = code[offset]
+                # Final states (offset -1) are not kept
+                successors = [successor for successor in handler(self, bc, curr_idx, state) if successor[0].__class__ is not int]
+
+                if len(successors) != 1 or leaders[offset + 1]:
+                    break
+                next_pc, next_action = successors[0]
+                if next_action.__class__ is not NextState or next_pc.offset != offset + 1:
+                    break
+
+                # The state falls through to the next instruction of the block, which is not joined or kept
+                self.generated += 1
+                curr_idx = next_pc
+                offset += 1
+                state = next_action.next_state
 
-            for (next_pc, next_action) in self.step(curr_idx, states[curr_idx].copy()):
+            if reached.get(start, -1) < offset:
+                reached[start] = offset
+
+            for (next_pc, next_action) in successors:
                 self.generated += 1
 
                 next_state = None
@@ -31,111 +123,150 @@ class AbstractInterpreter:
                     case NextState(astate):
                         next_state = astate
                     case ReturnValue(value, param_count):
-                        next_state = states.get(next_pc.prev()).copy()
-
-                        if param_count > 0:
-                            next_state.stack = next_state.stack[:-param_count]
-                        
-                        next_state.stack.append(value)
+                        next_state = states[next_pc.prev()].pop(param_count).push(value)
 
  
                 old = states.get(next_pc, Bot())
-                new_state = self.join_states(old, next_state)
+                widening_points = self.widening_points.get(next_pc.signature)
+                if widening_points is None:
+                    widening_points = self.method_widening_points(next_pc.signature)
+                if widening_points[next_pc.offset] and old.__class__ is not Bot:
+                    count = joined[next_pc] = joined.get(next_pc, 0) + 1
+                    if count > self.widening_delay:
+                        new_state = self.widen_states(old, next_state)
+                    else:
+                        new_state = self.join_states(old, next_state)
+                else:
+                    new_state = self.join_states(old, next_state)
+                self.joins += 1
 
                 if old != new_state:
                     states[next_pc] = new_state
-                    needs_work.append(next_pc)
-                    l.debug(f"New state at {next_pc}")
-                    l.debug(f"new: {new_state}")
+                    add_work(next_pc)
+                    if debug:
+                        l.debug(f"New state at {next_pc}")
+                        l.debug(f"new: {new_state}")
 
-        l.debug(f"Generated {self.generated} states")
+        self.stored += len(states)
+        l.debug("Generated %d states in %d iterations, joined %d and kept %d", self.generated, self.iterations, self.joins, len(states))
+
+        touched: Dict[MethodSignature, Set[int]] = {}
+        for pc, last in reached.items():
+            touched.setdefault(pc.signature, set()).update(range(pc.offset, last + 1))
 
-        touched = dict()
-        for pc in states.keys():
-            pcs = touched.get(pc.signature, set())
-            pcs.add(pc.offset)
-            touched[pc.signature] = pcs
-        
         return touched
 
+    # Returns the handler and instruction of every offset of a method, which are looked up once per method
+    def method_code(self, signature: MethodSignature) -> List[Tuple[Callable, Instruction]]:
+        code = [(self.handlers[bc.opcode], bc) for bc in self.program.method(signature).instructions]
+        self.code[signature] = code
+        return code
+
+    # Returns the block leaders of a method. Without block execution every offset is a leader.
+    def method_leaders(self, signature: MethodSignature) -> bytearray:
+        if self.blocks:
+            cfg = self.cfg(signature)
+            leaders = bytearray(len(cfg.order) + 1)
+            for leader in cfg.leaders:
+                leaders[leader] = 1
+            leaders[len(cfg.order)] = 1
+        else:
+            leaders = bytearray(b"\x01") * (len(self.program.method(signature).instructions) + 1)
+        self.leaders[signature] = leaders
+        return leaders
+
+    # Returns the offsets of a method whose states are widened: every cycle of the analysis goes through a loop head,
+    # or through a method entry and a return site (for recursive calls)
+    def method_widening_points(self, signature: MethodSignature) -> bytearray:
+        instructions = self.program.method(signature).instructions
+        points = bytearray(len(instructions) + 1)
+        points[0] = 1
+        for loop_head in self.cfg(signature).loop_heads:
+            points[loop_head] = 1
+        for index, instruction in enumerate(instructions):
+            if instruction.opcode == Opcode.INVOKE:
+                points[index + 1] = 1
+        self.widening_points[signature] = points
+        return points
+
+    # Returns the control flow graph of a method
+    def cfg(self, signature: MethodSignature) -> ControlFlowGraph:
+        cfg = self.cfgs.get(signature)
+        if cfg is None:
+            cfg = self.cfgs[signature] = method_cfg(self.program.method(signature))
+        return cfg
+
     def join_states(self, old: AbstractState, new: AbstractState):
         raise NotImplementedError("join_states")
 
-    def step(self, pc: PC, astate: AbstractState) -> Iterable[Tuple[PC, Action]]:
-        bc = self.program.method(pc.signature).bytecode[pc.offset]
+    # Joins the states of a widening point. Domains without infinite ascending chains just join.
+    def widen_states(self, old: AbstractState, new: AbstractState):
+        return self.join_states(old, new)
 
-        l.debug(f"Running: {bc['opr']}")
+    # Steps a single instruction, leaving out final states. The analysis calls the handlers directly instead.
+    def step(self, pc: PC, astate: AbstractState) -> Iterable[Tuple[PC, Action]]:
+        code = self.code.get(pc.signature) or self.method_code(pc.signature)
+        handler, bc = code[pc.offset]
 
-        for (pc_, s_) in self.lookup(f"step_{bc['opr']}")(bc, pc, astate):
+        for (pc_, s_) in handler(self, bc, pc, astate):
             pc_: PC
             s_: Action
 
             if pc_ == -1:
-                l.debug(f"Final state: {repr(s_)}")
+                l.debug("Final state: %r", s_)
                 # self.final.add(s_)
             else:
                 yield (pc_, s_)
 
-    def lookup(self, name: str):
-        if fn := getattr(self, name, None):
-            return fn
-        else:
-            raise NotImplementedError(f"can't handle {name!r}")
+    # Instructions of unknown opcodes fail once they are stepped
+    def step_unknown(self, bc: Instruction, pc: PC, astate: AbstractState):
+        raise NotImplementedError(f"can't handle {'step_' + bc.opr!r}")
 
-    def step_goto(self, bc: list, pc: PC, astate: AbstractState):
-        yield (pc.jump(bc["target"]), NextState(astate.copy()))
+    def step_goto(self, bc: Instruction, pc: PC, astate: AbstractState):
+        yield (pc.jump(bc.target), NextState(astate))
 
-    def step_binary(self, bc: list, pc: PC, astate: AbstractState):
+    def step_binary(self, bc: Instruction, pc: PC, astate: AbstractState):
         raise NotImplementedError("step_binary")
 
-    def step_load(self, bc: list, pc: PC, astate: AbstractState):
-        new_state = astate.copy()
+    def step_load(self, bc: Instruction, pc: PC, astate: AbstractState):
+        index: int = bc.index
 
-        index: int = bc["index"]
-
-        new_state.stack.append(new_state.locals[index])
+        new_state = astate.push(astate.locals[index])
 
         yield (pc.next(), NextState(new_state))
 
 
-    def step_store(self, bc: list, pc: PC, astate: AbstractState):
-        new_state = astate.copy()
-
-        index: int = bc["index"]
+    def step_store(self, bc: Instruction, pc: PC, astate: AbstractState):
+        index: int = bc.index
 
-        new_state.locals[index] = new_state.stack.pop()
+        new_state = astate.pop().set_local(index, astate.stack[-1])
 
         yield (pc.next(), NextState(new_state))
         
 
-    def step_throw(self, bc: list, pc: PC, astate: AbstractState):
-        new_state = astate.copy()
-
-        error: object = new_state.stack.pop()
+    def step_throw(self, bc: Instruction, pc: PC, astate: AbstractState):
+        error: object = astate.stack[-1]
 
         self.errors.add(error)
 
-        new_state.done = error
+        new_state = astate.pop().fail(error)
 
         yield (-1, NextState(new_state))
 
-    def step_invoke(self, bc: list, pc: PC, astate: AbstractState):
-        new_state = astate.copy()
-        access: str = bc["access"]
+    def step_invoke(self, bc: Instruction, pc: PC, astate: AbstractState):
+        access: str = bc.access
 
         if access == "special":
             # Just pass, as method invocation on objects is not supported
             yield (pc.next(), NextState(astate))
         elif access == "static":
             # Extract arguments from the stack
-            signature = MethodSignature.from_bytecode(bc["method"])
+            signature = bc.method
 
-            args = dict(
-                enumerate(astate.stack[-len(signature.parameters):])
-            ) if len(signature.parameters) > 0 else dict()
+            args = astate.stack[len(astate.stack) - len(signature.parameters):]
 
             new_state = AbstractState(
-                [{pc.next()}],
+                ({pc.next()},),
                 args
             )
 
@@ -143,57 +274,49 @@ class AbstractInterpreter:
         else:
             raise NotImplementedError(f"can't handle {access!r}")
 
-    def step_negate(self, bc: list, pc: PC, astate: AbstractState):
-        new_state = astate.copy()
-
-        left = new_state.stack.pop()
+    def step_negate(self, bc: Instruction, pc: PC, astate: AbstractState):
+        left = astate.stack[-1]
         arithmetic = self.get_arithmetic(left)
 
-        new_state.stack.append(arithmetic.negate(left))
+        new_state = astate.pop().push(arithmetic.negate(left))
 
         yield (pc.next(), NextState(new_state))
 
-    def step_dup(self, bc: list, pc: PC, astate: AbstractState):
-        new_state = astate.copy()
-
-        count: int = bc["words"]
+    def step_dup(self, bc: Instruction, pc: PC, astate: AbstractState):
+        count: int = bc.words
 
-        dup = new_state.stack[-count:]
+        dup = astate.stack[-count:]
 
-        new_state.stack.extend(dup)
+        new_state = astate.push(*dup)
 
         yield (pc.next(), NextState(new_state))
 
-    def step_push(self, b: list, pc: PC, astate: AbstractState):
-        new_state = astate.copy()
-        type = b["value"]["type"]
-        value = b["value"]["value"]
+    def step_push(self, b: Instruction, pc: PC, astate: AbstractState):
+        type = b.value_type
+        value = b.value
 
         if type == "integer":
-            new_state.stack.append(
+            new_state = astate.push(
                 self.int_arithmetic.abstract({value})
             )
         elif type == "boolean":
-            new_state.stack.append(
+            new_state = astate.push(
                 self.bool_arithmetic.abstract({value})
             )
         else:
-            new_state.stack.append(value)
+            new_state = astate.push(value)
         
         yield (pc.next(), NextState(new_state))
 
-    def step_return(self, b: list, pc: PC, astate: AbstractState) -> Iterable[Tuple[PC, ReturnValue]]:
-        new_state = astate.copy()
-
+    def step_return(self, b: Instruction, pc: PC, astate: AbstractState) -> Iterable[Tuple[PC, ReturnValue]]:
         param_count = len(pc.signature.parameters)
 
-        if b["type"] is not None:
-            return_value = new_state.stack.pop()
-            try:
-                targets: Set[PC] = new_state.stack.pop()
-            except IndexError:
+        if b.type is not None:
+            return_value = astate.stack[-1]
+            if len(astate.stack) < 2:
                 yield (-1, ReturnValue(return_value, param_count))
                 return
+            targets: Set[PC] = astate.stack[-2]
 
             for target in targets:
                 yield (target, ReturnValue(return_value, param_count))
@@ -201,59 +324,56 @@ class AbstractInterpreter:
         else:
             yield (-1, ReturnValue(None, param_count))
             
-    def step_ifz(self, bc: list, pc: PC, astate: AbstractState):
-        left = astate.stack.pop()
+    # Both branches continue with the same state, without the compared value
+    def step_ifz(self, bc: Instruction, pc: PC, astate: AbstractState):
+        left = astate.stack[-1]
         arithmetic = self.get_arithmetic(left)
         right = arithmetic.from_int(0)
+        new_state = astate.pop()
 
-        for b in arithmetic.compare(bc["condition"], left, right):
-            l.debug(f"Comparing {left} to {right} {bc['condition']}: {b}")
+        for b in arithmetic.compare(bc.condition, left, right):
+            l.debug("Comparing %s to %s %s: %s", left, right, bc.condition, b)
             if b:
-                yield (pc.jump(bc["target"]), NextState(astate.copy()))
+                yield (pc.jump(bc.target), NextState(new_state))
             else:
-                yield (pc.next(), NextState(astate.copy()))
+                yield (pc.next(), NextState(new_state))
     
-    def step_if(self, bc: list, pc: PC, astate: AbstractState):
-        right = astate.stack.pop()
-        left = astate.stack.pop()
+    def step_if(self, bc: Instruction, pc: PC, astate: AbstractState):
+        right = astate.stack[-1]
+        left = astate.stack[-2]
+        new_state = astate.pop(2)
 
         arithmetic = self.get_arithmetic(left)
 
-        for b in arithmetic.compare(bc["condition"], left, right):
-            l.debug(f"Comparing {left} to {right} {bc['condition']}: {b}")
+        for b in arithmetic.compare(bc.condition, left, right):
+            l.debug("Comparing %s to %s %s: %s", left, right, bc.condition, b)
             if b:
-                yield (pc.jump(bc["target"]), NextState(astate.copy()))
+                yield (pc.jump(bc.target), NextState(new_state))
             else:
-                yield (pc.next(), NextState(astate.copy()))
-
-    def step_new(self, bc: list, pc: PC, astate: AbstractState):
-        new_state = astate.copy()
+                yield (pc.next(), NextState(new_state))
 
-        match bc["class"]:
+    def step_new(self, bc: Instruction, pc: PC, astate: AbstractState):
+        match bc.class_name:
             case "java/lang/AssertionError" | "java/lang/RuntimeException":
-                new_state.stack.append(RefSet({bc["class"]}))
+                new_state = astate.push(RefSet({bc.class_name}))
             case _:
                 raise NotImplementedError(f"can't handle {bc!r}")
 
         yield (pc.next(), NextState(new_state))
 
-    def step_get(self, bc: list, pc: PC, astate: AbstractState):
-        new_state = astate.copy()
-
-        new_state.stack.append(BoolSet(False))
+    def step_get(self, bc: Instruction, pc: PC, astate: AbstractState):
+        new_state = astate.push(BoolSet(False))
 
         yield (pc.next(), NextState(new_state))
 
-    def step_incr(self, bc: list, pc: PC, astate: AbstractState):
-        new_state = astate.copy()
-
-        index = bc["index"]
+    def step_incr(self, bc: Instruction, pc: PC, astate: AbstractState):
+        index = bc.index
         
-        left = new_state.locals[index]
+        left = astate.locals[index]
         arithmetic = self.get_arithmetic(left)
-        right = arithmetic.from_int(bc["amount"])
+        right = arithmetic.from_int(bc.amount)
 
-        new_state.locals[index] = arithmetic.binary("add", left, right)
+        new_state = astate.set_local(index, arithmetic.binary("add", left, right))
 
         yield (pc.next(), NextState(new_state))
 
@@ -261,4 +381,4 @@ class AbstractInterpreter:
         raise NotImplementedError("get_arithmetic")
 
 
-
+AbstractInterpreter.handlers = dispatch_table(AbstractInterpreter)
\ No newline at end of file
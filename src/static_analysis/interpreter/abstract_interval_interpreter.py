@@ -3,7 +3,7 @@ from static_analysis.interpreter.common import PC, NextState
 from static_analysis.interpreter.abstract_interpreter import AbstractInterpreter
 from static_analysis.interpreter.abstractions import AbstractState, BoolSet, Interval
 from static_analysis.interpreter.arithmetic import BoolArithmetic, IntervalArithmetic
-from reader import Program
+from reader import Instruction, Program
 from syntactic_analysis.scanner import get_int_literals
 
 class AbstractIntervalInterpreter(AbstractInterpreter):
@@ -14,37 +14,36 @@ class AbstractIntervalInterpreter(AbstractInterpreter):
         self.interesting_values: Set[int] = get_int_literals(program)
 
     def join_states(self, old: AbstractState, new: AbstractState):
-        return old.widening(self.interesting_values, new)
+        return old | new
 
-    def step_binary(self, bc: list, pc: PC, astate: AbstractState):
-        new_state = astate.copy()
+    # Widens to the integer literals of the program, so loops reach a fixpoint
+    def widen_states(self, old: AbstractState, new: AbstractState):
+        return old.widening(self.interesting_values, new)
 
-        right = new_state.stack.pop()
-        left = new_state.stack.pop()
+    def step_binary(self, bc: Instruction, pc: PC, astate: AbstractState):
+        right = astate.stack[-1]
+        left = astate.stack[-2]
+        new_state = astate.pop(2)
 
         arithmetic = self.get_arithmetic(left)
 
         try:
-            result = arithmetic.binary(bc["operant"], left, right)
-            new_state.stack.append(result)
+            result = arithmetic.binary(bc.operant, left, right)
 
-            yield (pc.next(), NextState(new_state))
+            yield (pc.next(), NextState(new_state.push(result)))
         except ZeroDivisionError:
-            new_state.done = "zero division"
             self.errors.add("zero division")
-            yield (-1, NextState(new_state))
+            yield (-1, NextState(new_state.fail("zero division")))
 
             right1 = right and Interval(float("-inf"),-1)
             right2 = right and Interval(1,float("inf"))
             if right1 != Interval.bot() :
-                new_state1 = astate.copy()
-                new_state1.stack[-1] = right1
+                new_state1 = astate.pop().push(right1)
                 for res in self.step_binary(bc, pc, new_state1):
                     yield res 
                     
             if right2 != Interval.bot() :
-                new_state2 = astate.copy()          
-                new_state2.stack[-1] = right2
+                new_state2 = astate.pop().push(right2)
                 for res in self.step_binary(bc, pc, new_state2):
                     yield res
 
@@ -2,7 +2,7 @@ from static_analysis.interpreter.abstractions import AbstractState, BoolSet, Sig
 from static_analysis.interpreter.arithmetic import BoolArithmetic, SignArithmetic
 from static_analysis.interpreter.common import NextState, PC
 from static_analysis.interpreter.abstract_interpreter import AbstractInterpreter
-from reader import Program
+from reader import Instruction, Program
 
 class AbstractSignInterpreter(AbstractInterpreter):
     def __init__(self, program: Program):
@@ -13,28 +13,24 @@ class AbstractSignInterpreter(AbstractInterpreter):
     def join_states(self, old: AbstractState, new: AbstractState):
         return old | new
 
-    def step_binary(self, bc: list, pc: PC, astate: AbstractState):
-        new_state = astate.copy()
-
-        right = new_state.stack.pop()
-        left = new_state.stack.pop()
+    def step_binary(self, bc: Instruction, pc: PC, astate: AbstractState):
+        right = astate.stack[-1]
+        left = astate.stack[-2]
+        new_state = astate.pop(2)
 
         arithmetic = self.get_arithmetic(left)
 
         try:
-            result = arithmetic.binary(bc["operant"], left, right)
-            new_state.stack.append(result)
+            result = arithmetic.binary(bc.operant, left, right)
 
-            yield (pc.next(), NextState(new_state))
+            yield (pc.next(), NextState(new_state.push(result)))
         except ZeroDivisionError:
-            new_state.done = "zero division"
             self.errors.add("zero division")
-            yield (-1, NextState(new_state))
+            yield (-1, NextState(new_state.fail("zero division")))
 
             right -= SignSet({'0'})
 
-            new_state = astate.copy()
-            new_state.stack[-1] = right
+            new_state = astate.pop().push(right)
 
             for res in self.step_binary(bc, pc, new_state):
                 yield res
@@ -8,50 +8,88 @@ from static_analysis.interpreter.abstractions.bot import Bot
 
 AbstractValue = Union[SignSet, BoolSet, Interval]
 
-@dataclass
+
+# Joins two values. A local that is only set on one path is ⊥ on the other, which the lattices do not handle.
+def join_values(s1: AbstractValue | Bot, s2: AbstractValue | Bot) -> AbstractValue | Bot:
+    if s1.__class__ is Bot:
+        return s2
+    if s2.__class__ is Bot:
+        return s1
+    return s1 | s2
+
+
+# Meets two values, which is ⊥ if either of them is ⊥
+def meet_values(s1: AbstractValue | Bot, s2: AbstractValue | Bot) -> AbstractValue | Bot:
+    if s1.__class__ is Bot or s2.__class__ is Bot:
+        return Bot()
+    return s1 & s2
+
+
+# An abstract state is never changed once it is made. The stack and the locals are tuples, and an instruction makes
+# a new state that shares the tuple it does not change (and all unchanged values) with the state it came from,
+# so states can be passed on and kept without copying them.
+# The locals are indexed by their slot, and slots that have not been stored yet are ⊥.
+@dataclass(slots=True, frozen=True)
 class AbstractState:
-    stack: list[AbstractValue]
-    locals: dict[int, AbstractValue]
+    stack: tuple[AbstractValue, ...]
+    locals: tuple[AbstractValue, ...]
     done: str = None
 
+    # Returns the state with the values pushed onto the stack
+    def push(self, *values: AbstractValue) -> 'AbstractState':
+        return AbstractState(self.stack + values, self.locals)
+
+    # Returns the state without the top count values of the stack
+    def pop(self, count: int = 1) -> 'AbstractState':
+        return AbstractState(self.stack[:len(self.stack) - count], self.locals)
+
+    # Returns the state with a value stored in a local slot
+    def set_local(self, index: int, value: AbstractValue) -> 'AbstractState':
+        locals = self.locals
+        if index >= len(locals):
+            locals += (Bot(),) * (index - len(locals) + 1)
+        return AbstractState(self.stack, locals[:index] + (value,) + locals[index + 1:])
+
+    # Returns the state with the error it ended with
+    def fail(self, error: object) -> 'AbstractState':
+        return AbstractState(self.stack, self.locals, error)
+
+    # Returns the locals of both states, padded with ⊥ to the same length
+    def paired_locals(self, other: 'AbstractState') -> zip:
+        padding = len(other.locals) - len(self.locals)
+        if padding > 0:
+            return zip(self.locals + (Bot(),) * padding, other.locals)
+        return zip(self.locals, other.locals + (Bot(),) * -padding)
+
     def __le__(self, other: 'AbstractState') -> bool:
         self.ensure_compatability(other)
         stack_le = all(s1 <= s2 for s1, s2 in zip(self.stack, other.stack))
-        locals_le = all(
-            self.locals.get(key) <= other.locals.get(key)
-            for key in set(self.locals) | set(other.locals)
-        )
+        locals_le = all(s1.__class__ is Bot or (s2.__class__ is not Bot and s1 <= s2) for s1, s2 in self.paired_locals(other))
         return stack_le and locals_le
 
     # Meet operation
     def __and__(self, other: 'AbstractState') -> 'AbstractState':
         self.ensure_compatability(other)
-        stack_meet = [s1 & s2 for s1, s2 in zip(other.stack, self.stack)]
-        locals_meet = {
-            key: self.locals.get(key, Bot()) & other.locals.get(key, Bot())
-            for key in set(self.locals) | set(other.locals)
-        }
+        stack_meet = tuple(s1 & s2 for s1, s2 in zip(other.stack, self.stack))
+        locals_meet = tuple(meet_values(s1, s2) for s1, s2 in self.paired_locals(other))
         return AbstractState(stack=stack_meet, locals=locals_meet)
-    
-    # Join operation
+
+    # Join operation. Tuples that are shared by both states are kept as they are.
     def __or__(self, other: 'AbstractState') -> 'AbstractState':
         self.ensure_compatability(other)
-        stack_join = [s1 | s2 for s1, s2 in zip(other.stack, self.stack)]
-        locals_join = {
-            key: self.locals.get(key, Bot()) | other.locals.get(key, Bot())
-            for key in set(self.locals) | set(other.locals)
-        }
+        if self.stack is other.stack:
+            stack_join = self.stack
+        else:
+            stack_join = tuple(s1 | s2 for s1, s2 in zip(other.stack, self.stack))
+        if self.locals is other.locals:
+            locals_join = self.locals
+        else:
+            locals_join = tuple(join_values(s1, s2) for s1, s2 in self.paired_locals(other))
         return AbstractState(stack=stack_join, locals=locals_join)
 
-    def copy(self):
-        return AbstractState(
-            stack=self.stack.copy(), 
-            locals=self.locals.copy(),
-        )
-    
     def __hash__(self) -> int:
-        return hash((tuple(self.stack), tuple(self.locals), self.done))
-    
+        return hash((self.stack, self.locals, self.done))
+
     def __eq__(self, other: 'AbstractState') -> bool:
         self.ensure_compatability(other)
         return self.stack == other.stack\
@@ -62,10 +100,10 @@ class AbstractState:
     def ensure_compatability(self, other: 'AbstractState'):
         if len(self.stack) != len(other.stack):
             raise ValueError("Stacks must be of the same length")
-    
+
     def widening(self, K: set[int], other: 'AbstractState') -> 'AbstractState':
         self.ensure_compatability(other)
-        
+
         stack_widening = []
         for s1, s2 in zip(self.stack, other.stack):
             match s1, s2:
@@ -74,22 +112,20 @@ class AbstractState:
                 case _:
                     stack_widening.append(s1 | s2)
 
-        locals_widening = {}
-        for key in set(self.locals) | set(other.locals):
-            s1 = self.locals.get(key, Bot())
-            s2 = other.locals.get(key, Bot())
+        locals_widening = []
+        for s1, s2 in self.paired_locals(other):
             match s1, s2:
                 case (Interval(), Interval()):
-                    locals_widening[key] = s1.widening(K, s2)
+                    locals_widening.append(s1.widening(K, s2))
                 case (_, Bot()):
-                    locals_widening[key] = s1
+                    locals_widening.append(s1)
                 case (Bot(), _):
-                    locals_widening[key] = s2
+                    locals_widening.append(s2)
                 case _:
-                    locals_widening[key] = s1 | s2
+                    locals_widening.append(s1 | s2)
 
-        return AbstractState(stack=stack_widening, locals=locals_widening)
+        return AbstractState(stack=tuple(stack_widening), locals=tuple(locals_widening))
 
     @staticmethod
     def bot():
-        return AbstractState([], {})
+        return AbstractState((), ())
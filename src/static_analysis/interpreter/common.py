@@ -19,6 +19,10 @@ class PC:
     signature: MethodSignature
     offset: int
 
+    # Hash on the interned signature id, instead of rehashing the signature fields
+    def __hash__(self) -> int:
+        return hash((self.signature.id, self.offset))
+
     def __add__(self, i: int):
         return PC(self.signature, self.offset + i)
     
@@ -1,90 +1,138 @@
 from dataclasses import Field, dataclass, field
 from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterable, KeysView, List, Mapping, Set, Tuple
 import networkx as nx
 import matplotlib.pyplot as plt
 
+from reader.instruction import Opcode
+from reader.lazy_files import LazyFiles
+from reader.method import Method
 from reader.method_signature import MethodSignature
 from reader.program import Program
+from syntactic_analysis.bytecode.compact_graph import CompactGraph
 import logging as l
 
+# A call graph between methods. The graph is stored as a compact graph (see compact_graph), which this class is a view of.
+# Nodes and edges added to the graph are kept aside, and merged into a new compact graph when the graph is next read.
 @dataclass
 class CallGraph:
-    nodes: Set[MethodSignature] = field(default_factory=set)
-    edges: Dict[MethodSignature, Set[MethodSignature]] = field(default_factory=dict)
+    compact: CompactGraph[MethodSignature] = field(default_factory=CompactGraph)
+    added_nodes: List[MethodSignature] = field(default_factory=list, repr=False)
+    added_edges: List[Tuple[MethodSignature, MethodSignature]] = field(default_factory=list, repr=False)
+
+    # Returns the compact graph, after merging the added nodes and edges into it
+    def graph(self) -> CompactGraph[MethodSignature]:
+        if self.added_nodes or self.added_edges:
+            self.compact = CompactGraph.from_edges(
+                self.compact.nodes + self.added_nodes,
+                [*self.compact.edges(), *self.added_edges]
+            )
+            self.added_nodes = []
+            self.added_edges = []
+        return self.compact
+
+    @property
+    def nodes(self) -> KeysView[MethodSignature]:
+        return self.graph().ids.keys()
+
+    # Callees of every method
+    @property
+    def edges(self) -> Mapping[MethodSignature, Set[MethodSignature]]:
+        return self.graph().adjacency()
+
+    # Reverse edges, from a callee to its callsites
+    @property
+    def callers(self) -> Mapping[MethodSignature, Set[MethodSignature]]:
+        return self.graph().adjacency(reverse=True)
 
     def add_nodes_from(self, nodes: Set[MethodSignature]) -> None:
-        for node in nodes:
-            self.add_node(node)
+        self.added_nodes.extend(nodes)
 
     def add_node(self, method_id: MethodSignature) -> None:
-        if method_id in self.nodes:
-            return
-        self.nodes.add(method_id)
-        self.edges[method_id] = set()
+        self.added_nodes.append(method_id)
 
     def add_edge(self, callsite: MethodSignature, callee: MethodSignature) -> None:
-        if not callsite in self.nodes:
-            self.add_node(callsite)
-
-        if not callee in self.nodes:
-            self.add_node(callee)
-
-        self.edges[callsite].add(callee)
+        self.added_edges.append((callsite, callee))
 
     def bfs_walk(self, start_node: MethodSignature, visit: callable) -> None:
-        from collections import deque
+        graph = self.graph()
+        start_id = graph.ids.get(start_node)
+        if start_id is None:
+            visit(start_node, start_node)
+            return
 
-        queue = deque([start_node])
-        visited = set()
+        graph.bfs_walk(start_id, lambda node_id: visit(start_node, graph.nodes[node_id]))
 
-        while queue:
-            node = queue.popleft()
-            if node in visited:
-                continue
+    # Returns the methods called by any of the given methods, directly or transitively, including the methods themselves.
+    # All methods are walked at once, e.g. to find every method reachable from the tests.
+    def reachable(self, sources: Iterable[MethodSignature]) -> Set[MethodSignature]:
+        graph = self.graph()
+        visited = graph.bfs(graph.ids[node] for node in sources if node in graph.ids)
+        return {graph.nodes[node_id] for node_id, reached in enumerate(visited) if reached}
 
-            visited.add(node)
-            should_continue = visit(start_node, node)
+    # Returns the tests that call any of the changed methods, directly or transitively, including changed tests.
+    # The callers are walked upwards from the changes once, so the time depends on the number of methods
+    # that reach a change, rather than on the number of tests and the size of their call trees.
+    def impacted_tests(self, changed: Iterable[MethodSignature], tests: Set[MethodSignature]) -> Set[MethodSignature]:
+        graph = self.graph()
+        visited = graph.bfs((graph.ids[node] for node in changed if node in graph.ids), reverse=True)
+        return {node for node in tests if (node_id := graph.ids.get(node)) is not None and visited[node_id]}
 
-            if not should_continue:
-                continue
+    # Only the compact graph is pickled, which is mostly flat arrays
+    def __getstate__(self):
+        return self.graph()
 
-            for neighbor in self.edges.get(node, []):
-                if neighbor not in visited:
-                    queue.append(neighbor)
+    def __setstate__(self, compact: CompactGraph[MethodSignature]):
+        self.__init__(compact)
 
     def __contains__(self, method_id: MethodSignature) -> bool:
-        return method_id in self.nodes
+        return method_id in self.graph().ids
 
 
+# Extracts the methods of the program and the test methods, and the static calls made by each of them.
+# A lazily loaded program only has the methods reachable from the test methods extracted,
+# so it only parses the files it needs.
 def extract_methods_and_calls(program: Program) -> Tuple[Set[MethodSignature], Dict[MethodSignature, List[MethodSignature]]]:
     method_signatures: Set[MethodSignature] = set()
     calls: Dict[MethodSignature, List[MethodSignature]] = {}
 
-    for file, method in chain(program.all_methods(), program.all_test_methods()):
+    if isinstance(program.files, LazyFiles):
+        worklist: List[Method] = [method for _, method in program.all_test_methods()]
+    else:
+        worklist: List[Method] = [method for _, method in chain(program.all_test_methods(), program.all_methods())]
+
+    while worklist:
+        method = worklist.pop()
         callsite_signature = method.signature
+
+        if callsite_signature in calls:
+            continue
+
         method_signatures.add(callsite_signature)
-        bytecode = method.bytecode
+        instructions = method.instructions
 
         calls[callsite_signature] = []
 
-        if not bytecode:
+        if not instructions:
             continue
 
         l.debug(f"Extracting calls from {callsite_signature}")
         
-        for instruction in bytecode:
-            if instruction["opr"] == "invoke":
-                if instruction["access"] != "static":
+        for instruction in instructions:
+            if instruction.opcode == Opcode.INVOKE:
+                if instruction.access != "static":
                     l.debug(f"Skipping non-static call: {instruction}")
                     continue
 
-                callee_signature = MethodSignature.from_bytecode(instruction["method"])
+                callee_signature = instruction.method
 
                 l.debug(f"Found call to {callee_signature}")
                 calls[callsite_signature].append(callee_signature)
 
+                if callee_signature not in calls and (callee := program.find_method(callee_signature)):
+                    worklist.append(callee)
+
     return method_signatures, calls
 
 
@@ -0,0 +1,138 @@
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Generic, Hashable, Iterable, Iterator, Mapping, Set, Tuple, TypeVar
+
+Node = TypeVar("Node", bound=Hashable)
+
+
+# An immutable directed graph in compressed sparse row form. Nodes get the integer ids 0..n-1, and the
+# successors of node i are targets[offsets[i]:offsets[i + 1]]. The predecessors are stored the same way,
+# so the graph can be walked in both directions. Besides the list of nodes, the graph is made of flat arrays
+# of 32-bit integers, which take 8 bytes per edge (forwards and backwards) and are pickled as raw bytes.
+@dataclass
+class CompactGraph(Generic[Node]):
+    nodes: list[Node] = field(default_factory=list)
+    offsets: array = field(default_factory=lambda: array("i", [0]))
+    targets: array = field(default_factory=lambda: array("i"))
+    reverse_offsets: array = field(default_factory=lambda: array("i", [0]))
+    reverse_targets: array = field(default_factory=lambda: array("i"))
+    ids: dict[Node, int] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.ids is None:
+            self.ids = {node: i for i, node in enumerate(self.nodes)}
+
+    # Builds a graph from its nodes and edges. Nodes only mentioned by an edge are added as well,
+    # and duplicate edges are dropped.
+    @staticmethod
+    def from_edges(nodes: Iterable[Node], edges: Iterable[Tuple[Node, Node]]) -> 'CompactGraph[Node]':
+        ids: dict[Node, int] = {}
+        for node in nodes:
+            ids.setdefault(node, len(ids))
+
+        pairs = set()
+        for source, target in edges:
+            pairs.add((ids.setdefault(source, len(ids)), ids.setdefault(target, len(ids))))
+
+        offsets, targets = CompactGraph.rows(len(ids), sorted(pairs))
+        reverse_offsets, reverse_targets = CompactGraph.rows(len(ids), sorted((target, source) for source, target in pairs))
+        return CompactGraph(list(ids), offsets, targets, reverse_offsets, reverse_targets, ids)
+
+    # Returns the offset and target arrays of the given edges, which must be sorted by their source
+    @staticmethod
+    def rows(size: int, pairs: list[Tuple[int, int]]) -> Tuple[array, array]:
+        offsets = array("i", [0]) * (size + 1)
+        for source, _ in pairs:
+            offsets[source + 1] += 1
+        for i in range(size):
+            offsets[i + 1] += offsets[i]
+        return offsets, array("i", [target for _, target in pairs])
+
+    def __getstate__(self):
+        # The ids are rebuilt from the nodes, so only the nodes and arrays are pickled
+        return (self.nodes, self.offsets, self.targets, self.reverse_offsets, self.reverse_targets)
+
+    def __setstate__(self, state):
+        self.nodes, self.offsets, self.targets, self.reverse_offsets, self.reverse_targets = state
+        self.ids = {node: i for i, node in enumerate(self.nodes)}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def successors(self, node_id: int) -> array:
+        return self.targets[self.offsets[node_id]:self.offsets[node_id + 1]]
+
+    def predecessors(self, node_id: int) -> array:
+        return self.reverse_targets[self.reverse_offsets[node_id]:self.reverse_offsets[node_id + 1]]
+
+    # Returns all edges as (source, target) pairs of nodes
+    def edges(self) -> Iterator[Tuple[Node, Node]]:
+        for source, node in enumerate(self.nodes):
+            for target in self.successors(source):
+                yield node, self.nodes[target]
+
+    # Walks the graph breadth first from all sources at once (against the edges if reverse is set),
+    # and returns a byte per node, which is 1 for every node that was reached
+    def bfs(self, sources: Iterable[int], reverse: bool = False) -> bytearray:
+        offsets, targets = (self.reverse_offsets, self.reverse_targets) if reverse else (self.offsets, self.targets)
+        visited = bytearray(len(self.nodes))
+        queue = deque()
+        for source in sources:
+            if not visited[source]:
+                visited[source] = 1
+                queue.append(source)
+
+        while queue:
+            node = queue.popleft()
+            for i in range(offsets[node], offsets[node + 1]):
+                target = targets[i]
+                if not visited[target]:
+                    visited[target] = 1
+                    queue.append(target)
+
+        return visited
+
+    # Walks the graph breadth first from a single node, and calls visit with every reached node.
+    # The successors of a node are only walked if visit returns true.
+    def bfs_walk(self, source: int, visit: Callable[[int], bool]):
+        visited = bytearray(len(self.nodes))
+        visited[source] = 1
+        queue = deque([source])
+
+        while queue:
+            node = queue.popleft()
+            if not visit(node):
+                continue
+
+            for i in range(self.offsets[node], self.offsets[node + 1]):
+                target = self.targets[i]
+                if not visited[target]:
+                    visited[target] = 1
+                    queue.append(target)
+
+    # Returns a read-only mapping from every node to the set of its successors (or predecessors)
+    def adjacency(self, reverse: bool = False) -> 'Adjacency[Node]':
+        return Adjacency(self, reverse)
+
+
+# A read-only mapping view of the successors or predecessors of the nodes of a compact graph.
+# The sets are made when they are looked up.
+class Adjacency(Mapping[Node, Set[Node]]):
+    def __init__(self, graph: CompactGraph[Node], reverse: bool):
+        self.graph = graph
+        self.reverse = reverse
+
+    def __getitem__(self, node: Node) -> Set[Node]:
+        node_id = self.graph.ids[node]
+        neighbors = self.graph.predecessors(node_id) if self.reverse else self.graph.successors(node_id)
+        return {self.graph.nodes[neighbor] for neighbor in neighbors}
+
+    def __contains__(self, node: object) -> bool:
+        return node in self.graph.ids
+
+    def __iter__(self) -> Iterator[Node]:
+        return iter(self.graph.nodes)
+
+    def __len__(self) -> int:
+        return len(self.graph.nodes)
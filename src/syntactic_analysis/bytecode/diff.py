@@ -0,0 +1,143 @@
+from dataclasses import dataclass, field
+from typing import Hashable, Sequence
+
+from reader.method import Method
+
+
+# The difference between the instructions of two versions of a method.
+# Instructions are compared by their offset insensitive key.
+@dataclass
+class BytecodeDiff:
+    # Indices of the new instructions that are not in the old instructions
+    inserted: list[int] = field(default_factory=list)
+    # Indices of the old instructions that are not in the new instructions
+    deleted: list[int] = field(default_factory=list)
+    # For every deleted instruction, the index in the new instructions where it was deleted
+    deleted_at: list[int] = field(default_factory=list)
+    new_length: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.inserted or self.deleted)
+
+    # Returns the indices of the new instructions affected by the diff, which are the offsets the predictors intersect with
+    # the touched offsets. A deletion affects the instruction that follows it (or the last one, if it was at the end).
+    def changed_offsets(self) -> set[int]:
+        changed = set(self.inserted)
+        if self.new_length > 0:
+            changed.update(min(index, self.new_length - 1) for index in self.deleted_at)
+        return changed
+
+
+def diff_methods(old_method: Method, new_method: Method) -> BytecodeDiff:
+    return diff_instructions(
+        [instruction.key for instruction in old_method.instructions],
+        [instruction.key for instruction in new_method.instructions],
+    )
+
+
+# Diffs two sequences of hashable instruction keys. The keys are hashed once into small integers,
+# and the integer sequences are compared with Myers' linear space diff algorithm.
+def diff_instructions(old: Sequence[Hashable], new: Sequence[Hashable]) -> BytecodeDiff:
+    ids: dict[Hashable, int] = {}
+    a = [ids.setdefault(key, len(ids)) for key in old]
+    b = [ids.setdefault(key, len(ids)) for key in new]
+
+    diff = BytecodeDiff(new_length=len(b))
+    # The ranges are diffed from left to right, so the indices come out sorted
+    diff_range(a, 0, len(a), b, 0, len(b), diff)
+    return diff
+
+
+def diff_range(a: list[int], a_lo: int, a_hi: int, b: list[int], b_lo: int, b_hi: int, diff: BytecodeDiff):
+    # Common prefixes and suffixes are no part of the diff, and small edits of large methods are mostly made of them
+    while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+        a_lo += 1
+        b_lo += 1
+    while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+        a_hi -= 1
+        b_hi -= 1
+
+    if a_lo == a_hi or b_lo == b_hi:
+        diff.inserted.extend(range(b_lo, b_hi))
+        diff.deleted.extend(range(a_lo, a_hi))
+        diff.deleted_at.extend([b_lo] * (a_hi - a_lo))
+        return
+
+    split = middle_snake(a, a_lo, a_hi, b, b_lo, b_hi)
+    if split is None:
+        # Nothing in common
+        diff.inserted.extend(range(b_lo, b_hi))
+        diff.deleted.extend(range(a_lo, a_hi))
+        diff.deleted_at.extend([b_lo] * (a_hi - a_lo))
+        return
+
+    x, y = split
+    diff_range(a, a_lo, a_lo + x, b, b_lo, b_lo + y, diff)
+    diff_range(a, a_lo + x, a_hi, b, b_lo + y, b_hi, diff)
+
+
+# Finds the middle snake of a shortest edit script of a[a_lo:a_hi] into b[b_lo:b_hi], by running Myers' greedy
+# algorithm from both ends until the paths overlap. Returns the point (relative to a_lo and b_lo) where the
+# ranges can be split, or None if they have nothing in common. Uses O(len(a) + len(b)) space.
+def middle_snake(a: list[int], a_lo: int, a_hi: int, b: list[int], b_lo: int, b_hi: int) -> tuple[int, int] | None:
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+    max_d = (n + m + 1) // 2
+    v_offset = max_d
+    v_length = 2 * max_d + 2
+    forward = [-1] * v_length
+    backward = [-1] * v_length
+    forward[v_offset + 1] = 0
+    backward[v_offset + 1] = 0
+    delta = n - m
+    # If the difference of the lengths is odd, the forward path overlaps the backward path first
+    check_forward = delta % 2 != 0
+    k1_start = k1_end = k2_start = k2_end = 0
+
+    for d in range(max_d):
+        for k1 in range(-d + k1_start, d + 1 - k1_end, 2):
+            k1_offset = v_offset + k1
+            if k1 == -d or (k1 != d and forward[k1_offset - 1] < forward[k1_offset + 1]):
+                x1 = forward[k1_offset + 1]
+            else:
+                x1 = forward[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[a_lo + x1] == b[b_lo + y1]:
+                x1 += 1
+                y1 += 1
+            forward[k1_offset] = x1
+            if x1 > n:
+                # Ran off the right of the graph
+                k1_end += 2
+            elif y1 > m:
+                # Ran off the bottom of the graph
+                k1_start += 2
+            elif check_forward:
+                k2_offset = v_offset + delta - k1
+                if 0 <= k2_offset < v_length and backward[k2_offset] != -1 and x1 >= n - backward[k2_offset]:
+                    return x1, y1
+
+        for k2 in range(-d + k2_start, d + 1 - k2_end, 2):
+            k2_offset = v_offset + k2
+            if k2 == -d or (k2 != d and backward[k2_offset - 1] < backward[k2_offset + 1]):
+                x2 = backward[k2_offset + 1]
+            else:
+                x2 = backward[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[a_hi - x2 - 1] == b[b_hi - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            backward[k2_offset] = x2
+            if x2 > n:
+                k2_end += 2
+            elif y2 > m:
+                k2_start += 2
+            elif not check_forward:
+                k1_offset = v_offset + delta - k2
+                if 0 <= k1_offset < v_length and forward[k1_offset] != -1:
+                    x1 = forward[k1_offset]
+                    y1 = v_offset + x1 - k1_offset
+                    if x1 >= n - x2:
+                        return x1, y1
+
+    return None
@@ -0,0 +1,172 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Set
+
+from reader.method_signature import MethodSignature
+from syntactic_analysis.bytecode.call_graph import CallGraph
+
+
+# Returns the strongly connected components of a graph given by its successor lists, with Tarjan's algorithm.
+# The components are returned in reverse topological order, so every component comes after the components it calls.
+# The depth first search keeps its own stack, as call chains can be deeper than the recursion limit.
+def strongly_connected_components(successors: List[List[int]]) -> List[List[int]]:
+    order = [-1] * len(successors)
+    low = [0] * len(successors)
+    on_stack = [False] * len(successors)
+    stack: List[int] = []
+    components: List[List[int]] = []
+    counter = 0
+
+    for root in range(len(successors)):
+        if order[root] != -1:
+            continue
+
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, 0)]
+
+        while work:
+            node, i = work[-1]
+            if i < len(successors[node]):
+                work[-1] = (node, i + 1)
+                successor = successors[node][i]
+                if order[successor] == -1:
+                    order[successor] = low[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    work.append((successor, 0))
+                elif on_stack[successor]:
+                    low[node] = min(low[node], order[successor])
+                continue
+
+            work.pop()
+            if work:
+                caller = work[-1][0]
+                low[caller] = min(low[caller], low[node])
+
+            if low[node] == order[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+
+    return components
+
+
+# The tests of a call graph by their component in a reachability index, which is made once for many queries
+@dataclass
+class TestComponents:
+    # The bitset of the components that hold a test
+    bits: int
+    # The tests of every component in the bitset
+    tests: Dict[int, List[MethodSignature]]
+
+
+# Transitive reachability of a call graph. Cycles (e.g. recursive methods) are condensed into their strongly
+# connected components, and every component stores the components it reaches and the components reaching it
+# as bitsets, with bit i standing for component i. Reachability queries are then single bitset operations.
+# The bitsets grow with the square of the number of components (about 570MB for 100k methods), so the index is
+# only built on request, for many queries on the same graph. The call graph and the predictors walk the graph instead.
+@dataclass
+class ReachabilityIndex:
+    components: List[List[MethodSignature]]
+    component_of: Dict[MethodSignature, int]
+    # The condensed graph, as the successor components of every component
+    dag: List[Set[int]]
+    reaches: List[int]
+    # Callers always come after their callees, so the bitsets of the components reaching component c are
+    # shifted right by c, which leaves out their leading zeros
+    reached_by: List[int]
+
+    @staticmethod
+    def build(call_graph: CallGraph) -> 'ReachabilityIndex':
+        graph = call_graph.graph()
+        nodes = graph.nodes
+        successors = [graph.successors(node).tolist() for node in range(len(nodes))]
+
+        components = strongly_connected_components(successors)
+        component_of = [0] * len(nodes)
+        for c, members in enumerate(components):
+            for member in members:
+                component_of[member] = c
+
+        dag: List[Set[int]] = [set() for _ in components]
+        for node, node_successors in enumerate(successors):
+            c = component_of[node]
+            for successor in node_successors:
+                if component_of[successor] != c:
+                    dag[c].add(component_of[successor])
+
+        # Callees come before their callers, so the components a component calls are complete when it is reached
+        reaches = [0] * len(components)
+        for c in range(len(components)):
+            bits = 1 << c
+            for successor in dag[c]:
+                bits |= reaches[successor]
+            reaches[c] = bits
+
+        reached_by = [1] * len(components)
+        for c in reversed(range(len(components))):
+            for successor in dag[c]:
+                reached_by[successor] |= reached_by[c] << (c - successor)
+
+        return ReachabilityIndex(
+            [[nodes[member] for member in members] for members in components],
+            {node: component_of[i] for i, node in enumerate(nodes)},
+            dag,
+            reaches,
+            reached_by
+        )
+
+    # Returns the set bits of a bitset. The bits are looked up in its binary digits, as clearing the lowest bit
+    # one at a time copies the whole bitset for every bit.
+    @staticmethod
+    def bits(bits: int) -> Iterator[int]:
+        digits = bin(bits)[:1:-1]
+        bit = digits.find("1")
+        while bit != -1:
+            yield bit
+            bit = digits.find("1", bit + 1)
+
+    # Returns the methods of the components in a bitset
+    def nodes(self, bits: int) -> Iterable[MethodSignature]:
+        for c in ReachabilityIndex.bits(bits):
+            yield from self.components[c]
+
+    # Returns true if the caller calls the callee, directly or transitively (a method always reaches itself)
+    def reaches_method(self, caller: MethodSignature, callee: MethodSignature) -> bool:
+        return bool(self.reaches[self.component_of[caller]] >> self.component_of[callee] & 1)
+
+    # Returns the methods the given method calls, directly or transitively, including itself
+    def reachable_from(self, node: MethodSignature) -> Set[MethodSignature]:
+        return set(self.nodes(self.reaches[self.component_of[node]]))
+
+    # Returns the methods that call the given method, directly or transitively, including itself
+    def reaching(self, node: MethodSignature) -> Set[MethodSignature]:
+        c = self.component_of[node]
+        return set(self.nodes(self.reached_by[c] << c))
+
+    # Returns the components of the tests, which are shared by all impacted_tests queries on the same tests
+    def test_components(self, tests: Iterable[MethodSignature]) -> TestComponents:
+        components = TestComponents(0, {})
+        for node in tests:
+            c = self.component_of.get(node)
+            if c is not None:
+                components.bits |= 1 << c
+                components.tests.setdefault(c, []).append(node)
+        return components
+
+    # Like CallGraph.impacted_tests, but as a bitset intersection of the test components with the callers of the changes
+    def impacted_tests(self, changed: Iterable[MethodSignature], tests: TestComponents) -> Set[MethodSignature]:
+        callers = 0
+        for node in changed:
+            c = self.component_of.get(node)
+            if c is not None:
+                callers |= self.reached_by[c] << c
+        return {node for c in ReachabilityIndex.bits(callers & tests.bits) for node in tests.tests[c]}
@@ -9,8 +9,8 @@ JLANG_PARSER = Parser(JLANG)
 def get_int_literals(program: Program) -> set[int]:
     ints: set[int] = set()
 
-    for file in program.files.values():
-        tree = JLANG_PARSER.parse(bytes(file.source, "utf8"))
+    for source in program.sources():
+        tree = JLANG_PARSER.parse(bytes(source, "utf8"))
         query = JLANG.query("(decimal_integer_literal) @literal")
         res = query.captures(tree.root_node)
         literals = res["literal"] if "literal" in res else []
@@ -0,0 +1,35 @@
+from dataclasses import FrozenInstanceError
+
+import pytest
+
+from static_analysis.interpreter.abstractions import AbstractState, Bot, Interval
+
+
+def test_updates_share_unchanged_parts():
+    state = AbstractState((Interval(1, 1),), (Interval(0, 0),))
+
+    pushed = state.push(Interval(2, 2))
+    stored = pushed.pop().set_local(2, Interval(3, 3))
+
+    assert state == AbstractState((Interval(1, 1),), (Interval(0, 0),))
+    assert pushed.locals is state.locals
+    assert stored.stack == state.stack
+    assert stored.locals == (Interval(0, 0), Bot(), Interval(3, 3))
+    assert stored.locals[0] is state.locals[0]
+
+
+def test_join_pads_locals():
+    left = AbstractState((), (Interval(0, 0),))
+    right = left.set_local(1, Interval(5, 5))
+
+    joined = left | right
+
+    assert joined.stack is left.stack
+    assert joined.locals == (Interval(0, 0), Interval(5, 5))
+
+
+def test_states_can_not_be_changed():
+    state = AbstractState((Interval(1, 1),), ())
+
+    with pytest.raises(FrozenInstanceError):
+        state.stack = ()
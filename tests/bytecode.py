@@ -0,0 +1,27 @@
+import json
+from pathlib import Path
+
+# The annotation that marks a method as a test
+TEST_ANNOTATION = [{"type": "org/junit/jupiter/api/Test", "values": {}}]
+
+
+# Returns the jvm2json form of a method without parameters. Instructions without an offset get their index.
+def method_json(name: str, bytecode: list[dict], returns: dict | None = {"base": "int"}, annotations: list[dict] = []) -> dict:
+    return {
+        "name": name,
+        "params": [],
+        "returns": {"annotations": [], "type": returns},
+        "annotations": annotations,
+        "code": {"bytecode": [{"offset": offset, **bc} for offset, bc in enumerate(bytecode)]},
+    }
+
+
+# Writes the source and jvm2json file of a main or test class into a data directory
+def write_class(data_dir: Path, kind: str, name: str, methods: list[dict]):
+    source_root, bytecode_root = ("test-source", "test-bytecode") if kind == "test" else ("source", "bytecode")
+    source_path = data_dir / source_root / f"{name}.java"
+    bytecode_path = data_dir / bytecode_root / f"{name}.json"
+    source_path.parent.mkdir(parents=True, exist_ok=True)
+    bytecode_path.parent.mkdir(parents=True, exist_ok=True)
+    source_path.write_text(f"class {name.split('/')[-1]} {{}}\n")
+    bytecode_path.write_text(json.dumps({"name": name, "methods": methods}))
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import prediction.change_set
+from prediction.call_graph_predictor import CallGraphPredictor
+from prediction.change_set import ChangeSet, MethodChange
+from reader.method_signature import MethodSignature
+from reader.program import Program
+from tests.bytecode import TEST_ANNOTATION, method_json, write_class
+
+
+def call(name: str) -> dict:
+    return {
+        "offset": 0, "opr": "invoke", "access": "static",
+        "method": {"ref": {"kind": "class", "name": "Math"}, "name": name, "args": [], "returns": "int"},
+    }
+
+
+def push(value: int) -> dict:
+    return {"offset": 0, "opr": "push", "value": {"type": "integer", "value": value}}
+
+
+def write_program(data_dir: Path, methods: list[dict], tests: list[dict]):
+    write_class(data_dir, "main", "Math", methods)
+    write_class(data_dir, "test", "MathTest", tests)
+
+
+def test_every_method_is_diffed_once(tmp_path: Path, monkeypatch):
+    tests = [
+        method_json(f"test{i}", [call("one"), call("two"), {"offset": 3, "opr": "return", "type": None}], annotations=TEST_ANNOTATION)
+        for i in range(3)
+    ]
+    write_program(tmp_path / "old", [
+        method_json("one", [push(1), {"offset": 1, "opr": "return", "type": "int"}]),
+        method_json("two", [push(2), {"offset": 1, "opr": "return", "type": "int"}]),
+    ], tests)
+    write_program(tmp_path / "new", [
+        method_json("one", [push(1), {"offset": 1, "opr": "return", "type": "int"}]),
+        method_json("two", [push(3), push(2), {"offset": 2, "opr": "return", "type": "int"}]),
+    ], tests)
+
+    old_program, new_program = Program.load_pair(tmp_path / "old", tmp_path / "new", snapshot=False)
+
+    diffed = []
+    diff_methods = prediction.change_set.diff_methods
+    monkeypatch.setattr(prediction.change_set, "diff_methods", lambda old, new: diffed.append(new.signature) or diff_methods(old, new))
+
+    changes = ChangeSet(old_program, new_program)
+    for _ in range(2):
+        predicted = CallGraphPredictor().predict(old_program, new_program, changes)
+        assert {signature.name for signature in predicted} == {"test0", "test1", "test2"}
+
+    two = MethodSignature("Math", "two", "int", ())
+    assert diffed == [two]
+    assert changes.change(two) == MethodChange.CHANGED
+    assert changes.changed_offsets(two) == {0}
+    assert changes.change(MethodSignature("Math", "one", "int", ())) == MethodChange.UNCHANGED
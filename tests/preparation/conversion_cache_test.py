@@ -0,0 +1,82 @@
+from pathlib import Path
+import stat
+
+import pytest
+
+from preparation import prepare
+
+
+@pytest.fixture
+def fake_jvm2json(tmp_path: Path, monkeypatch) -> Path:
+    # Echoes a class named after the first line of the input, and logs when each invocation starts and ends.
+    # Each invocation takes FAKE_JVM2JSON_DELAY seconds, so conversions that run at the same time overlap.
+    calls = tmp_path / "calls"
+    script = tmp_path / "jvm2json"
+    script.write_text(
+        "#!/bin/sh\n"
+        f"echo call >> '{calls}'\n"
+        "read name\n"
+        "sleep ${FAKE_JVM2JSON_DELAY:-0}\n"
+        "echo \"{\\\"name\\\": \\\"$name\\\", \\\"methods\\\": []}\"\n"
+        f"echo done >> '{calls}'\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(prepare, "JVM2JSON_PATH", str(script))
+    return calls
+
+
+def write_classes(classes_dir: Path, classes: dict[str, str]):
+    for name, content in classes.items():
+        path = classes_dir / f"{name}.class"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"{content}\n")
+
+
+def test_conversion_cache_only_converts_changed_classes(tmp_path: Path, fake_jvm2json: Path):
+    cache_dir = tmp_path / "cache"
+    write_classes(tmp_path / "classes", {"org/example/A": "A", "org/example/B": "B"})
+
+    stats = prepare.convert_classes_to_json(tmp_path / "classes", tmp_path / "bytecode", cache_dir)
+    assert (stats.hits, stats.misses) == (0, 2)
+
+    write_classes(tmp_path / "classes", {"org/example/B": "B2"})
+    stats = prepare.convert_classes_to_json(tmp_path / "classes", tmp_path / "bytecode-2", cache_dir)
+    assert (stats.hits, stats.misses) == (1, 1)
+
+    assert fake_jvm2json.read_text().split().count("call") == 3
+    assert (tmp_path / "bytecode-2/org/example/A.json").read_text() == (tmp_path / "bytecode/org/example/A.json").read_text()
+    assert '"B2"' in (tmp_path / "bytecode-2/org/example/B.json").read_text()
+
+
+def test_only_rebuilt_classes_are_converted(tmp_path: Path, fake_jvm2json: Path):
+    write_classes(tmp_path / "classes", {"org/example/A": "A", "org/example/B": "B"})
+    prepare.convert_classes_to_json(tmp_path / "classes", tmp_path / "previous/bytecode")
+
+    write_classes(tmp_path / "classes", {"org/example/B": "B2"})
+    (tmp_path / "classes/org/example/A.class").unlink()
+    directories = [(tmp_path / "classes", tmp_path / "new/bytecode")]
+    stats = prepare.convert_version(directories, tmp_path / "previous", {Path("org/example/B.class")}, None, True)
+
+    assert (stats.hits, stats.misses) == (0, 1)
+    assert [path.name for path in (tmp_path / "new/bytecode/org/example").iterdir()] == ["B.json"]
+    assert '"B2"' in (tmp_path / "new/bytecode/org/example/B.json").read_text()
+
+
+def test_main_and_test_classes_share_one_pool_of_jobs(tmp_path: Path, fake_jvm2json: Path, monkeypatch):
+    monkeypatch.setenv("FAKE_JVM2JSON_DELAY", "0.2")
+    write_classes(tmp_path / "classes", {f"org/example/A{i}": f"A{i}" for i in range(3)})
+    write_classes(tmp_path / "test-classes", {f"org/example/A{i}Test": f"A{i}Test" for i in range(3)})
+
+    stats = prepare.convert_directories([
+        (tmp_path / "classes", tmp_path / "bytecode"),
+        (tmp_path / "test-classes", tmp_path / "test-bytecode"),
+    ], jobs=4)
+    assert (stats.hits, stats.misses) == (0, 6)
+
+    in_flight = most_in_flight = 0
+    for line in fake_jvm2json.read_text().split():
+        in_flight += 1 if line == "call" else -1
+        most_in_flight = max(most_in_flight, in_flight)
+
+    # Converting the directories one after the other would run at most 3 conversions at a time
+    assert most_in_flight == 4
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from preparation.incremental import remove_classes, sources_to_compile
+
+
+def test_dependents_of_changed_sources_are_recompiled(tmp_path: Path):
+    sources = {
+        "src/main/java/org/example/Math.java": "class Math { static final int ONE = 1; }",
+        "src/main/java/org/example/Funs.java": "class Funs { static final int TWO = Math.ONE + 1; }",
+        "src/main/java/org/example/Chain.java": "class Chain { int two() { return Funs.TWO; } }",
+        "src/main/java/org/example/Other.java": "class Other { int mathematics; }",
+        "src/test/java/org/example/FunsTest.java": "class FunsTest { Funs funs; }",
+    }
+    for source, content in sources.items():
+        (tmp_path / source).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / source).write_text(content)
+
+    changed = {"src/main/java/org/example/Math.java"}
+    assert sources_to_compile(tmp_path, sources, changed, set()) == changed | {
+        "src/main/java/org/example/Funs.java",
+        "src/main/java/org/example/Chain.java",
+        "src/test/java/org/example/FunsTest.java",
+    }
+    assert sources_to_compile(tmp_path, sources, set(), set()) == set()
+
+
+def test_remove_classes_removes_nested_classes(tmp_path: Path):
+    class_dir = tmp_path / "target/test-classes/org/example"
+    class_dir.mkdir(parents=True)
+    for name in ["MathTest.class", "MathTest$Inner.class", "MathTests.class"]:
+        (class_dir / name).write_bytes(b"")
+
+    remove_classes(tmp_path, "src/test/java/org/example/MathTest.java")
+
+    assert [path.name for path in class_dir.iterdir()] == ["MathTests.class"]
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from preparation.version_store import VersionStore
+
+
+def write_version(project: Path, value: int):
+    (project / "source").mkdir(parents=True, exist_ok=True)
+    (project / "source/Math.java").write_text("class Math {}\n")
+    (project / "source/Value.java").write_text(f"class Value {{ int value = {value}; }}\n")
+
+
+def test_unchanged_files_are_linked(tmp_path: Path):
+    store = VersionStore(tmp_path / "versions", history=2)
+
+    for value in range(3):
+        write_version(tmp_path / "project", value)
+        store.add({"source": tmp_path / "project/source", "missing": tmp_path / "project/missing"})
+
+    assert store.versions() == ["000001", "000002"]
+
+    old_dir, new_dir = store.path(-2), store.path(-1)
+    assert (old_dir / "source/Math.java").stat().st_ino == (new_dir / "source/Math.java").stat().st_ino
+    assert (new_dir / "source/Value.java").read_text() == "class Value { int value = 2; }\n"
+    assert not (new_dir / "missing").exists()
+
+    # Objects of the removed version are pruned: one shared Math and one Value per version
+    assert len(list(store.objects_dir.glob("*/*"))) == 3
+
+
+def test_link_latest(tmp_path: Path):
+    store = VersionStore(tmp_path / "versions")
+    data_dir = tmp_path
+
+    write_version(tmp_path / "project", 0)
+    store.add({"source": tmp_path / "project/source"})
+    store.link_latest(data_dir)
+
+    assert (data_dir / "new").resolve() == store.path(-1).resolve()
+    assert list((data_dir / "old").iterdir()) == []
+
+    write_version(tmp_path / "project", 1)
+    store.add({"source": tmp_path / "project/source"})
+    store.link_latest(data_dir)
+
+    assert (data_dir / "old").resolve() == store.path("000000").resolve()
+    assert (data_dir / "new/source/Value.java").read_text() == "class Value { int value = 1; }\n"
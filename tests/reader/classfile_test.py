@@ -0,0 +1,184 @@
+import os
+from pathlib import Path
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+from preparation import prepare
+from reader.classfile import read_class
+from reader.file import File
+from reader.instruction import Opcode
+from reader.method_signature import MethodSignature
+from reader.program import Program
+
+JAVA_EXAMPLE = Path(__file__).parent.parent.parent / "java-example"
+
+
+# Assembles minimal class files, with a constant pool that is built up on demand
+class ClassBuilder:
+    def __init__(self, name: str):
+        self.constants: list[bytes] = []
+        self.indices: dict[bytes, int] = {}
+        self.methods: list[bytes] = []
+        self.name = self.class_ref(name)
+        self.super = self.class_ref("java/lang/Object")
+
+    def constant(self, data: bytes) -> int:
+        if data not in self.indices:
+            self.constants.append(data)
+            self.indices[data] = len(self.constants)
+        return self.indices[data]
+
+    def utf8(self, value: str) -> int:
+        encoded = value.encode()
+        return self.constant(struct.pack(">BH", 1, len(encoded)) + encoded)
+
+    def class_ref(self, name: str) -> int:
+        return self.constant(struct.pack(">BH", 7, self.utf8(name)))
+
+    def method_ref(self, class_name: str, name: str, descriptor: str) -> int:
+        name_and_type = self.constant(struct.pack(">BHH", 12, self.utf8(name), self.utf8(descriptor)))
+        return self.constant(struct.pack(">BHH", 10, self.class_ref(class_name), name_and_type))
+
+    def method(self, name: str, descriptor: str, code: bytes, annotations: list[str] = []):
+        code_attribute = struct.pack(">HHI", 2, 2, len(code)) + code + struct.pack(">HH", 0, 0)
+        attributes = [(self.utf8("Code"), code_attribute)]
+        if annotations:
+            data = struct.pack(">H", len(annotations)) + b"".join(
+                struct.pack(">HH", self.utf8(annotation), 0) for annotation in annotations
+            )
+            attributes.append((self.utf8("RuntimeVisibleAnnotations"), data))
+
+        self.methods.append(
+            struct.pack(">HHHH", 0x0009, self.utf8(name), self.utf8(descriptor), len(attributes))
+            + b"".join(struct.pack(">HI", name, len(data)) + data for name, data in attributes)
+        )
+
+    def build(self) -> bytes:
+        return (
+            struct.pack(">IHHH", 0xCAFEBABE, 0, 61, len(self.constants) + 1)
+            + b"".join(self.constants)
+            + struct.pack(">HHHHHH", 0x0021, self.name, self.super, 0, 0, len(self.methods))
+            + b"".join(self.methods)
+            + struct.pack(">H", 0)
+        )
+
+
+def math_class() -> bytes:
+    builder = ClassBuilder("org/example/Math")
+    negate = builder.method_ref("org/example/Math", "negate", "(I)I")
+    # iload_0, ineg, ireturn
+    builder.method("negate", "(I)I", bytes([0x1a, 0x74, 0xac]))
+    # iload_0, ifge +8, iload_0, invokestatic negate, ireturn, iload_0, ireturn
+    builder.method("abs", "(I)I", bytes([0x1a, 0x9c, 0x00, 0x08, 0x1a, 0xb8]) + struct.pack(">H", negate) + bytes([0xac, 0x1a, 0xac]))
+    # sipush 1000, pop, return
+    builder.method("testAbs", "()V", bytes([0x11, 0x03, 0xe8, 0x57, 0xb1]), ["Lorg/junit/jupiter/api/Test;"])
+    return builder.build()
+
+
+def test_read_class():
+    file = File.from_class_bytes(b"class Math {}", math_class())
+
+    assert file.name == "org/example/Math"
+    assert sorted(str(signature) for signature in file.methods) == [
+        "org/example/Math.abs(int) -> int",
+        "org/example/Math.negate(int) -> int",
+        "org/example/Math.testAbs() -> void",
+    ]
+
+    abs = file.methods[MethodSignature("org/example/Math", "abs", "int", ("int",))]
+    assert [instruction.opcode for instruction in abs.instructions] == [
+        Opcode.LOAD, Opcode.IFZ, Opcode.LOAD, Opcode.INVOKE, Opcode.RETURN, Opcode.LOAD, Opcode.RETURN,
+    ]
+    # Branch targets are instruction indices, not byte offsets
+    assert (abs.instructions[1].condition, abs.instructions[1].target) == ("ge", 5)
+    assert abs.instructions[3].method == MethodSignature("org/example/Math", "negate", "int", ("int",))
+
+    test = file.methods[MethodSignature("org/example/Math", "testAbs", "void", ())]
+    assert test.is_test()
+    assert (test.instructions[0].value_type, test.instructions[0].value) == ("integer", 1000)
+
+
+def test_read_class_rejects_other_files():
+    with pytest.raises(ValueError):
+        read_class(b"not a class file")
+
+
+def test_program_reads_class_files(tmp_path: Path):
+    (tmp_path / "source/org/example").mkdir(parents=True)
+    (tmp_path / "classes/org/example").mkdir(parents=True)
+    (tmp_path / "source/org/example/Math.java").write_text("class Math {}")
+    (tmp_path / "classes/org/example/Math.class").write_bytes(math_class())
+
+    program = Program.load(tmp_path)
+
+    assert program.contains_method(MethodSignature("org/example/Math", "negate", "int", ("int",)))
+
+
+def jvm2json_available() -> bool:
+    return shutil.which(prepare.JVM2JSON_PATH) is not None or Path(prepare.JVM2JSON_PATH).is_file()
+
+
+# Class files of java-example and the jvm2json output for them, so the reader is compared with jvm2json without either
+# javac or jvm2json. They are written by test_read_class_matches_jvm2json when UPDATE_CLASSFILE_FIXTURES is set.
+FIXTURES = Path(__file__).parent / "classfiles"
+FIXTURE_CLASSES = {"org/example/Math", "org/example/MathTest"}
+
+
+def assert_same_methods(class_bytes: bytes, json_bytes: bytes):
+    expected = File.from_bytes(b"", json_bytes)
+    actual = File.from_class_bytes(b"", class_bytes)
+
+    assert actual.name == expected.name
+    assert actual.methods.keys() == expected.methods.keys()
+    for signature, method in expected.methods.items():
+        assert actual.methods[signature].annotations == method.annotations
+        assert actual.methods[signature].is_test() == method.is_test()
+        assert [ins.key for ins in actual.methods[signature].instructions] == [ins.key for ins in method.instructions]
+
+
+# Returns the classpath of the dependencies of java-example, which has the JUnit jar its test classes are compiled against
+def maven_classpath(tmp_path: Path) -> str:
+    classpath_file = tmp_path / "classpath.txt"
+    subprocess.run([
+        "mvn", "-q", "-f", str(JAVA_EXAMPLE / "pom.xml"), "dependency:build-classpath", f"-Dmdep.outputFile={classpath_file}"
+    ], check=True)
+    return classpath_file.read_text().strip()
+
+
+@pytest.mark.parametrize("class_file", sorted(FIXTURES.glob("*.class")), ids=lambda path: path.stem)
+def test_read_class_matches_jvm2json_fixtures(class_file: Path):
+    assert_same_methods(class_file.read_bytes(), class_file.with_suffix(".json").read_bytes())
+
+
+# Compares the methods read from the class files of java-example with the methods read from the jvm2json output.
+# The test classes are compared as well, as their annotations decide which methods are tests.
+@pytest.mark.skipif(shutil.which("javac") is None or not jvm2json_available(), reason="needs javac and jvm2json")
+@pytest.mark.parametrize("source_dir", ["src/main/java", "src/test/java"])
+def test_read_class_matches_jvm2json(tmp_path: Path, source_dir: str):
+    command = ["javac", "-d", str(tmp_path / "classes")]
+    if source_dir == "src/test/java":
+        if shutil.which("mvn") is None:
+            pytest.skip("needs maven to find the JUnit jar")
+        # The test classes call the main classes, which are compiled along with them
+        command += ["-cp", maven_classpath(tmp_path), *map(str, sorted((JAVA_EXAMPLE / "src/main/java").rglob("*.java")))]
+
+    subprocess.run([*command, *map(str, sorted((JAVA_EXAMPLE / source_dir).rglob("*.java")))], check=True)
+
+    tests = 0
+    for class_file in (tmp_path / "classes").rglob("*.class"):
+        json_file = tmp_path / "bytecode" / class_file.relative_to(tmp_path / "classes").with_suffix(".json")
+        prepare.convert_class_to_json(class_file, json_file)
+
+        assert_same_methods(class_file.read_bytes(), json_file.read_bytes())
+        tests += sum(method.is_test() for method in File.from_bytes(b"", json_file.read_bytes()).methods.values())
+
+        name = class_file.relative_to(tmp_path / "classes").with_suffix("").as_posix()
+        if os.getenv("UPDATE_CLASSFILE_FIXTURES") and name in FIXTURE_CLASSES:
+            FIXTURES.mkdir(exist_ok=True)
+            shutil.copyfile(class_file, FIXTURES / class_file.name)
+            shutil.copyfile(json_file, FIXTURES / json_file.name)
+
+    assert (tests > 0) == (source_dir == "src/test/java")
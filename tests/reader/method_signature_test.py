@@ -0,0 +1,69 @@
+from concurrent.futures import ProcessPoolExecutor
+import pickle
+
+from reader.method_signature import SIGNATURES, MethodSignature
+
+
+def decode() -> MethodSignature:
+    return MethodSignature.from_class_method(
+        "org/example/Math", "add", {"type": {"base": "int"}}, [{"type": {"base": "int"}}, {"type": {"base": "int"}}]
+    )
+
+
+# Runs in a worker process, so the signature is interned in the worker's table and sent back
+def send_back(signature: MethodSignature) -> MethodSignature:
+    return signature
+
+
+def test_decoding_twice_gives_the_canonical_instance():
+    first = decode()
+    second = decode()
+
+    assert first is second
+    assert SIGNATURES.signature(first.id) is first
+
+
+def test_hash_and_equality_use_the_id():
+    signature = decode()
+    copy = MethodSignature(signature.class_name, signature.name, signature.return_type, signature.parameters)
+    other = MethodSignature.from_str("org.example.Math.sub:(II)I")
+
+    assert copy is not signature
+    assert copy.id == signature.id
+    assert hash(copy) == hash(signature) == signature.id
+    assert copy == signature
+    assert other != signature
+    assert other.id != signature.id
+
+
+def test_signatures_sort_by_their_string():
+    add = decode()
+    sub = MethodSignature.from_str("org.example.Math.sub:(II)I")
+    abs = MethodSignature.from_str("org.example.Math.abs:(I)I")
+
+    assert sorted([sub, add, abs]) == [abs, add, sub]
+    assert add < sub and not sub < add
+    assert add.sort_key == str(add)
+
+
+def test_pickle_round_trip_gives_the_canonical_instance():
+    signature = decode()
+
+    loaded = pickle.loads(pickle.dumps(signature))
+
+    assert loaded is signature
+    assert loaded in {signature}
+    assert {signature: 1}[loaded] == 1
+
+
+def test_process_pool_round_trip_gives_the_canonical_instance():
+    signature = decode()
+
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        returned = pool.submit(send_back, signature).result()
+
+    assert returned is signature
+    assert returned == signature
+    assert hash(returned) == hash(signature)
+    assert returned in {signature}
+    assert {signature: 1}[returned] == 1
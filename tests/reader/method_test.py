@@ -0,0 +1,28 @@
+from reader.method import Method
+
+
+def method(bytecode: list[dict]) -> Method:
+    return Method("org/example/Math", {
+        "name": "zero",
+        "params": [],
+        "returns": {"annotations": [], "type": {"base": "int"}},
+        "code": {"bytecode": bytecode},
+    })
+
+
+def test_fingerprint_ignores_offsets():
+    original = method([
+        {"offset": 0, "opr": "push", "value": {"type": "integer", "value": 0}},
+        {"offset": 1, "opr": "return", "type": "int"},
+    ])
+    moved = method([
+        {"offset": 4, "opr": "push", "value": {"type": "integer", "value": 0}},
+        {"offset": 7, "opr": "return", "type": "int"},
+    ])
+    changed = method([
+        {"offset": 0, "opr": "push", "value": {"type": "integer", "value": 1}},
+        {"offset": 1, "opr": "return", "type": "int"},
+    ])
+
+    assert original.fingerprint == moved.fingerprint
+    assert original.fingerprint != changed.fingerprint
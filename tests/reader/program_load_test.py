@@ -0,0 +1,155 @@
+from pathlib import Path
+import shutil
+
+import pytest
+
+from preparation.prepare import pack_data_dir
+from reader.method_signature import MethodSignature
+from reader.program import Program
+from reader.snapshot import Snapshot
+from tests.bytecode import TEST_ANNOTATION, method_json, write_class
+
+
+def make_data_dir(data_dir: Path, value: int = 0) -> Path:
+    write_class(data_dir, "main", "org/example/Math", [
+        method_json("zero", [
+            {"offset": 0, "opr": "push", "value": {"type": "integer", "value": value}},
+            {"offset": 1, "opr": "return", "type": "int"},
+        ]),
+    ])
+    write_class(data_dir, "test", "org/example/MathTest", [
+        method_json("testZero", [
+            {"offset": 0, "opr": "return", "type": None},
+        ], annotations=TEST_ANNOTATION),
+    ])
+    return data_dir
+
+
+def signatures(program: Program) -> list[str]:
+    return sorted(str(method.signature) for _, method in program.all_methods())
+
+
+def test_snapshot_matches_plain_load(tmp_path: Path):
+    data_dir = make_data_dir(tmp_path)
+
+    plain = Program.load(data_dir)
+    cached = Program.load(data_dir, snapshot=True)
+
+    assert Snapshot.path(data_dir).exists()
+    assert signatures(cached) == signatures(plain)
+    assert [m.signature for _, m in cached.all_test_methods()] == [m.signature for _, m in plain.all_test_methods()]
+
+
+def test_snapshot_only_rebuilds_changed_files(tmp_path: Path):
+    data_dir = make_data_dir(tmp_path)
+    Program.load(data_dir, snapshot=True)
+
+    make_data_dir(data_dir, value=42)
+    program = Program.load(data_dir, snapshot=True)
+    assert (program.load_stats.decoded, program.load_stats.snapshot, program.load_stats.shared) == (1, 1, 0)
+
+    snapshot = Snapshot.read(data_dir)
+    assert len(snapshot.entries) == 2
+
+    method = next(method for _, method in program.all_methods())
+    assert method.instructions[0].value == 42
+
+    # The test class was untouched, so it must be the exact object from the previous snapshot
+    def decode(pairs, contents):
+        raise AssertionError(f"Unexpected decode of {pairs}")
+
+    unchanged = Snapshot()
+    pairs = [(data_dir / "test-source/org/example/MathTest.java", data_dir / "test-bytecode/org/example/MathTest.json")]
+    unchanged.files(snapshot, data_dir, pairs, decode)
+    assert unchanged.rebuilt == 0
+
+
+def test_lazy_load_parses_files_on_first_access(tmp_path: Path):
+    data_dir = make_data_dir(tmp_path)
+    write_class(data_dir, "main", "org/example/Unused", [method_json("unused", [])])
+
+    program = Program.load(data_dir, lazy=True)
+
+    assert "org/example/Math" in program.files
+    assert program.files.loaded == {}
+
+    tests = [method.signature for _, method in program.all_test_methods()]
+    assert [signature.name for signature in tests] == ["testZero"]
+    assert set(program.test_files.loaded) == {"org/example/MathTest"}
+
+    math = next(method for method in program.files["org/example/Math"].methods.values())
+    assert program.contains_method(math.signature)
+    assert set(program.files.loaded) == {"org/example/Math"}
+
+
+@pytest.mark.parametrize("share", [True, False])
+def test_parallel_load_matches_serial_load(tmp_path: Path, share: bool):
+    old_dir = make_data_dir(tmp_path / "old")
+    new_dir = make_data_dir(tmp_path / "new", value=42)
+
+    old_program, new_program = Program.load_pair(old_dir, new_dir, jobs=2, share=share)
+
+    assert signatures(old_program) == signatures(Program.load(old_dir))
+    assert signatures(new_program) == signatures(Program.load(new_dir))
+    assert next(method for _, method in new_program.all_methods()).instructions[0].value == 42
+
+
+def test_find_method_does_not_raise_for_missing_methods(tmp_path: Path):
+    program = Program.load(make_data_dir(tmp_path))
+    method = next(method for _, method in program.all_methods())
+
+    assert program.find_method(method.signature) is method
+    assert program.find_method(MethodSignature("org/example/Math", "missing", "int", ())) is None
+    assert program.find_method(MethodSignature("org/example/Missing", "zero", "int", ())) is None
+    assert not program.contains_method(MethodSignature("org/example/Missing", "zero", "int", ()))
+
+
+def test_unchanged_files_are_shared_with_the_base_program(tmp_path: Path):
+    old_dir = make_data_dir(tmp_path / "old")
+    new_dir = make_data_dir(tmp_path / "new", value=42)
+
+    old_program, new_program = Program.load_pair(old_dir, new_dir)
+    assert (old_program.load_stats.decoded, old_program.load_stats.shared) == (2, 0)
+    assert (new_program.load_stats.decoded, new_program.load_stats.shared) == (1, 1)
+
+    old_test = next(method for _, method in old_program.all_test_methods())
+    new_test = next(method for _, method in new_program.all_test_methods())
+    assert new_test is old_test
+
+    old_math = next(method for _, method in old_program.all_methods())
+    new_math = next(method for _, method in new_program.all_methods())
+    assert new_math is not old_math
+    assert new_math.instructions[0].value == 42
+
+
+def test_packed_load_matches_plain_load(tmp_path: Path):
+    plain = Program.load(make_data_dir(tmp_path / "plain"))
+
+    data_dir = make_data_dir(tmp_path / "packed")
+    pack_data_dir(data_dir)
+    shutil.rmtree(data_dir / "source")
+    shutil.rmtree(data_dir / "test-source")
+
+    assert not (data_dir / "bytecode").exists()
+    assert signatures(Program.load(data_dir)) == signatures(plain)
+    assert signatures(Program.load(data_dir, snapshot=True)) == signatures(plain)
+    assert signatures(Program.load(data_dir, jobs=2)) == signatures(plain)
+
+    lazy = Program.load(data_dir, lazy=True)
+    assert [m.signature for _, m in lazy.all_test_methods()] == [m.signature for _, m in plain.all_test_methods()]
+    assert list(lazy.sources()) == list(plain.sources())
+
+
+@pytest.mark.parametrize("snapshot", [False, True])
+def test_bytecode_is_read_once_when_sharing(tmp_path: Path, monkeypatch, snapshot: bool):
+    old_dir = make_data_dir(tmp_path / "old")
+    new_dir = make_data_dir(tmp_path / "new", value=42)
+    old_program = Program.load(old_dir, snapshot=snapshot)
+
+    reads = []
+    read_bytes = Path.read_bytes
+    monkeypatch.setattr(Path, "read_bytes", lambda path: reads.append(path.name) or read_bytes(path))
+    new_program = Program.load(new_dir, snapshot=snapshot, base=old_program)
+
+    assert (new_program.load_stats.decoded, new_program.load_stats.shared) == (1, 1)
+    assert sorted(name for name in reads if name.endswith(".json")) == ["Math.json", "MathTest.json"]
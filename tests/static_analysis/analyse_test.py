@@ -0,0 +1,122 @@
+from pathlib import Path
+
+import pytest
+
+from reader.program import Program
+from static_analysis.interpreter.abstract_interval_interpreter import AbstractIntervalInterpreter
+from static_analysis.interpreter.abstract_sign_interpreter import AbstractSignInterpreter
+from static_analysis.interpreter.abstractions import AbstractState
+from static_analysis.interpreter.common import PC
+from tests.bytecode import TEST_ANNOTATION, method_json, write_class
+
+
+def test_blocks_touch_the_same_offsets(tmp_path: Path):
+    # int count() { int i = 3; while (i != 0) i--; return i; }
+    write_class(tmp_path, "main", "Math", [method_json("count", [
+        {"opr": "push", "value": {"type": "integer", "value": 3}},
+        {"opr": "store", "type": "int", "index": 0},
+        {"opr": "load", "type": "int", "index": 0},
+        {"opr": "ifz", "condition": "eq", "target": 6},
+        {"opr": "incr", "index": 0, "amount": -1},
+        {"opr": "goto", "target": 2},
+        {"opr": "load", "type": "int", "index": 0},
+        {"opr": "return", "type": "int"},
+    ])])
+
+    # A long straight-line test, which calls count halfway
+    straight = [op for i in range(10) for op in (
+        {"opr": "push", "value": {"type": "integer", "value": i}},
+        {"opr": "store", "type": "int", "index": i},
+    )]
+    call = {
+        "opr": "invoke", "access": "static",
+        "method": {"ref": {"kind": "class", "name": "Math"}, "name": "count", "args": [], "returns": "int"},
+    }
+    write_class(tmp_path, "test", "MathTest", [method_json(
+        "test",
+        straight + [call, {"opr": "store", "type": "int", "index": 10}] + straight + [{"opr": "return", "type": None}],
+        None,
+        TEST_ANNOTATION,
+    )])
+
+    program = Program.load(tmp_path, snapshot=False)
+    [(_, test)] = program.all_test_methods()
+
+    interpreters = []
+    for blocks in (False, True):
+        interpreter = AbstractSignInterpreter(program)
+        interpreter.blocks = blocks
+        touched = interpreter.analyse(PC(test.signature, 0), AbstractState((), ()))
+        interpreters.append((interpreter, touched))
+
+    (instructions, instruction_touched), (blocks, block_touched) = interpreters
+    assert block_touched == instruction_touched
+    assert block_touched[test.signature] == set(range(43))
+    assert blocks.stored < instructions.stored / 4
+    assert blocks.joins < instructions.joins / 4
+
+
+def test_intervals_are_only_widened_at_loop_heads(tmp_path: Path):
+    # int i = 0; while (i < 3) i++; int x = i > 0 ? 7 : 3; int y = 10 / x;
+    write_class(tmp_path, "main", "Math", [])
+    write_class(tmp_path, "test", "MathTest", [method_json("test", [
+        {"opr": "push", "value": {"type": "integer", "value": 0}},
+        {"opr": "store", "type": "int", "index": 0},
+        {"opr": "load", "type": "int", "index": 0},
+        {"opr": "push", "value": {"type": "integer", "value": 3}},
+        {"opr": "if", "condition": "ge", "target": 7},
+        {"opr": "incr", "index": 0, "amount": 1},
+        {"opr": "goto", "target": 2},
+        {"opr": "load", "type": "int", "index": 0},
+        {"opr": "ifz", "condition": "gt", "target": 11},
+        {"opr": "push", "value": {"type": "integer", "value": 3}},
+        {"opr": "goto", "target": 12},
+        {"opr": "push", "value": {"type": "integer", "value": 7}},
+        {"opr": "store", "type": "int", "index": 1},
+        {"opr": "push", "value": {"type": "integer", "value": 10}},
+        {"opr": "load", "type": "int", "index": 1},
+        {"opr": "binary", "type": "int", "operant": "div"},
+        {"opr": "store", "type": "int", "index": 2},
+        {"opr": "return", "type": None},
+    ], None, TEST_ANNOTATION)])
+
+    program = Program.load(tmp_path, snapshot=False)
+    [(_, test)] = program.all_test_methods()
+
+    # The loop head is widened, but x is joined to [3, 7] where the branches meet, which is never zero
+    interpreter = AbstractIntervalInterpreter(program)
+    touched = interpreter.analyse(PC(test.signature, 0), AbstractState((), ()))
+    assert touched[test.signature] == set(range(18))
+    assert interpreter.errors == set()
+
+
+@pytest.mark.parametrize("interpreter_class", [AbstractSignInterpreter, AbstractIntervalInterpreter])
+@pytest.mark.parametrize("blocks", [False, True])
+@pytest.mark.parametrize("value", [{"opr": "get"}, {"opr": "new", "class": "java/lang/RuntimeException"}])
+def test_locals_set_on_one_path_are_joined(tmp_path: Path, interpreter_class, blocks: bool, value: dict):
+    # int i = 0; while (i < 3) i++; if (i != 0) v = <value>; return;
+    write_class(tmp_path, "main", "Math", [])
+    write_class(tmp_path, "test", "MathTest", [method_json("test", [
+        {"opr": "push", "value": {"type": "integer", "value": 0}},
+        {"opr": "store", "type": "int", "index": 0},
+        {"opr": "load", "type": "int", "index": 0},
+        {"opr": "push", "value": {"type": "integer", "value": 3}},
+        {"opr": "if", "condition": "ge", "target": 7},
+        {"opr": "incr", "index": 0, "amount": 1},
+        {"opr": "goto", "target": 2},
+        {"opr": "load", "type": "int", "index": 0},
+        {"opr": "ifz", "condition": "eq", "target": 13},
+        value,
+        {"opr": "store", "type": "ref", "index": 1},
+        {"opr": "goto", "target": 13},
+        {"opr": "nop"},
+        {"opr": "return", "type": None},
+    ], None, TEST_ANNOTATION)])
+
+    program = Program.load(tmp_path, snapshot=False)
+    [(_, test)] = program.all_test_methods()
+
+    interpreter = interpreter_class(program)
+    interpreter.blocks = blocks
+    touched = interpreter.analyse(PC(test.signature, 0), AbstractState((), ()))
+    assert touched[test.signature] == set(range(14)) - {12}
@@ -0,0 +1,40 @@
+from reader.instruction import Instruction
+from static_analysis.cfg import build_cfg
+
+
+def test_loop():
+    # int sum(int n) { int s = 0; while (n > 0) { s += n; n--; } return s; }
+    instructions = [Instruction.decode(bc) for bc in [
+        {"offset": 0, "opr": "push", "value": {"type": "integer", "value": 0}},
+        {"offset": 1, "opr": "store", "type": "int", "index": 1},
+        {"offset": 2, "opr": "load", "type": "int", "index": 0},
+        {"offset": 3, "opr": "ifz", "condition": "le", "target": 11},
+        {"offset": 6, "opr": "load", "type": "int", "index": 1},
+        {"offset": 7, "opr": "load", "type": "int", "index": 0},
+        {"offset": 8, "opr": "binary", "type": "int", "operant": "add"},
+        {"offset": 9, "opr": "store", "type": "int", "index": 1},
+        {"offset": 10, "opr": "incr", "index": 0, "amount": -1},
+        {"offset": 13, "opr": "goto", "target": 2},
+        {"offset": 16, "opr": "nop"},
+        {"offset": 17, "opr": "load", "type": "int", "index": 1},
+        {"offset": 18, "opr": "return", "type": "int"},
+    ]]
+
+    cfg = build_cfg(instructions)
+
+    assert cfg.leaders == [0, 2, 4, 10, 11]
+    assert cfg.successors == [[1], [2, 4], [1], [4], []]
+    assert cfg.back_edges == {(2, 1)}
+    assert cfg.loop_heads == {2}
+    assert cfg.block_order[0] == 0
+    # The nop after the goto is unreachable, so it comes last
+    assert cfg.block_order[-1] == 3
+
+    # Every other block comes after the blocks flowing into it, except for back edges
+    position = {block: i for i, block in enumerate(cfg.block_order)}
+    for block, successors in enumerate(cfg.successors):
+        if block == 3:
+            continue
+        for successor in successors:
+            assert (block, successor) in cfg.back_edges or position[block] < position[successor]
+    assert sorted(cfg.order) == list(range(len(instructions)))
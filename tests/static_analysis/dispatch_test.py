@@ -0,0 +1,23 @@
+import pytest
+
+from reader import Opcode
+from reader.instruction import Instruction
+from static_analysis.interpreter.abstract_interpreter import AbstractInterpreter
+from static_analysis.interpreter.abstract_interval_interpreter import AbstractIntervalInterpreter
+from static_analysis.interpreter.abstract_sign_interpreter import AbstractSignInterpreter
+from static_analysis.interpreter.common import PC
+
+
+def test_dispatch_tables_use_overrides():
+    assert AbstractSignInterpreter.handlers[Opcode.BINARY] is AbstractSignInterpreter.step_binary
+    assert AbstractIntervalInterpreter.handlers[Opcode.BINARY] is AbstractIntervalInterpreter.step_binary
+    assert AbstractSignInterpreter.handlers[Opcode.GOTO] is AbstractInterpreter.step_goto
+    assert len(AbstractInterpreter.handlers) == len(Opcode)
+
+
+def test_unknown_opcodes_fail_when_stepped():
+    bc = Instruction.decode({"offset": 0, "opr": "monitorenter"})
+    handler = AbstractSignInterpreter.handlers[bc.opcode]
+
+    with pytest.raises(NotImplementedError, match="step_monitorenter"):
+        handler(None, bc, PC(None, 0), None)
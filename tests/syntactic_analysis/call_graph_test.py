@@ -0,0 +1,105 @@
+import pickle
+from pathlib import Path
+
+from hypothesis import given
+from hypothesis.strategies import integers, lists, sets, tuples
+
+from reader.method_signature import MethodSignature
+from reader.program import Program
+from syntactic_analysis.bytecode.call_graph import CallGraph, build_call_graph
+from syntactic_analysis.bytecode.reachability import ReachabilityIndex, strongly_connected_components
+from tests.bytecode import TEST_ANNOTATION, method_json, write_class
+
+
+def signature(i: int) -> MethodSignature:
+    return MethodSignature("Math", f"m{i}", "int", ())
+
+
+def call_graph_of(edges: list[tuple[int, int]]) -> CallGraph:
+    call_graph = CallGraph()
+    call_graph.add_nodes_from({signature(i) for i in range(16)})
+    for callsite, callee in edges:
+        call_graph.add_edge(signature(callsite), signature(callee))
+    return call_graph
+
+
+def reachable(call_graph: CallGraph, start_node: MethodSignature) -> set[MethodSignature]:
+    nodes = set()
+    call_graph.bfs_walk(start_node, lambda _, node: nodes.add(node) or True)
+    return nodes
+
+
+@given(lists(tuples(integers(0, 15), integers(0, 15))), sets(integers(0, 15)), sets(integers(0, 15)))
+def test_impacted_tests_match_forward_walks(edges, tests, changed):
+    call_graph = call_graph_of(edges)
+
+    test_signatures = {signature(i) for i in tests}
+    changed_signatures = {signature(i) for i in changed}
+
+    expected = set()
+    for test in test_signatures:
+        def visit(start_node, node):
+            if node in changed_signatures:
+                expected.add(start_node)
+            return True
+        call_graph.bfs_walk(test, visit)
+
+    assert call_graph.impacted_tests(changed_signatures, test_signatures) == expected
+    index = ReachabilityIndex.build(call_graph)
+    assert index.impacted_tests(changed_signatures, index.test_components(test_signatures)) == expected
+
+
+@given(lists(tuples(integers(0, 15), integers(0, 15))))
+def test_reachability_index_matches_forward_walks(edges):
+    call_graph = call_graph_of(edges)
+    index = ReachabilityIndex.build(call_graph)
+
+    for node in call_graph.nodes:
+        nodes = reachable(call_graph, node)
+        assert index.reachable_from(node) == nodes
+        assert all(index.reaches_method(node, other) == (other in nodes) for other in call_graph.nodes)
+        assert index.reaching(node) == {other for other in call_graph.nodes if node in reachable(call_graph, other)}
+
+
+def test_recursive_methods_share_a_component():
+    # 0 -> 1 <-> 2 -> 3, and 3 calls itself
+    components = strongly_connected_components([[1], [2], [1, 3], [3]])
+    assert [sorted(component) for component in components] == [[3], [1, 2], [0]]
+
+    call_graph = call_graph_of([(0, 1), (1, 2), (2, 1)])
+    index = ReachabilityIndex.build(call_graph)
+    assert index.component_of[signature(1)] == index.component_of[signature(2)]
+
+
+def test_call_graph_view_and_pickle():
+    call_graph = call_graph_of([(0, 1), (1, 2), (2, 1), (0, 1)])
+    call_graph.add_node(signature(0))
+
+    assert len(call_graph.nodes) == 16
+    assert call_graph.edges[signature(0)] == {signature(1)}
+    assert call_graph.callers[signature(1)] == {signature(0), signature(2)}
+    assert call_graph.edges.get(signature(3)) == set()
+    assert call_graph.reachable([signature(0), signature(5)]) == {signature(i) for i in (0, 1, 2, 5)}
+
+    copy = pickle.loads(pickle.dumps(call_graph))
+    assert copy.graph() == call_graph.graph()
+    assert copy.callers[signature(1)] == {signature(0), signature(2)}
+
+
+def test_only_lazy_programs_leave_out_unreachable_methods(tmp_path: Path):
+    call = {
+        "opr": "invoke", "access": "static",
+        "method": {"ref": {"kind": "class", "name": "Math"}, "name": "used", "args": [], "returns": "int"},
+    }
+    write_class(tmp_path, "main", "Math", [
+        method_json("used", [{"opr": "return", "type": None}]),
+        method_json("unused", [{"opr": "return", "type": None}]),
+    ])
+    write_class(tmp_path, "test", "MathTest", [method_json("test", [call], annotations=TEST_ANNOTATION)])
+
+    eager = build_call_graph(Program.load(tmp_path))
+    lazy = build_call_graph(Program.load(tmp_path, lazy=True))
+
+    assert {node.name for node in eager.nodes} == {"test", "used", "unused"}
+    assert {node.name for node in lazy.nodes} == {"test", "used"}
+    assert eager.edges[MethodSignature("MathTest", "test", "int", ())] == {MethodSignature("Math", "used", "int", ())}
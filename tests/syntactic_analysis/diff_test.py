@@ -0,0 +1,36 @@
+from hypothesis import given
+from hypothesis.strategies import integers, lists
+
+from syntactic_analysis.bytecode.diff import diff_instructions
+
+
+def longest_common_subsequence(a: list[int], b: list[int]) -> int:
+    lengths = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i, x in enumerate(a):
+        for j, y in enumerate(b):
+            lengths[i + 1][j + 1] = lengths[i][j] + 1 if x == y else max(lengths[i][j + 1], lengths[i + 1][j])
+    return lengths[len(a)][len(b)]
+
+
+@given(lists(integers(0, 3), max_size=30), lists(integers(0, 3), max_size=30))
+def test_diff_is_minimal(old, new):
+    diff = diff_instructions(old, new)
+
+    kept_old = [x for i, x in enumerate(old) if i not in diff.deleted]
+    kept_new = [x for i, x in enumerate(new) if i not in diff.inserted]
+    assert kept_old == kept_new
+    assert len(kept_old) == longest_common_subsequence(old, new)
+
+
+def test_changed_offsets():
+    old = ["load", "push", "add", "return"]
+    new = ["load", "mul", "add", "return", "nop"]
+
+    diff = diff_instructions(old, new)
+    assert diff.inserted == [1, 4]
+    assert diff.deleted == [1]
+    assert diff.changed_offsets() == {1, 4}
+
+    assert not diff_instructions(old, old)
+    # A deletion at the end affects the last instruction
+    assert diff_instructions(old, old[:-1]).changed_offsets() == {2}